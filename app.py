@@ -1,12 +1,15 @@
 import os
 import logging
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import secrets
 import string
+import base64
+import json
+from modules.serialization import serializer_for, json_response
 
 load_dotenv()
 
@@ -14,23 +17,19 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///onboarding.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_MB', 16)) * 1024 * 1024  # 16MB max file size by default
+
+EMPLOYEE_PAGE_SIZE = int(os.getenv('EMPLOYEE_PAGE_SIZE', 500))
+EMPLOYEE_MAX_PAGE_SIZE = int(os.getenv('EMPLOYEE_MAX_PAGE_SIZE', 5000))
 
 db = SQLAlchemy(app)
-CORS(app)
 
-# Import and register blueprints
-from modules.analytics import analytics_bp
-from modules.notifications import notifications_bp
-from modules.bulk_operations import bulk_operations_bp
-from modules.auth import auth_bp, create_default_admin, role_manager
-from modules.backup_recovery import backup_bp, backup_manager
+# WAL mode so readers do not block writers and the log can be archived for point-in-time recovery
+from modules.wal_archive import configure_sqlite_wal
+with app.app_context():
+    configure_sqlite_wal(db.engine)
 
-app.register_blueprint(analytics_bp)
-app.register_blueprint(notifications_bp)
-app.register_blueprint(bulk_operations_bp)
-app.register_blueprint(auth_bp)
-app.register_blueprint(backup_bp)
+CORS(app, expose_headers=['X-Next-Cursor', 'Link'])
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -41,7 +40,9 @@ class Employee(db.Model):
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
-    department = db.Column(db.String(50), nullable=False)
+    # active_history loads the old value on reassignment, so the onboarding
+    # rollup can also refresh the (department, day) bucket an employee leaves
+    department = db.column_property(db.Column(db.String(50), nullable=False), active_history=True)
     manager_email = db.Column(db.String(100), nullable=False)
     start_date = db.Column(db.Date, nullable=False)
     position = db.Column(db.String(100), nullable=False)
@@ -55,9 +56,17 @@ class Employee(db.Model):
     software_deployed = db.Column(db.Boolean, default=False)
     welcome_email_sent = db.Column(db.Boolean, default=False)
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.column_property(db.Column(db.DateTime, default=datetime.utcnow, index=True), active_history=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_employee_department_created_at', 'department', 'created_at'),
+        # Partial index for delay checks and pending counts over incomplete onboardings
+        db.Index('ix_employee_pending_ad_created_at', 'created_at',
+                 sqlite_where=db.text('ad_account_created = 0'),
+                 postgresql_where=db.text('ad_account_created = false')),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -83,7 +92,7 @@ class Employee(db.Model):
 
 class Equipment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    employee_id = db.Column(db.String(20), db.ForeignKey('employee.employee_id'), nullable=False)
+    employee_id = db.Column(db.String(20), db.ForeignKey('employee.employee_id'), nullable=False, index=True)
     equipment_type = db.Column(db.String(50), nullable=False)
     brand = db.Column(db.String(50), nullable=False)
     model = db.Column(db.String(100), nullable=False)
@@ -111,7 +120,12 @@ class OnboardingLog(db.Model):
     action = db.Column(db.String(100), nullable=False)
     status = db.Column(db.String(20), nullable=False)
     details = db.Column(db.Text, nullable=True)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (
+        db.Index('ix_onboarding_log_employee_id_timestamp', 'employee_id', 'timestamp'),
+        db.Index('ix_onboarding_log_status', 'status'),
+    )
     
     def to_dict(self):
         return {
@@ -128,14 +142,133 @@ def generate_temp_password(length=12):
     password = ''.join(secrets.choice(characters) for _ in range(length))
     return password
 
+# Import and register blueprints (after the models, which the blueprint modules import from here)
+from modules.analytics import analytics_bp
+from modules.notifications import notifications_bp
+from modules.bulk_operations import bulk_operations_bp
+from modules.auth import auth_bp, create_default_admin, role_manager
+from modules.backup_recovery import backup_bp, backup_manager
+from modules.job_queue import jobs_bp, job_queue
+from modules.scheduler import scheduler_bp, scheduler_service
+
+app.register_blueprint(analytics_bp)
+app.register_blueprint(notifications_bp)
+app.register_blueprint(bulk_operations_bp)
+app.register_blueprint(auth_bp)
+app.register_blueprint(backup_bp)
+app.register_blueprint(jobs_bp)
+app.register_blueprint(scheduler_bp)
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def encode_employee_cursor(order, row):
+    """Opaque keyset cursor pointing just past row"""
+    after = [row.created_at.isoformat(), row.id] if order == 'created_at' else [row.id]
+    payload = json.dumps({'order': order, 'after': after}).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+def decode_employee_cursor(cursor, order):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        cursor_order, after = payload['order'], payload['after']
+        if cursor_order == 'created_at':
+            after = (datetime.fromisoformat(after[0]), int(after[1]))
+        else:
+            after = (int(after[0]),)
+    except (ValueError, KeyError, IndexError, TypeError):
+        raise ValueError('Malformed cursor')
+    
+    if cursor_order != order:
+        raise ValueError('Cursor was issued for a different order')
+    return after
+
+def parse_employee_fields(fields_param):
+    """Validate a comma-separated fields= projection against Employee columns"""
+    if not fields_param:
+        return None
+    fields = [name.strip() for name in fields_param.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in Employee.__table__.columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def filter_employees_by_status(query, status):
+    """Apply the dashboard's completed / in-progress / pending status rules"""
+    core_started = db.or_(
+        Employee.ad_account_created == True,
+        Employee.o365_mailbox_created == True,
+        Employee.security_groups_assigned == True
+    )
+    completed = db.and_(
+        Employee.ad_account_created == True,
+        Employee.o365_mailbox_created == True,
+        Employee.security_groups_assigned == True,
+        Employee.equipment_assigned == True,
+        Employee.software_deployed == True,
+        Employee.welcome_email_sent == True
+    )
+    if status == 'completed':
+        return query.filter(completed)
+    if status in ('in-progress', 'in_progress'):
+        return query.filter(core_started, db.not_(completed))
+    if status == 'pending':
+        return query.filter(db.not_(core_started), db.not_(completed))
+    raise ValueError(f"Unknown status filter: {status}")
+
 @app.route('/api/employees', methods=['GET'])
 def get_employees():
-    employees = Employee.query.all()
-    return jsonify([emp.to_dict() for emp in employees])
+    """
+    List employees one keyset page at a time. The body stays a JSON list;
+    X-Next-Cursor and a Link rel=next header point at the following page.
+    """
+    try:
+        limit = min(max(request.args.get('limit', EMPLOYEE_PAGE_SIZE, type=int), 1), EMPLOYEE_MAX_PAGE_SIZE)
+        order = request.args.get('order', 'id')
+        if order not in ('id', 'created_at'):
+            raise ValueError("order must be 'id' or 'created_at'")
+        fields = parse_employee_fields(request.args.get('fields'))
+        cursor = request.args.get('cursor')
+        after = decode_employee_cursor(cursor, order) if cursor else None
+        
+        # Load only the requested columns, plus the keyset columns the cursor needs
+        serializer = serializer_for(Employee, fields)
+        query = serializer.query(*[column for column in (Employee.id, Employee.created_at)
+                                   if column.key not in serializer.fields])
+        
+        if request.args.get('department'):
+            query = query.filter(Employee.department == request.args['department'])
+        if request.args.get('location'):
+            query = query.filter(Employee.location == request.args['location'])
+        if request.args.get('status'):
+            query = filter_employees_by_status(query, request.args['status'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if order == 'created_at':
+        if after:
+            query = query.filter(db.or_(
+                Employee.created_at > after[0],
+                db.and_(Employee.created_at == after[0], Employee.id > after[1])
+            ))
+        query = query.order_by(Employee.created_at, Employee.id)
+    else:
+        if after:
+            query = query.filter(Employee.id > after[0])
+        query = query.order_by(Employee.id)
+    
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    response = json_response(serializer.encode(rows))
+    if has_more:
+        next_cursor = encode_employee_cursor(order, rows[-1])
+        next_url = url_for('get_employees', **dict(request.args.to_dict(), cursor=next_cursor))
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
 
 @app.route('/api/employees', methods=['POST'])
 def create_employee():
@@ -183,8 +316,9 @@ def get_employee(employee_id):
 
 @app.route('/api/employees/<employee_id>/equipment', methods=['GET'])
 def get_employee_equipment(employee_id):
-    equipment = Equipment.query.filter_by(employee_id=employee_id).all()
-    return jsonify([eq.to_dict() for eq in equipment])
+    serializer = serializer_for(Equipment)
+    equipment = serializer.query().filter(Equipment.employee_id == employee_id).all()
+    return json_response(serializer.encode(equipment))
 
 @app.route('/api/employees/<employee_id>/equipment', methods=['POST'])
 def assign_equipment(employee_id):
@@ -225,8 +359,9 @@ def assign_equipment(employee_id):
 
 @app.route('/api/employees/<employee_id>/logs', methods=['GET'])
 def get_employee_logs(employee_id):
-    logs = OnboardingLog.query.filter_by(employee_id=employee_id).order_by(OnboardingLog.timestamp.desc()).all()
-    return jsonify([log.to_dict() for log in logs])
+    serializer = serializer_for(OnboardingLog)
+    logs = serializer.query().filter(OnboardingLog.employee_id == employee_id).order_by(OnboardingLog.timestamp.desc()).all()
+    return json_response(serializer.encode(logs))
 
 @app.route('/api/onboard/<employee_id>', methods=['POST'])
 def start_onboarding(employee_id):
@@ -235,66 +370,96 @@ def start_onboarding(employee_id):
         return jsonify({'error': 'Employee not found'}), 404
     
     try:
-        from modules.ad_integration import create_ad_user
-        from modules.o365_provisioning import create_mailbox
-        from modules.email_automation import send_welcome_email
+        from modules.job_queue import enqueue_onboarding
         
-        temp_password = generate_temp_password()
+        return jsonify(enqueue_onboarding(employee.employee_id)), 202
         
-        ad_result = create_ad_user(employee, temp_password)
-        if ad_result['success']:
-            employee.ad_account_created = True
-            
-        o365_result = create_mailbox(employee)
-        if o365_result['success']:
-            employee.o365_mailbox_created = True
-            
-        email_result = send_welcome_email(employee, temp_password)
-        if email_result['success']:
-            employee.welcome_email_sent = True
-            
-        employee.updated_at = datetime.utcnow()
-        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error queuing onboarding: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/onboard/batch', methods=['POST'])
+def start_batch_onboarding():
+    data = request.get_json() or {}
+    employee_ids = data.get('employee_ids', [])
+    
+    if not employee_ids:
+        return jsonify({'error': 'No employee IDs provided'}), 400
+    
+    employees = Employee.query.filter(Employee.employee_id.in_(employee_ids)).all()
+    found_ids = {emp.employee_id for emp in employees}
+    missing_ids = [emp_id for emp_id in employee_ids if emp_id not in found_ids]
+    
+    try:
+        from modules.job_queue import enqueue_onboarding
+        
+        jobs = [enqueue_onboarding(emp.employee_id) for emp in employees]
         
         return jsonify({
-            'message': 'Onboarding process initiated',
-            'temp_password': temp_password,
-            'ad_result': ad_result,
-            'o365_result': o365_result,
-            'email_result': email_result
-        }), 200
+            'message': f'Onboarding queued for {len(jobs)} employees',
+            'jobs': jobs,
+            'not_found': missing_ids
+        }), 202
         
     except Exception as e:
-        logger.error(f"Error during onboarding: {str(e)}")
+        db.session.rollback()
+        logger.error(f"Error queuing batch onboarding: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/export/csv', methods=['GET'])
 def export_csv():
-    employees = Employee.query.all()
+    from modules.bulk_operations import stream_csv, check_export, EXPORT_BATCH_SIZE
     
-    csv_data = "Employee ID,Name,Email,Department,Start Date,AD Account,O365 Mailbox,Equipment,Software,Welcome Email\n"
+    def to_row(emp):
+        return [emp.employee_id, f"{emp.first_name} {emp.last_name}", emp.email, emp.department,
+                emp.start_date, emp.ad_account_created, emp.o365_mailbox_created,
+                emp.equipment_assigned, emp.software_deployed, emp.welcome_email_sent]
     
-    for emp in employees:
-        csv_data += f"{emp.employee_id},{emp.first_name} {emp.last_name},{emp.email},{emp.department},{emp.start_date},{emp.ad_account_created},{emp.o365_mailbox_created},{emp.equipment_assigned},{emp.software_deployed},{emp.welcome_email_sent}\n"
+    def generate_rows():
+        yield ['Employee ID', 'Name', 'Email', 'Department', 'Start Date', 'AD Account',
+               'O365 Mailbox', 'Equipment', 'Software', 'Welcome Email']
+        
+        for emp in Employee.query.order_by(Employee.id).yield_per(EXPORT_BATCH_SIZE):
+            yield to_row(emp)
     
-    return csv_data, 200, {
-        'Content-Type': 'text/csv',
+    check_export((Employee.query, to_row))
+    return Response(stream_with_context(stream_csv(generate_rows())), mimetype='text/csv', headers={
         'Content-Disposition': 'attachment; filename=onboarding_report.csv'
-    }
+    })
+
+def start_background_services(job_workers=0):
+    """
+    Start this process's share of the background work: the scheduler tick
+    loop (periodic notification and backup jobs, WAL archiving), the
+    notification dispatcher and, optionally, in-process job workers.
+    
+    Every serving process calls this: the development server below, each
+    Gunicorn worker (post_worker_init in gunicorn.conf.py) and worker.py.
+    The scheduler's leader lease makes periodic jobs and WAL archiving run
+    in only one of them at a time, with the others ready to take over.
+    """
+    from modules.notifications import notification_manager
+    
+    with app.app_context():
+        notification_manager.start_scheduler()
+        backup_manager.start_automated_backups()
+        scheduler_service.start(app)
+        job_queue.start_background_workers(app, job_workers)
 
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
         
+        # Bring existing databases up to the current schema (indexes etc.)
+        from modules.migrations import apply_migrations
+        apply_migrations()
+        
         # Initialize default roles and admin user
         role_manager.initialize_default_roles()
         create_default_admin()
-        
-        # Start notification scheduler
-        from modules.notifications import notification_manager
-        notification_manager.start_scheduler()
-        
-        # Start automated backup scheduler
-        backup_manager.start_automated_backups()
-        
+    
+    # Drain the onboarding job queue in-process unless dedicated workers are used
+    start_background_services(int(os.getenv('JOB_WORKERS_IN_PROCESS', 1)))
+    
     app.run(debug=True, host='0.0.0.0', port=5000)
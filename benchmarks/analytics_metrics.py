@@ -0,0 +1,140 @@
+"""
+Benchmark dashboard metric computation: the legacy per-metric COUNT queries
+over the employee table versus the dashboard snapshot read from the
+per-department daily OnboardingRollup table.
+
+Usage: python benchmarks/analytics_metrics.py [employee counts...]
+Defaults to 10000 100000 1000000. Each size is seeded into a fresh SQLite file.
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta, date
+
+DB_DIR = tempfile.mkdtemp(prefix='analytics-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DB_DIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, func, and_
+from app import app, db, Employee, OnboardingLog
+from modules.analytics import analytics_engine
+from modules.onboarding_rollup import rollup_manager
+
+DEPARTMENTS = ['IT', 'HR', 'Finance', 'Marketing', 'Sales', 'Operations', 'Legal', 'Engineering']
+SEED_BATCH = 20000
+LOGS_PER_EMPLOYEE = 2
+
+def seed(count):
+    """Replace table contents with count synthetic employees and their logs"""
+    db.drop_all()
+    db.create_all()
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    for offset in range(0, count, SEED_BATCH):
+        employees = []
+        logs = []
+        for i in range(offset, min(offset + SEED_BATCH, count)):
+            employee_id = f'EMP{i:07d}'
+            created = now - timedelta(days=rng.randint(0, 365))
+            employees.append({
+                'employee_id': employee_id,
+                'first_name': 'Bench',
+                'last_name': str(i),
+                'email': f'bench{i}@company.com',
+                'department': rng.choice(DEPARTMENTS),
+                'manager_email': 'manager@company.com',
+                'start_date': date.today(),
+                'position': 'Engineer',
+                'location': 'HQ',
+                'ad_account_created': rng.random() < 0.9,
+                'o365_mailbox_created': rng.random() < 0.85,
+                'security_groups_assigned': rng.random() < 0.85,
+                'equipment_assigned': rng.random() < 0.7,
+                'software_deployed': rng.random() < 0.7,
+                'welcome_email_sent': rng.random() < 0.8,
+                'created_at': created,
+                'updated_at': created + timedelta(days=rng.randint(0, 10))
+            })
+            for _ in range(LOGS_PER_EMPLOYEE):
+                logs.append({
+                    'employee_id': employee_id,
+                    'action': 'Benchmark',
+                    'status': 'Error' if rng.random() < 0.05 else 'Success',
+                    'timestamp': created
+                })
+        db.session.bulk_insert_mappings(Employee, employees)
+        db.session.bulk_insert_mappings(OnboardingLog, logs)
+        db.session.commit()
+
+    # Bulk inserts skip the flush hooks that maintain the rollup
+    rollup_manager.rebuild()
+
+def legacy_metrics():
+    """The pre-consolidation queries: separate COUNT scans per metric"""
+    core_provisioned = and_(
+        Employee.ad_account_created == True,
+        Employee.o365_mailbox_created == True,
+        Employee.security_groups_assigned == True
+    )
+    total_employees = Employee.query.count()
+    completed = Employee.query.filter(
+        core_provisioned,
+        Employee.equipment_assigned == True,
+        Employee.software_deployed == True,
+        Employee.welcome_email_sent == True
+    ).count()
+    departments = db.session.query(
+        Employee.department,
+        func.count(Employee.id),
+        func.sum(Employee.ad_account_created.cast(db.Integer)),
+        func.sum(Employee.o365_mailbox_created.cast(db.Integer)),
+        func.sum(Employee.equipment_assigned.cast(db.Integer))
+    ).group_by(Employee.department).all()
+    avg_days = db.session.query(
+        func.avg(func.julianday(Employee.updated_at) - func.julianday(Employee.created_at))
+    ).filter(core_provisioned).scalar()
+    error_logs = OnboardingLog.query.filter(OnboardingLog.status == 'Error').count()
+    total_logs = OnboardingLog.query.count()
+    return total_employees, completed, departments, avg_days, error_logs, total_logs
+
+def rollup_metrics():
+    """The snapshot read from the rollup, bypassing the cache"""
+    return analytics_engine._compute_dashboard_snapshot()
+
+def measure(compute, repeat=3):
+    """Return (queries per run, best wall time in seconds)"""
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count_statement)
+    try:
+        timings = []
+        for _ in range(repeat):
+            statements.clear()
+            start = time.perf_counter()
+            compute()
+            timings.append(time.perf_counter() - start)
+            db.session.rollback()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_statement)
+
+    return len(statements), min(timings)
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+
+    print(f"{'employees':>10} {'variant':>13} {'queries':>8} {'seconds':>9}")
+    with app.app_context():
+        for size in sizes:
+            seed(size)
+            for name, compute in (('legacy', legacy_metrics), ('rollup', rollup_metrics)):
+                queries, seconds = measure(compute)
+                print(f"{size:>10} {name:>13} {queries:>8} {seconds:>9.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Micro-benchmark notification email rendering for 10k messages:
+reading the template file and calling str.format per message (the old
+_render_email_template) versus the compiled TemplateRegistry, one
+render() per message and one render_many() for the whole batch, and
+the same template ported to Jinja2 with a bytecode cache and auto_reload.
+
+Usage: python benchmarks/email_templates.py [renders]
+"""
+import os
+import sys
+import time
+import string
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from modules.template_registry import TemplateRegistry
+
+REPEAT = 5
+TEMPLATE_NAME = 'onboarding_delayed.html'
+
+# Roughly the size of a styled HTML notification
+TEMPLATE = """<html>
+<head><style>
+{{ body {{ font-family: Arial, sans-serif; color: #333; }} }}
+""" + "".join(f".section-{i} {{{{ margin: 0 0 12px 0; padding: 8px; border-left: 3px solid #0a6; }}}}\n" for i in range(40)) + """
+</style></head>
+<body>
+    <h2>Onboarding delayed: {employee_name}</h2>
+    <p>The onboarding for <strong>{employee_name}</strong> ({employee_id}) has not completed.</p>
+    <table>
+        <tr><td>Start date</td><td>{start_date}</td></tr>
+        <tr><td>Days delayed</td><td>{days_delayed:>3}</td></tr>
+    </table>
+""" + "".join(f"    <p class=\"section-{i}\">Checklist item {i} is still pending for this employee.</p>\n" for i in range(40)) + """
+</body>
+</html>
+"""
+
+def rows(count):
+    return [{
+        'employee_name': f'Bench User {i}',
+        'employee_id': f'EMP{i:07d}',
+        'start_date': '2024-01-01',
+        'days_delayed': i % 30
+    } for i in range(count)]
+
+def read_and_format(path):
+    def run(data):
+        results = []
+        for row in data:
+            with open(path, 'r', encoding='utf-8') as f:
+                results.append(f.read().format(**row))
+        return results
+    return run
+
+def registry_render(registry):
+    def run(data):
+        return [registry.render(TEMPLATE_NAME, row) for row in data]
+    return run
+
+def registry_render_many(registry):
+    def run(data):
+        return registry.render_many(TEMPLATE_NAME, data)
+    return run
+
+def to_jinja(source):
+    """Port a str.format template to Jinja2 syntax with identical output"""
+    parts = []
+    for literal, field_name, spec, conversion in string.Formatter().parse(source):
+        parts.append(literal)
+        if field_name is None:
+            continue
+        if spec:
+            parts.append(f"{{{{ '{{:{spec}}}'.format({field_name}) }}}}")
+        else:
+            parts.append(f"{{{{ {field_name} }}}}")
+    return ''.join(parts)
+
+def jinja_render(environment):
+    def run(data):
+        return [environment.get_template(TEMPLATE_NAME).render(row) for row in data]
+    return run
+
+def measure(run, data):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        output = run(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings), output
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    data = rows(count)
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        path = os.path.join(base_dir, TEMPLATE_NAME)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(TEMPLATE)
+
+        jinja_dir = os.path.join(base_dir, 'jinja')
+        os.makedirs(os.path.join(jinja_dir, 'cache'))
+        with open(os.path.join(jinja_dir, TEMPLATE_NAME), 'w', encoding='utf-8') as f:
+            f.write(to_jinja(TEMPLATE))
+        environment = Environment(
+            loader=FileSystemLoader(jinja_dir),
+            bytecode_cache=FileSystemBytecodeCache(os.path.join(jinja_dir, 'cache')),
+            auto_reload=True,
+            keep_trailing_newline=True
+        )
+        
+        registry = TemplateRegistry(base_dir)
+        variants = [
+            ('file read + str.format', read_and_format(path)),
+            ('registry.render', registry_render(registry)),
+            ('registry.render_many', registry_render_many(registry)),
+            ('jinja2 + bytecode cache', jinja_render(environment))
+        ]
+
+        print(f"template: {len(TEMPLATE)} bytes, {count} renders")
+        print(f"{'variant':<24} {'seconds':>8} {'renders/sec':>12}")
+        baseline = None
+        for name, run in variants:
+            seconds, output = measure(run, data)
+            if baseline is None:
+                baseline = output
+            elif output != baseline:
+                raise SystemExit(f"{name} produced different output")
+            print(f"{name:<24} {seconds:>8.3f} {count / seconds:>12.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Micro-benchmark list endpoint serialization for a 10k-row payload:
+ORM objects + to_dict() + jsonify versus column tuples encoded by
+modules.serialization with the stdlib json and (if installed) orjson backends.
+
+Usage: python benchmarks/serialization.py [rows]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta, date
+
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import jsonify
+from app import app, db, Employee
+from modules.serialization import serializer_for, dumps, JSON_BACKENDS
+
+REPEAT = 5
+
+def seed(count):
+    now = datetime.utcnow()
+    db.session.bulk_insert_mappings(Employee, [{
+        'employee_id': f'EMP{i:07d}',
+        'first_name': 'Bench',
+        'last_name': str(i),
+        'email': f'bench{i}@company.com',
+        'department': 'IT',
+        'manager_email': 'manager@company.com',
+        'start_date': date.today(),
+        'position': 'Engineer',
+        'location': 'HQ',
+        'phone': '555-0100',
+        'ad_account_created': i % 2 == 0,
+        'created_at': now - timedelta(minutes=i),
+        'updated_at': now
+    } for i in range(count)])
+    db.session.commit()
+
+def to_dict_jsonify():
+    employees = Employee.query.all()
+    return jsonify([emp.to_dict() for emp in employees]).get_data()
+
+def column_tuples(backend):
+    serializer = serializer_for(Employee)
+    def run():
+        return dumps(serializer.encode(serializer.query().all()), backend)
+    return run
+
+def measure(run):
+    timings = []
+    for _ in range(REPEAT):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        payload = run()
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(payload)
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    variants = [('to_dict + jsonify', to_dict_jsonify)]
+    variants.extend((f'column tuples + {backend}', column_tuples(backend)) for backend in JSON_BACKENDS)
+
+    with app.app_context():
+        db.create_all()
+        seed(rows)
+
+        print(f"{'variant':<26} {'seconds':>8} {'rows/sec':>10} {'bytes':>10}")
+        for name, run in variants:
+            seconds, size = measure(run)
+            print(f"{name:<26} {seconds:>8.3f} {rows / seconds:>10.0f} {size:>10}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+"""
+Gunicorn settings for the web tier: gunicorn -c gunicorn.conf.py app:app
+
+Each worker starts the scheduler, notification dispatcher and WAL archiver
+once it has loaded the app; only the scheduler leader runs periodic jobs
+and archives the WAL.
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+
+def post_worker_init(worker):
+    from app import start_background_services
+    start_background_services(int(os.getenv('JOB_WORKERS_IN_PROCESS', 1)))
+
+def worker_exit(server, worker):
+    # Hand leadership (and with it WAL archiving) over now rather than when the lease expires
+    from modules.scheduler import scheduler_service
+    from modules.backup_recovery import backup_manager
+    backup_manager.wal_archiver.stop()
+    scheduler_service.stop()
@@ -1,7 +1,9 @@
 import os
+import json
 import subprocess
 import logging
 from datetime import datetime
+from modules.powershell_pool import powershell_pool
 
 logger = logging.getLogger(__name__)
 
@@ -12,20 +14,15 @@ def create_ad_user(employee, temp_password):
     try:
         script_path = os.path.join(os.path.dirname(__file__), 'scripts', 'create_ad_user.ps1')
         
-        cmd = [
-            'powershell.exe',
-            '-ExecutionPolicy', 'Bypass',
-            '-File', script_path,
-            '-EmployeeID', employee.employee_id,
-            '-FirstName', employee.first_name,
-            '-LastName', employee.last_name,
-            '-Email', employee.email,
-            '-Department', employee.department,
-            '-Password', temp_password,
-            '-OU', f"OU={employee.department},OU=Users,{os.getenv('AD_BASE_DN')}"
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        result = powershell_pool.run_script(script_path, {
+            'EmployeeID': employee.employee_id,
+            'FirstName': employee.first_name,
+            'LastName': employee.last_name,
+            'Email': employee.email,
+            'Department': employee.department,
+            'Password': temp_password,
+            'OU': f"OU={employee.department},OU=Users,{os.getenv('AD_BASE_DN')}"
+        }, timeout=60)
         
         if result.returncode == 0:
             logger.info(f"Successfully created AD user for {employee.employee_id}")
@@ -57,6 +54,124 @@ def create_ad_user(employee, temp_password):
             'error': str(e)
         }
 
+def reset_ad_password(employee, temp_password):
+    """
+    Reset an existing account to a new temporary password, e.g. when a
+    retried onboarding job has to send credentials again
+    """
+    try:
+        script_path = os.path.join(os.path.dirname(__file__), 'scripts', 'reset_ad_password.ps1')
+        
+        result = powershell_pool.run_script(script_path, {
+            'EmployeeID': employee.employee_id,
+            'Password': temp_password
+        }, timeout=60)
+        
+        if result.returncode == 0:
+            logger.info(f"Reset AD password for {employee.employee_id}")
+            return {
+                'success': True,
+                'message': 'AD password reset successfully',
+                'output': result.stdout
+            }
+        else:
+            logger.error(f"Failed to reset AD password: {result.stderr}")
+            return {
+                'success': False,
+                'message': 'Failed to reset AD password',
+                'error': result.stderr
+            }
+            
+    except subprocess.TimeoutExpired:
+        logger.error("AD password reset timed out")
+        return {
+            'success': False,
+            'message': 'AD password reset timed out',
+            'error': 'Timeout'
+        }
+    except Exception as e:
+        logger.error(f"Error resetting AD password: {str(e)}")
+        return {
+            'success': False,
+            'message': 'Error resetting AD password',
+            'error': str(e)
+        }
+
+def create_ad_users_batch(jobs):
+    """
+    Create Active Directory accounts for a list of (employee, temp_password)
+    pairs in a single script run, returning per-employee results
+    """
+    employee_ids = [employee.employee_id for employee, _ in jobs]
+    
+    try:
+        script_path = os.path.join(os.path.dirname(__file__), 'scripts', 'create_ad_users_batch.ps1')
+        
+        employees = [{
+            'EmployeeID': employee.employee_id,
+            'FirstName': employee.first_name,
+            'LastName': employee.last_name,
+            'Email': employee.email,
+            'Department': employee.department,
+            'Password': temp_password,
+            'OU': f"OU={employee.department},OU=Users,{os.getenv('AD_BASE_DN')}"
+        } for employee, temp_password in jobs]
+        
+        parameters = {'EmployeesJson': json.dumps(employees)}
+        if os.getenv('AD_SERVER'):
+            parameters['Server'] = os.getenv('AD_SERVER')
+        
+        result = powershell_pool.run_script(script_path, parameters, timeout=max(60, 2 * len(jobs)))
+        
+        results = {}
+        for line in result.stdout.splitlines():
+            line = line.strip()
+            if line.startswith('RESULT:'):
+                entry = json.loads(line[len('RESULT:'):])
+                results[entry['employee_id']] = {
+                    'success': bool(entry.get('success')),
+                    'message': entry.get('message', '')
+                }
+        
+        for employee_id in employee_ids:
+            if employee_id not in results:
+                results[employee_id] = {
+                    'success': False,
+                    'message': 'No result returned for employee',
+                    'error': result.stderr or 'Missing result'
+                }
+        
+        created = sum(1 for entry in results.values() if entry['success'])
+        failed = len(employee_ids) - created
+        
+        if failed:
+            logger.error(f"AD batch finished with {failed} failures out of {len(employee_ids)}")
+        else:
+            logger.info(f"Successfully created {created} AD users in one batch")
+        
+        return {
+            'success': failed == 0,
+            'message': f'{created} AD users created, {failed} failed',
+            'created': created,
+            'failed': failed,
+            'results': results
+        }
+        
+    except subprocess.TimeoutExpired:
+        logger.error("AD batch user creation timed out")
+        error = {'success': False, 'message': 'AD batch user creation timed out', 'error': 'Timeout'}
+    except Exception as e:
+        logger.error(f"Error creating AD users in batch: {str(e)}")
+        error = {'success': False, 'message': 'Error creating AD users in batch', 'error': str(e)}
+    
+    return {
+        'success': False,
+        'message': error['message'],
+        'created': 0,
+        'failed': len(employee_ids),
+        'results': {employee_id: dict(error) for employee_id in employee_ids}
+    }
+
 def assign_security_groups(employee):
     """
     Assign security groups based on department
@@ -74,15 +189,10 @@ def assign_security_groups(employee):
         
         groups = department_groups.get(employee.department, ['General-Users'])
         
-        cmd = [
-            'powershell.exe',
-            '-ExecutionPolicy', 'Bypass',
-            '-File', script_path,
-            '-EmployeeID', employee.employee_id,
-            '-Groups', ','.join(groups)
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        result = powershell_pool.run_script(script_path, {
+            'EmployeeID': employee.employee_id,
+            'Groups': ','.join(groups)
+        }, timeout=60)
         
         if result.returncode == 0:
             logger.info(f"Successfully assigned security groups for {employee.employee_id}")
@@ -125,15 +235,10 @@ def create_shared_drive_access(employee):
         
         drives = department_drives.get(employee.department, ['\\\\server\\General$'])
         
-        cmd = [
-            'powershell.exe',
-            '-ExecutionPolicy', 'Bypass',
-            '-File', script_path,
-            '-EmployeeID', employee.employee_id,
-            '-Drives', ','.join(drives)
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        result = powershell_pool.run_script(script_path, {
+            'EmployeeID': employee.employee_id,
+            'Drives': ','.join(drives)
+        }, timeout=60)
         
         if result.returncode == 0:
             logger.info(f"Successfully created shared drive access for {employee.employee_id}")
@@ -1,44 +1,172 @@
 import os
 import json
+import time
 import logging
+import threading
 from datetime import datetime, timedelta
 from flask import Blueprint, render_template, jsonify, request
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, case, event
+from app import db, Employee, Equipment, OnboardingLog
+from modules.onboarding_rollup import OnboardingRollup, rollup_manager
 
 analytics_bp = Blueprint('analytics', __name__, url_prefix='/analytics')
 logger = logging.getLogger(__name__)
 
+# Metric families that depend on each model, used for cache invalidation
+MODEL_CACHE_FAMILIES = {
+    Employee: ('dashboard', 'time_series'),
+    Equipment: ('equipment',),
+    OnboardingLog: ('dashboard',)
+}
+
+def _count_where(condition):
+    """Conditional aggregate: number of rows matching condition"""
+    return func.sum(case((condition, 1), else_=0))
+
+def _rate(part, total):
+    return round((part / total * 100) if total else 0, 2)
+
 class AnalyticsEngine:
     def __init__(self):
         self.metrics_cache = {}
-        self.cache_duration = 300  # 5 minutes
+        self.cache_duration = int(os.getenv('ANALYTICS_CACHE_TTL', 300))  # 5 minutes
+        self.cache_lock = threading.Lock()
+        self.cache_generations = {}
+        self.cache_stats = {}
     
-    def get_onboarding_metrics(self, db, Employee):
-        """Get comprehensive onboarding metrics"""
-        try:
-            total_employees = Employee.query.count()
+    def _cached(self, family, params, compute):
+        """Return a cached metric value, computing it on miss or expiry"""
+        key = (family, params)
+        now = time.monotonic()
+        
+        with self.cache_lock:
+            stats = self.cache_stats.setdefault(family, {'hits': 0, 'misses': 0, 'invalidations': 0})
+            generation = self.cache_generations.get(family, 0)
+            entry = self.metrics_cache.get(key)
             
-            completed_onboardings = Employee.query.filter(
-                and_(
-                    Employee.ad_account_created == True,
-                    Employee.o365_mailbox_created == True,
-                    Employee.security_groups_assigned == True,
-                    Employee.equipment_assigned == True,
-                    Employee.software_deployed == True,
-                    Employee.welcome_email_sent == True
-                )
-            ).count()
+            if entry and entry['expires_at'] > now and entry['generation'] == generation:
+                stats['hits'] += 1
+                return entry['value']
             
-            pending_onboardings = total_employees - completed_onboardings
+            stats['misses'] += 1
+        
+        value = compute()
+        
+        with self.cache_lock:
+            # Skip storing if a write invalidated the family while we computed
+            if self.cache_generations.get(family, 0) == generation:
+                self.metrics_cache[key] = {
+                    'value': value,
+                    'expires_at': now + self.cache_duration,
+                    'generation': generation
+                }
+        
+        return value
+    
+    def invalidate(self, *families):
+        """Drop cached values for the given metric families (all if none given)"""
+        with self.cache_lock:
+            targets = families or tuple(self.cache_stats) or tuple({key[0] for key in self.metrics_cache})
+            for family in targets:
+                self.cache_generations[family] = self.cache_generations.get(family, 0) + 1
+                stats = self.cache_stats.setdefault(family, {'hits': 0, 'misses': 0, 'invalidations': 0})
+                stats['invalidations'] += 1
             
-            success_rate = (completed_onboardings / total_employees * 100) if total_employees > 0 else 0
+            for key in [key for key in self.metrics_cache if key[0] in targets]:
+                del self.metrics_cache[key]
+    
+    def invalidate_for_models(self, *models):
+        """Drop cached metrics that depend on the given models"""
+        families = set()
+        for model in models:
+            families.update(MODEL_CACHE_FAMILIES.get(model, ()))
+        if families:
+            self.invalidate(*families)
+    
+    def get_cache_stats(self):
+        """Get cache hit/miss counters per metric family"""
+        with self.cache_lock:
+            families = {}
+            for family, stats in self.cache_stats.items():
+                lookups = stats['hits'] + stats['misses']
+                families[family] = dict(stats, hit_rate=round(stats['hits'] / lookups * 100, 2) if lookups else 0)
             
             return {
+                'ttl_seconds': self.cache_duration,
+                'entries': len(self.metrics_cache),
+                'families': families
+            }
+    
+    def get_dashboard_snapshot(self):
+        """Get onboarding, department and performance metrics from one cached computation"""
+        return self._cached('dashboard', (), self._compute_dashboard_snapshot)
+    
+    def _compute_dashboard_snapshot(self):
+        """
+        Derive onboarding totals, per-department rates and performance metrics
+        from the per-department/per-day rollup and one scan of onboarding logs
+        """
+        rollup_manager.ensure_built()
+        
+        dept_stats = db.session.query(
+            OnboardingRollup.department,
+            func.sum(OnboardingRollup.employees).label('total'),
+            func.sum(OnboardingRollup.ad_account_created).label('ad_completed'),
+            func.sum(OnboardingRollup.o365_mailbox_created).label('o365_completed'),
+            func.sum(OnboardingRollup.equipment_assigned).label('equipment_completed'),
+            func.sum(OnboardingRollup.fully_onboarded).label('fully_onboarded'),
+            func.sum(OnboardingRollup.core_provisioned).label('core_provisioned'),
+            func.sum(OnboardingRollup.core_provisioning_days).label('core_provisioning_days')
+        ).group_by(OnboardingRollup.department).all()
+        
+        log_stats = db.session.query(
+            func.count(OnboardingLog.id).label('total'),
+            _count_where(OnboardingLog.status == 'Error').label('errors')
+        ).one()
+        
+        total_employees = 0
+        completed_onboardings = 0
+        core_provisioned_count = 0
+        total_provisioning_days = 0
+        breakdown = []
+        
+        for dept in dept_stats:
+            total_employees += dept.total
+            completed_onboardings += dept.fully_onboarded or 0
+            core_provisioned_count += dept.core_provisioned or 0
+            total_provisioning_days += dept.core_provisioning_days or 0
+            
+            breakdown.append({
+                'department': dept.department,
+                'total': dept.total,
+                'ad_completion_rate': _rate(dept.ad_completed or 0, dept.total),
+                'o365_completion_rate': _rate(dept.o365_completed or 0, dept.total),
+                'equipment_completion_rate': _rate(dept.equipment_completed or 0, dept.total)
+            })
+        
+        total_logs = log_stats.total or 0
+        error_logs = log_stats.errors or 0
+        
+        return {
+            'onboarding': {
                 'total_employees': total_employees,
                 'completed_onboardings': completed_onboardings,
-                'pending_onboardings': pending_onboardings,
-                'success_rate': round(success_rate, 2)
+                'pending_onboardings': total_employees - completed_onboardings,
+                'success_rate': _rate(completed_onboardings, total_employees)
+            },
+            'departments': breakdown,
+            'performance': {
+                'avg_completion_days': round(total_provisioning_days / core_provisioned_count, 2) if core_provisioned_count else 0,
+                'error_rate': _rate(error_logs, total_logs),
+                'total_logs': total_logs,
+                'error_logs': error_logs
             }
+        }
+    
+    def get_onboarding_metrics(self):
+        """Get comprehensive onboarding metrics"""
+        try:
+            return self.get_dashboard_snapshot()['onboarding']
         except Exception as e:
             logger.error(f"Error getting onboarding metrics: {str(e)}")
             return {}
@@ -46,25 +174,7 @@ class AnalyticsEngine:
     def get_department_breakdown(self):
         """Get department-wise statistics"""
         try:
-            dept_stats = db.session.query(
-                Employee.department,
-                func.count(Employee.id).label('total'),
-                func.sum(Employee.ad_account_created.cast(db.Integer)).label('ad_completed'),
-                func.sum(Employee.o365_mailbox_created.cast(db.Integer)).label('o365_completed'),
-                func.sum(Employee.equipment_assigned.cast(db.Integer)).label('equipment_completed')
-            ).group_by(Employee.department).all()
-            
-            breakdown = []
-            for dept in dept_stats:
-                breakdown.append({
-                    'department': dept.department,
-                    'total': dept.total,
-                    'ad_completion_rate': round((dept.ad_completed / dept.total * 100) if dept.total > 0 else 0, 2),
-                    'o365_completion_rate': round((dept.o365_completed / dept.total * 100) if dept.total > 0 else 0, 2),
-                    'equipment_completion_rate': round((dept.equipment_completed / dept.total * 100) if dept.total > 0 else 0, 2)
-                })
-            
-            return breakdown
+            return self.get_dashboard_snapshot()['departments']
         except Exception as e:
             logger.error(f"Error getting department breakdown: {str(e)}")
             return []
@@ -72,93 +182,95 @@ class AnalyticsEngine:
     def get_time_series_data(self, days=30):
         """Get time series data for trends"""
         try:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            
-            daily_stats = db.session.query(
-                func.date(Employee.created_at).label('date'),
-                func.count(Employee.id).label('employees_added'),
-                func.sum(Employee.ad_account_created.cast(db.Integer)).label('ad_completed'),
-                func.sum(Employee.o365_mailbox_created.cast(db.Integer)).label('o365_completed')
-            ).filter(
-                Employee.created_at >= start_date
-            ).group_by(
-                func.date(Employee.created_at)
-            ).order_by('date').all()
-            
-            time_series = []
-            for stat in daily_stats:
-                time_series.append({
-                    'date': stat.date.isoformat(),
-                    'employees_added': stat.employees_added,
-                    'ad_completed': stat.ad_completed,
-                    'o365_completed': stat.o365_completed
-                })
-            
-            return time_series
+            return self._cached('time_series', (days,), lambda: self._compute_time_series_data(days))
         except Exception as e:
             logger.error(f"Error getting time series data: {str(e)}")
             return []
     
+    def _compute_time_series_data(self, days):
+        rollup_manager.ensure_built()
+        start_date = (datetime.utcnow() - timedelta(days=days)).date()
+        
+        daily_stats = db.session.query(
+            OnboardingRollup.day,
+            func.sum(OnboardingRollup.employees).label('employees_added'),
+            func.sum(OnboardingRollup.ad_account_created).label('ad_completed'),
+            func.sum(OnboardingRollup.o365_mailbox_created).label('o365_completed')
+        ).filter(
+            OnboardingRollup.day >= start_date
+        ).group_by(
+            OnboardingRollup.day
+        ).order_by(OnboardingRollup.day).all()
+        
+        time_series = []
+        for stat in daily_stats:
+            time_series.append({
+                'date': stat.day.isoformat(),
+                'employees_added': stat.employees_added,
+                'ad_completed': stat.ad_completed,
+                'o365_completed': stat.o365_completed
+            })
+        
+        return time_series
+    
     def get_equipment_statistics(self):
         """Get equipment statistics"""
         try:
-            total_equipment = Equipment.query.count()
-            assigned_equipment = Equipment.query.filter(Equipment.status == 'Assigned').count()
-            available_equipment = Equipment.query.filter(Equipment.status == 'Available').count()
-            
-            equipment_by_type = db.session.query(
-                Equipment.equipment_type,
-                func.count(Equipment.id).label('count')
-            ).group_by(Equipment.equipment_type).all()
-            
-            equipment_breakdown = [{'type': eq.equipment_type, 'count': eq.count} for eq in equipment_by_type]
-            
-            return {
-                'total_equipment': total_equipment,
-                'assigned_equipment': assigned_equipment,
-                'available_equipment': available_equipment,
-                'utilization_rate': round((assigned_equipment / total_equipment * 100) if total_equipment > 0 else 0, 2),
-                'equipment_breakdown': equipment_breakdown
-            }
+            return self._cached('equipment', (), self._compute_equipment_statistics)
         except Exception as e:
             logger.error(f"Error getting equipment statistics: {str(e)}")
             return {}
     
+    def _compute_equipment_statistics(self):
+        equipment_by_type = db.session.query(
+            Equipment.equipment_type,
+            func.count(Equipment.id).label('count'),
+            _count_where(Equipment.status == 'Assigned').label('assigned'),
+            _count_where(Equipment.status == 'Available').label('available')
+        ).group_by(Equipment.equipment_type).all()
+        
+        total_equipment = sum(eq.count for eq in equipment_by_type)
+        assigned_equipment = sum(eq.assigned or 0 for eq in equipment_by_type)
+        available_equipment = sum(eq.available or 0 for eq in equipment_by_type)
+        
+        equipment_breakdown = [{'type': eq.equipment_type, 'count': eq.count} for eq in equipment_by_type]
+        
+        return {
+            'total_equipment': total_equipment,
+            'assigned_equipment': assigned_equipment,
+            'available_equipment': available_equipment,
+            'utilization_rate': _rate(assigned_equipment, total_equipment),
+            'equipment_breakdown': equipment_breakdown
+        }
+    
     def get_performance_metrics(self):
         """Get system performance metrics"""
         try:
-            avg_completion_time = db.session.query(
-                func.avg(
-                    func.julianday(Employee.updated_at) - func.julianday(Employee.created_at)
-                )
-            ).filter(
-                Employee.ad_account_created == True,
-                Employee.o365_mailbox_created == True,
-                Employee.security_groups_assigned == True
-            ).scalar()
-            
-            avg_completion_days = round(avg_completion_time, 2) if avg_completion_time else 0
-            
-            error_logs = OnboardingLog.query.filter(
-                OnboardingLog.status == 'Error'
-            ).count()
-            
-            total_logs = OnboardingLog.query.count()
-            error_rate = round((error_logs / total_logs * 100) if total_logs > 0 else 0, 2)
-            
-            return {
-                'avg_completion_days': avg_completion_days,
-                'error_rate': error_rate,
-                'total_logs': total_logs,
-                'error_logs': error_logs
-            }
+            return self.get_dashboard_snapshot()['performance']
         except Exception as e:
             logger.error(f"Error getting performance metrics: {str(e)}")
             return {}
 
 analytics_engine = AnalyticsEngine()
 
+@event.listens_for(db.session, 'after_flush')
+def _track_analytics_writes(session, flush_context):
+    """Remember which metric families the pending transaction touches"""
+    families = session.info.setdefault('analytics_dirty_families', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        families.update(MODEL_CACHE_FAMILIES.get(type(obj), ()))
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_analytics_cache(session):
+    """Invalidate cached metrics once written data is visible to readers"""
+    families = session.info.pop('analytics_dirty_families', None)
+    if families:
+        analytics_engine.invalidate(*families)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_analytics_writes(session):
+    session.info.pop('analytics_dirty_families', None)
+
 @analytics_bp.route('/dashboard')
 def analytics_dashboard():
     """Analytics dashboard page"""
@@ -206,6 +318,23 @@ def get_trends():
             'error': str(e)
         }), 500
 
+@analytics_bp.route('/api/cache')
+def get_cache_status():
+    """Get analytics cache hit/miss counters"""
+    return jsonify({
+        'success': True,
+        'cache': analytics_engine.get_cache_stats()
+    })
+
+@analytics_bp.route('/api/cache/invalidate', methods=['POST'])
+def invalidate_cache():
+    """Drop all cached analytics metrics"""
+    analytics_engine.invalidate()
+    return jsonify({
+        'success': True,
+        'message': 'Analytics cache invalidated'
+    })
+
 @analytics_bp.route('/api/export/analytics')
 def export_analytics():
     """Export analytics data as CSV"""
@@ -231,3 +360,10 @@ def export_analytics():
     except Exception as e:
         logger.error(f"Error exporting analytics: {str(e)}")
         return jsonify({'error': str(e)}), 500
+
+@analytics_bp.cli.command('rebuild-rollup')
+def rebuild_rollup_command():
+    """Recompute the onboarding rollup table from employee records"""
+    buckets = rollup_manager.rebuild()
+    analytics_engine.invalidate()
+    print(f"Onboarding rollup rebuilt: {buckets} department/day buckets")
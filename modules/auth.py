@@ -5,6 +5,7 @@ from flask import Blueprint, request, jsonify, session, redirect, url_for
 from functools import wraps
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
+from modules.serialization import serializer_for, json_response
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 logger = logging.getLogger(__name__)
@@ -44,6 +45,9 @@ class User(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+# Columns exposed by User.to_dict() and the user list (never the password hash)
+USER_PUBLIC_FIELDS = ('id', 'username', 'email', 'role', 'department', 'is_active', 'last_login', 'created_at')
+
 class Role(db.Model):
     __tablename__ = 'roles'
     
@@ -354,11 +358,12 @@ def get_profile():
 def get_users():
     """Get all users (admin only)"""
     try:
-        users = User.query.all()
+        serializer = serializer_for(User, USER_PUBLIC_FIELDS)
+        users = serializer.query().order_by(User.id).all()
         
-        return jsonify({
+        return json_response({
             'success': True,
-            'users': [user.to_dict() for user in users]
+            'users': serializer.encode(users)
         })
         
     except Exception as e:
@@ -370,11 +375,12 @@ def get_users():
 def get_roles():
     """Get all roles (admin only)"""
     try:
-        roles = Role.query.all()
+        serializer = serializer_for(Role)
+        roles = serializer.query().order_by(Role.id).all()
         
-        return jsonify({
+        return json_response({
             'success': True,
-            'roles': [role.to_dict() for role in roles]
+            'roles': serializer.encode(roles)
         })
         
     except Exception as e:
@@ -386,11 +392,12 @@ def get_roles():
 def get_permissions():
     """Get all permissions (admin only)"""
     try:
-        permissions = Permission.query.all()
+        serializer = serializer_for(Permission)
+        permissions = serializer.query().order_by(Permission.id).all()
         
-        return jsonify({
+        return json_response({
             'success': True,
-            'permissions': [perm.to_dict() for perm in permissions]
+            'permissions': serializer.encode(permissions)
         })
         
     except Exception as e:
@@ -0,0 +1,102 @@
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: only threads of this process are serialised
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class BackupCatalog:
+    """
+    JSON index of every backup with its type, size, checksum, record
+    counts and timings, so listing backups and applying retention never
+    open or stat the archives themselves. Writers rewrite the file
+    atomically under a lock; readers reuse the parsed entries until the
+    file changes.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._cache = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _read(self):
+        """Entries, newest first; one stat when the cached copy is current"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._cache
+        if cached and cached[0] == key:
+            return cached[1]
+
+        with open(self.path, 'r') as f:
+            entries = json.load(f)['backups']
+        self._cache = (key, entries)
+        return entries
+
+    @contextmanager
+    def _locked(self):
+        with self.lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.path}.lock", 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, entries):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'updated_at': datetime.now().isoformat(), 'backups': entries}, f, indent=2)
+        os.replace(temp_path, self.path)
+
+        stat = os.stat(self.path)
+        self._cache = ((stat.st_mtime_ns, stat.st_size), entries)
+
+    def _update(self, change):
+        with self._locked():
+            entries = change(list(self._read()))
+            entries.sort(key=lambda entry: entry['created_at'], reverse=True)
+            self._write(entries)
+            return entries
+
+    def add(self, entry):
+        """Add or replace the entry with the same name"""
+        self._update(lambda entries: [e for e in entries if e['name'] != entry['name']] + [entry])
+
+    def remove(self, names):
+        """Drop entries by name"""
+        names = set(names)
+        if names:
+            self._update(lambda entries: [e for e in entries if e['name'] not in names])
+
+    def replace_all(self, entries):
+        """Overwrite the catalog, e.g. after rebuilding it from the backup directory"""
+        self._update(lambda _: list(entries))
+
+    def entries(self, storage=None):
+        """Catalog entries, newest first, optionally only one storage kind"""
+        entries = self._read()
+        if storage is None:
+            return list(entries)
+        return [entry for entry in entries if entry['storage'] == storage]
+
+    def get(self, name):
+        for entry in self._read():
+            if entry['name'] == name:
+                return entry
+        return None
@@ -3,59 +3,119 @@ import shutil
 import sqlite3
 import json
 import logging
+import io
+import hashlib
 import zipfile
-import schedule
-import threading
+import tarfile
 import time
+import click
 from datetime import datetime, timedelta
-from flask import Blueprint, request, jsonify, send_file
-from app import db, Employee, Equipment, OnboardingLog, User, Role, Permission, UserSession
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from flask import Blueprint, request, jsonify, send_file, render_template
+from app import db, Employee, Equipment, OnboardingLog
+from modules.auth import User, Role, Permission, UserSession
+from modules.scheduler import scheduler_service
+from modules.chunk_store import ChunkStore
+from modules.wal_archive import WalArchiver
+from modules.backup_catalog import BackupCatalog
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 backup_bp = Blueprint('backup', __name__, url_prefix='/backup')
 logger = logging.getLogger(__name__)
 
+BACKUP_EXTENSIONS = ('.zip', '.tar.zst')
+
+# Components restored when none are requested; modules/ is code and only restored on request
+RESTORE_COMPONENTS = ('database', 'config', 'logs', 'uploads')
+COPY_BLOCK_SIZE = 1024 * 1024
+# Copies of the live database taken before a restore overwrites it
+PRE_RESTORE_PREFIX = 'pre_restore_'
+
+class HashingReader:
+    """File wrapper that hashes and counts what is read through it"""
+    def __init__(self, source, file_hash):
+        self.source = source
+        self.file_hash = file_hash
+        self.size = 0
+    
+    def read(self, size=-1):
+        data = self.source.read(size)
+        self.file_hash.update(data)
+        self.size += len(data)
+        return data
+
+class HashingWriter:
+    """
+    Write-only file wrapper that hashes and counts what is written through
+    it. It cannot seek, so zipfile writes data descriptors instead of going
+    back to patch headers, and the hash covers the archive exactly as stored.
+    """
+    def __init__(self, dest, file_hash):
+        self.dest = dest
+        self.file_hash = file_hash
+        self.size = 0
+    
+    def write(self, data):
+        self.dest.write(data)
+        self.file_hash.update(data)
+        self.size += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self.size
+    
+    def flush(self):
+        self.dest.flush()
+
+class BackupRestartLimit(Exception):
+    """Raised from the backup progress callback to stop a stepped copy that keeps restarting"""
+
 class BackupManager:
     def __init__(self):
         self.backup_dir = os.path.join(os.path.dirname(__file__), '..', 'backups')
         self.temp_dir = os.path.join(os.path.dirname(__file__), '..', 'temp')
-        self.retention_days = 30
-        self.max_backups = 10
+        # Grandfather-father-son retention for archive backups, per backup type:
+        # the newest keep_last plus the newest backup of each recent day, week and month
+        self.keep_last = int(os.getenv('BACKUP_KEEP_LAST', 10))
+        self.keep_daily = int(os.getenv('BACKUP_KEEP_DAILY', 7))
+        self.keep_weekly = int(os.getenv('BACKUP_KEEP_WEEKLY', 4))
+        self.keep_monthly = int(os.getenv('BACKUP_KEEP_MONTHLY', 12))
+        # Online backup copies this many pages per step and sleeps between steps so writers get the lock
+        self.pages_per_step = int(os.getenv('BACKUP_PAGES_PER_STEP', 1024))
+        self.step_sleep = float(os.getenv('BACKUP_STEP_SLEEP', 0.005))
+        self.max_backup_restarts = int(os.getenv('BACKUP_MAX_RESTARTS', 3))
+        self.sql_dump = os.getenv('BACKUP_SQL_DUMP', 'false').lower() == 'true'
+        
+        # auto picks tar.zst when zstandard is installed, zip (deflate) otherwise
+        self.archive_format = os.getenv('BACKUP_ARCHIVE_FORMAT', 'auto').lower()
+        level = os.getenv('BACKUP_COMPRESSION_LEVEL')
+        self.compression_level = int(level) if level else None
+        self.compression_threads = int(os.getenv('BACKUP_COMPRESSION_THREADS', 2))
+        self.restore_workers = int(os.getenv('BACKUP_RESTORE_WORKERS', 4))
+        
+        # Hourly backups go to the deduplicating chunk store instead of a new zip
+        self.incremental = os.getenv('BACKUP_INCREMENTAL', 'true').lower() == 'true'
+        self.incremental_retention_days = int(os.getenv('BACKUP_INCREMENTAL_RETENTION_DAYS', 7))
+        self.pre_restore_retention_days = int(os.getenv('BACKUP_PRE_RESTORE_RETENTION_DAYS', 7))
         
         os.makedirs(self.backup_dir, exist_ok=True)
         os.makedirs(self.temp_dir, exist_ok=True)
+        self.chunk_store = ChunkStore(os.path.join(self.backup_dir, 'chunks'))
+        # Continuous WAL archive for point-in-time recovery between backups
+        self.wal_archiver = WalArchiver(os.path.join(self.backup_dir, 'wal'))
+        self.catalog = BackupCatalog(os.path.join(self.backup_dir, 'catalog.json'))
     
     def create_full_backup(self):
         """Create full system backup"""
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_name = f"full_backup_{timestamp}"
-            backup_path = os.path.join(self.backup_dir, backup_name)
-            
-            os.makedirs(backup_path, exist_ok=True)
-            
-            # Backup database
-            self._backup_database(backup_path)
-            
-            # Backup configuration files
-            self._backup_config_files(backup_path)
-            
-            # Backup logs
-            self._backup_logs(backup_path)
-            
-            # Backup uploaded files
-            self._backup_uploads(backup_path)
-            
-            # Create backup manifest
-            self._create_backup_manifest(backup_path, 'full')
-            
-            # Compress backup
-            compressed_path = self._compress_backup(backup_path)
-            
-            # Clean up temporary directory
-            shutil.rmtree(backup_path)
-            
-            logger.info(f"Full backup created: {compressed_path}")
-            return compressed_path
+            archive_path = self._create_archive_backup('full')
+            logger.info(f"Full backup created: {archive_path}")
+            return archive_path
             
         except Exception as e:
             logger.error(f"Error creating full backup: {str(e)}")
@@ -64,333 +124,818 @@ class BackupManager:
     def create_database_backup(self):
         """Create database-only backup"""
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_name = f"database_backup_{timestamp}"
-            backup_path = os.path.join(self.backup_dir, backup_name)
-            
-            os.makedirs(backup_path, exist_ok=True)
-            
-            # Backup database
-            self._backup_database(backup_path)
-            
-            # Create backup manifest
-            self._create_backup_manifest(backup_path, 'database')
-            
-            # Compress backup
-            compressed_path = self._compress_backup(backup_path)
-            
-            # Clean up temporary directory
-            shutil.rmtree(backup_path)
-            
-            logger.info(f"Database backup created: {compressed_path}")
-            return compressed_path
+            archive_path = self._create_archive_backup('database')
+            logger.info(f"Database backup created: {archive_path}")
+            return archive_path
             
         except Exception as e:
             logger.error(f"Error creating database backup: {str(e)}")
             return None
     
+    def _create_archive_backup(self, backup_type):
+        """
+        Write a backup archive in one pass straight from the sources. Only the
+        database snapshot (and optional SQL dump) is staged, because the
+        online backup API needs a file to copy into.
+        """
+        start = time.perf_counter()
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        backup_name = f"{backup_type}_backup_{timestamp}"
+        staging_path = os.path.join(self.temp_dir, backup_name)
+        os.makedirs(staging_path, exist_ok=True)
+        
+        try:
+            metrics = self._backup_database(staging_path)
+            members = [(os.path.join(staging_path, name), name) for name in sorted(os.listdir(staging_path))]
+            if backup_type == 'full':
+                members.extend(self._iter_source_files())
+            
+            manifest = self._build_manifest(backup_type, metrics)
+            archive_path, checksum = self._write_archive(os.path.join(self.backup_dir, backup_name), members, manifest)
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
+        
+        self._record_backup(self._catalog_entry(os.path.basename(archive_path), 'archive', archive_path, manifest, checksum))
+        logger.info(f"Backup archive written in {time.perf_counter() - start:.2f}s: {manifest['metrics']}")
+        return archive_path
+    
+    def _database_path(self):
+        """Filesystem path of the live SQLite database, or None for other backends"""
+        url = db.engine.url
+        if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+            return None
+        return url.database
+    
+    def _online_backup(self, db_path, target_path):
+        """
+        Copy db_path to target_path in steps of pages_per_step, sleeping
+        between steps so writers are not blocked. SQLite restarts a stepped
+        backup whenever another connection writes; after max_backup_restarts
+        the copy is finished in one step instead so it cannot livelock.
+        """
+        state = {'steps': 0, 'restarts': 0, 'remaining': None}
+        
+        def progress(status, remaining, total):
+            state['steps'] += 1
+            if state['remaining'] is not None and remaining >= state['remaining']:
+                state['restarts'] += 1
+                if state['restarts'] > self.max_backup_restarts:
+                    raise BackupRestartLimit()
+            state['remaining'] = remaining
+            if remaining:
+                time.sleep(self.step_sleep)
+        
+        source = sqlite3.connect(db_path)
+        try:
+            target = sqlite3.connect(target_path)
+            try:
+                source.backup(target, pages=self.pages_per_step, progress=progress)
+            except BackupRestartLimit:
+                logger.warning(f"Database changed during {state['restarts']} backup passes, finishing in one step")
+                source.backup(target, pages=-1)
+                state['steps'] += 1
+            finally:
+                target.close()
+        finally:
+            source.close()
+        return state['steps'], state['restarts']
+    
     def _backup_database(self, backup_path):
-        """Backup SQLite database"""
+        """Backup SQLite database with the online backup API; returns metrics"""
+        metrics = {}
         try:
-            db_path = 'onboarding.db'
-            if os.path.exists(db_path):
+            db_path = self._database_path()
+            if db_path and os.path.exists(db_path):
                 backup_db_path = os.path.join(backup_path, 'onboarding.db')
-                shutil.copy2(db_path, backup_db_path)
                 
-                # Also create SQL dump
-                sql_dump_path = os.path.join(backup_path, 'database_dump.sql')
-                self._create_sql_dump(sql_dump_path)
+                start = time.perf_counter()
+                steps, restarts = self._online_backup(db_path, backup_db_path)
+                
+                metrics.update({
+                    'database_bytes': os.path.getsize(backup_db_path),
+                    'database_seconds': round(time.perf_counter() - start, 3),
+                    'database_steps': steps,
+                    'database_restarts': restarts
+                })
+                
+                if self.sql_dump:
+                    # Dump from the snapshot, not the live database
+                    start = time.perf_counter()
+                    sql_dump_path = os.path.join(backup_path, 'database_dump.sql')
+                    self._create_sql_dump(backup_db_path, sql_dump_path)
+                    metrics.update({
+                        'dump_bytes': os.path.getsize(sql_dump_path),
+                        'dump_seconds': round(time.perf_counter() - start, 3)
+                    })
                 
         except Exception as e:
             logger.error(f"Error backing up database: {str(e)}")
+        return metrics
     
-    def _create_sql_dump(self, dump_path):
+    def _create_sql_dump(self, db_path, dump_path):
         """Create SQL dump of database"""
         try:
-            conn = sqlite3.connect('onboarding.db')
+            conn = sqlite3.connect(db_path)
             
-            with open(dump_path, 'w') as f:
-                for line in conn.iterdump():
-                    f.write(f"{line}\n")
+            with open(dump_path, 'w', buffering=1024 * 1024) as f:
+                f.writelines(f"{line}\n" for line in conn.iterdump())
             
             conn.close()
             
         except Exception as e:
             logger.error(f"Error creating SQL dump: {str(e)}")
     
-    def _backup_config_files(self, backup_path):
-        """Backup configuration files"""
+    def _iter_source_files(self):
+        """Yield (source path, archive path) for config, modules, logs and uploads"""
+        for config_file in ['.env', 'requirements.txt', 'app.py']:
+            if os.path.isfile(config_file):
+                yield config_file, f"config/{config_file}"
+        
+        for directory in ['modules', 'logs', 'uploads']:
+            for root, dirs, filenames in os.walk(directory):
+                dirs.sort()
+                for filename in sorted(filenames):
+                    file_path = os.path.join(root, filename)
+                    yield file_path, os.path.relpath(file_path).replace(os.sep, '/')
+    
+    def create_incremental_backup(self):
+        """
+        Create an incremental backup in the chunk store. Only chunks that
+        are not already stored are written, and files whose size and mtime
+        match the previous backup are not read at all.
+        """
         try:
-            config_dir = os.path.join(backup_path, 'config')
-            os.makedirs(config_dir, exist_ok=True)
-            
-            config_files = ['.env', 'requirements.txt', 'app.py']
+            start = time.perf_counter()
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            backup_name = f"incremental_backup_{timestamp}"
             
-            for config_file in config_files:
-                if os.path.exists(config_file):
-                    shutil.copy2(config_file, config_dir)
+            previous_names = self.chunk_store.list_manifests()
+            previous = {}
+            if previous_names:
+                previous = {entry['path']: entry for entry in self.chunk_store.load_manifest(previous_names[0])['files']}
             
-            # Backup modules directory
-            modules_dir = os.path.join(backup_path, 'modules')
-            if os.path.exists('modules'):
-                shutil.copytree('modules', modules_dir)
+            stats = {'bytes_read': 0, 'bytes_stored': 0, 'new_chunks': 0, 'reused_chunks': 0, 'unchanged_files': 0}
+            files = []
             
-        except Exception as e:
-            logger.error(f"Error backing up config files: {str(e)}")
-    
-    def _backup_logs(self, backup_path):
-        """Backup log files"""
-        try:
-            logs_dir = os.path.join(backup_path, 'logs')
-            if os.path.exists('logs'):
-                shutil.copytree('logs', logs_dir)
+            db_path = self._database_path()
+            if db_path and os.path.exists(db_path):
+                # Chunk a consistent snapshot, never the live file
+                snapshot_path = os.path.join(self.temp_dir, f"{backup_name}.db")
+                try:
+                    snapshot_start = time.perf_counter()
+                    steps, restarts = self._online_backup(db_path, snapshot_path)
+                    stats['database_snapshot_seconds'] = round(time.perf_counter() - snapshot_start, 3)
+                    entry = self.chunk_store.store_file(snapshot_path, stats)
+                    entry['path'] = 'onboarding.db'
+                    files.append(entry)
+                finally:
+                    if os.path.exists(snapshot_path):
+                        os.remove(snapshot_path)
             
-        except Exception as e:
-            logger.error(f"Error backing up logs: {str(e)}")
-    
-    def _backup_uploads(self, backup_path):
-        """Backup uploaded files"""
-        try:
-            uploads_dir = os.path.join(backup_path, 'uploads')
-            if os.path.exists('uploads'):
-                shutil.copytree('uploads', uploads_dir)
+            for source_path, archive_path in self._iter_source_files():
+                stat = os.stat(source_path)
+                unchanged = previous.get(archive_path)
+                if unchanged and unchanged.get('mtime_ns') == stat.st_mtime_ns and unchanged['size'] == stat.st_size:
+                    files.append(unchanged)
+                    stats['unchanged_files'] += 1
+                    continue
+                
+                entry = self.chunk_store.store_file(source_path, stats)
+                entry.update({'path': archive_path, 'mtime_ns': stat.st_mtime_ns})
+                files.append(entry)
             
-        except Exception as e:
-            logger.error(f"Error backing up uploads: {str(e)}")
-    
-    def _create_backup_manifest(self, backup_path, backup_type):
-        """Create backup manifest file"""
-        try:
+            stats['seconds'] = round(time.perf_counter() - start, 3)
             manifest = {
-                'backup_type': backup_type,
+                'backup_type': 'incremental',
                 'created_at': datetime.now().isoformat(),
-                'version': '1.0',
-                'tables': {
-                    'employees': Employee.query.count(),
-                    'equipment': Equipment.query.count(),
-                    'logs': OnboardingLog.query.count(),
-                    'users': User.query.count(),
-                    'roles': Role.query.count(),
-                    'permissions': Permission.query.count(),
-                    'sessions': UserSession.query.count()
-                },
-                'files': self._get_backup_files(backup_path)
+                'version': '2.0',
+                'chunk_size': self.chunk_store.chunk_size,
+                'tables': self._table_counts(),
+                'files': files,
+                'metrics': stats
             }
+            manifest_path = self.chunk_store.save_manifest(backup_name, manifest)
+            self._record_backup(self._catalog_entry(backup_name, 'incremental', manifest_path, manifest))
             
-            manifest_path = os.path.join(backup_path, 'manifest.json')
-            with open(manifest_path, 'w') as f:
-                json.dump(manifest, f, indent=2)
+            logger.info(f"Incremental backup created: {backup_name} ({stats['new_chunks']} new chunks, {stats['bytes_stored']} bytes stored)")
+            return backup_name
             
         except Exception as e:
-            logger.error(f"Error creating backup manifest: {str(e)}")
+            logger.error(f"Error creating incremental backup: {str(e)}")
+            return None
     
-    def _get_backup_files(self, backup_path):
-        """Get list of files in backup"""
-        try:
-            files = []
-            for root, dirs, filenames in os.walk(backup_path):
-                for filename in filenames:
-                    file_path = os.path.join(root, filename)
-                    rel_path = os.path.relpath(file_path, backup_path)
-                    file_size = os.path.getsize(file_path)
-                    files.append({
-                        'path': rel_path,
-                        'size': file_size,
-                        'modified': datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
-                    })
-            return files
-            
-        except Exception as e:
-            logger.error(f"Error getting backup files: {str(e)}")
-            return []
+    def _restore_target(self, archive_path):
+        """Where a file from a backup belongs in the working tree"""
+        if archive_path == 'onboarding.db':
+            return self._database_path() or 'onboarding.db'
+        if archive_path.startswith('config/'):
+            return archive_path[len('config/'):]
+        return archive_path
     
-    def _compress_backup(self, backup_path):
-        """Compress backup directory"""
+    def restore_incremental_backup(self, backup_name, components=None):
+        """Restore an incremental backup, optionally only some components; returns restore stats or None"""
         try:
-            compressed_path = f"{backup_path}.zip"
+            start = time.perf_counter()
+            manifest = self.chunk_store.load_manifest(backup_name)
+            wanted = self._selected_components('full', components)
             
-            with zipfile.ZipFile(compressed_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(backup_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, backup_path)
-                        zipf.write(file_path, arcname)
+            entries = [entry for entry in manifest['files'] if self._component_of(entry['path']) in wanted]
+            staged = self._stage_parallel([
+                (entry['path'], lambda entry=entry: self.chunk_store.iter_file(entry)) for entry in entries
+            ])
             
-            return compressed_path
+            stats = self._finish_restore(staged, manifest, wanted, start)
+            logger.info(f"Incremental backup restored successfully: {backup_name} {stats}")
+            return stats
             
         except Exception as e:
-            logger.error(f"Error compressing backup: {str(e)}")
+            logger.error(f"Error restoring incremental backup: {str(e)}")
             return None
     
-    def restore_backup(self, backup_file_path):
-        """Restore from backup file"""
+    def get_incremental_backups(self):
+        """List incremental backups from the catalog"""
         try:
-            # Extract backup
-            extract_path = os.path.join(self.temp_dir, f"restore_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
-            os.makedirs(extract_path, exist_ok=True)
-            
-            with zipfile.ZipFile(backup_file_path, 'r') as zipf:
-                zipf.extractall(extract_path)
-            
-            # Read manifest
-            manifest_path = os.path.join(extract_path, 'manifest.json')
-            if not os.path.exists(manifest_path):
-                raise Exception("Backup manifest not found")
-            
-            with open(manifest_path, 'r') as f:
-                manifest = json.load(f)
-            
-            # Restore database
-            if manifest['backup_type'] in ['full', 'database']:
-                self._restore_database(extract_path)
-            
-            # Restore configuration files
-            if manifest['backup_type'] == 'full':
-                self._restore_config_files(extract_path)
-                self._restore_logs(extract_path)
-                self._restore_uploads(extract_path)
-            
-            # Clean up
-            shutil.rmtree(extract_path)
-            
-            logger.info(f"Backup restored successfully: {backup_file_path}")
-            return True
+            return [{
+                'name': entry['name'],
+                'created_at': entry['created_at'],
+                'size': entry['logical_size'],
+                'stored_bytes': entry['size'],
+                'files': entry['files'],
+                'tables': entry['tables'],
+                'records': entry['records'],
+                'metrics': entry['metrics']
+            } for entry in self._catalog_entries('incremental')]
             
         except Exception as e:
-            logger.error(f"Error restoring backup: {str(e)}")
-            return False
+            logger.error(f"Error listing incremental backups: {str(e)}")
+            return []
+    
+    def cleanup_incremental_backups(self):
+        """Drop incremental manifests past retention, then unreferenced chunks"""
+        cutoff = datetime.now() - timedelta(days=self.incremental_retention_days)
+        
+        # Always keep the newest manifest as the base for the next backup
+        deleted = []
+        for entry in self._catalog_entries('incremental')[1:]:
+            if datetime.fromisoformat(entry['created_at']) < cutoff:
+                try:
+                    self.chunk_store.delete_manifest(entry['name'])
+                except FileNotFoundError:
+                    pass
+                deleted.append(entry['name'])
+                logger.info(f"Deleted old incremental backup: {entry['name']}")
+        self.catalog.remove(deleted)
+        
+        return self.chunk_store.garbage_collect()
+    
+    def _file_sha256(self, path):
+        file_hash = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b''):
+                file_hash.update(block)
+        return file_hash.hexdigest()
     
-    def _restore_database(self, extract_path):
-        """Restore database from backup"""
+    def _catalog_entry(self, name, storage, path, manifest, checksum=None):
+        """
+        Catalog record for a backup. checksum is the SHA-256 of the archive
+        itself for archive backups, of the chunk store manifest for
+        incremental ones; it is read back from disk when not passed in.
+        """
+        metrics = dict(manifest.get('metrics', {}))
+        if checksum is None:
+            start = time.perf_counter()
+            checksum = self._file_sha256(path)
+            metrics['checksum_seconds'] = round(time.perf_counter() - start, 3)
+        tables = manifest.get('tables', {})
+        files = manifest.get('files', [])
+        
+        return {
+            'name': name,
+            'type': manifest.get('backup_type', name.split('_', 1)[0]),
+            'storage': storage,
+            'created_at': manifest.get('created_at') or datetime.fromtimestamp(os.path.getmtime(path)).isoformat(),
+            # Bytes this backup occupies: the archive, or the new chunks it stored
+            'size': os.path.getsize(path) if storage == 'archive' else metrics.get('bytes_stored', 0),
+            'logical_size': sum(entry.get('size', 0) for entry in files),
+            'sha256': checksum,
+            'files': len(files),
+            'tables': tables,
+            'records': sum(tables.values()),
+            'metrics': metrics
+        }
+    
+    def _record_backup(self, entry):
+        """Add a new backup to the catalog; the backup itself is already safe on disk"""
         try:
-            backup_db_path = os.path.join(extract_path, 'onboarding.db')
-            
-            if os.path.exists(backup_db_path):
-                # Backup current database
-                current_db_path = 'onboarding.db'
-                if os.path.exists(current_db_path):
-                    backup_current_path = f"{current_db_path}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                    shutil.copy2(current_db_path, backup_current_path)
-                
-                # Restore database
-                shutil.copy2(backup_db_path, current_db_path)
-                
-                logger.info("Database restored successfully")
-            
+            self.catalog.add(entry)
         except Exception as e:
-            logger.error(f"Error restoring database: {str(e)}")
+            logger.error(f"Error adding {entry['name']} to the backup catalog: {str(e)}")
     
-    def _restore_config_files(self, extract_path):
-        """Restore configuration files"""
+    def _read_archive_manifest(self, archive_path):
+        """Manifest stored in an archive, or an empty one for archives without it"""
         try:
-            config_dir = os.path.join(extract_path, 'config')
-            if os.path.exists(config_dir):
-                for file in os.listdir(config_dir):
-                    src_path = os.path.join(config_dir, file)
-                    dst_path = file
-                    shutil.copy2(src_path, dst_path)
-            
+            if archive_path.endswith('.tar.zst'):
+                if zstandard is None:
+                    raise Exception("zstandard is required to read .tar.zst backups")
+                # The manifest is the last member, so the whole stream is read once
+                with open(archive_path, 'rb') as raw, zstandard.ZstdDecompressor().stream_reader(raw) as stream:
+                    with tarfile.open(fileobj=stream, mode='r|') as tar:
+                        for member in tar:
+                            if member.name == 'manifest.json':
+                                return json.load(tar.extractfile(member))
+            else:
+                with zipfile.ZipFile(archive_path, 'r') as zipf:
+                    if 'manifest.json' in zipf.namelist():
+                        return json.loads(zipf.read('manifest.json'))
         except Exception as e:
-            logger.error(f"Error restoring config files: {str(e)}")
+            logger.warning(f"Could not read manifest of {archive_path}: {str(e)}")
+        return {}
+    
+    def rebuild_catalog(self):
+        """Recreate the catalog from the backup directory and chunk store; returns the entry count"""
+        entries = []
+        for file in os.listdir(self.backup_dir):
+            if file.endswith(BACKUP_EXTENSIONS):
+                file_path = os.path.join(self.backup_dir, file)
+                entries.append(self._catalog_entry(file, 'archive', file_path, self._read_archive_manifest(file_path)))
+        
+        for name in self.chunk_store.list_manifests():
+            manifest_path = os.path.join(self.chunk_store.manifests_dir, f"{name}.json")
+            entries.append(self._catalog_entry(name, 'incremental', manifest_path, self.chunk_store.load_manifest(name)))
+        
+        self.catalog.replace_all(entries)
+        logger.info(f"Backup catalog rebuilt with {len(entries)} backups")
+        return len(entries)
+    
+    def _catalog_entries(self, storage=None):
+        """Catalog entries, building the catalog once for backup directories that predate it"""
+        if not self.catalog.exists():
+            self.rebuild_catalog()
+        return self.catalog.entries(storage)
+    
+    def _table_counts(self):
+        """Record counts stored in every manifest"""
+        return {
+            'employees': Employee.query.count(),
+            'equipment': Equipment.query.count(),
+            'logs': OnboardingLog.query.count(),
+            'users': User.query.count(),
+            'roles': Role.query.count(),
+            'permissions': Permission.query.count(),
+            'sessions': UserSession.query.count()
+        }
     
-    def _restore_logs(self, extract_path):
-        """Restore log files"""
+    def _build_manifest(self, backup_type, metrics=None):
+        """Backup manifest; _write_archive fills in files and archive metrics"""
+        return {
+            'backup_type': backup_type,
+            'created_at': datetime.now().isoformat(),
+            'version': '1.0',
+            'tables': self._table_counts(),
+            'files': [],
+            'metrics': metrics or {}
+        }
+    
+    def _archive_format(self):
+        if self.archive_format == 'tar.zst' and zstandard is None:
+            logger.warning("zstandard is not installed, writing zip backups")
+        if self.archive_format in ('auto', 'tar.zst') and zstandard is not None:
+            return 'tar.zst'
+        return 'zip'
+    
+    def _write_archive(self, archive_base, members, manifest):
+        """
+        Stream (source path, archive name) members into a tar.zst archive if
+        zstandard is installed (multi-threaded compression), otherwise a
+        deflate zip. manifest.json is written last so it can list every member.
+        Returns the archive path and the SHA-256 of the archive, hashed as it
+        is written.
+        """
+        archive_format = self._archive_format()
+        archive_path = f"{archive_base}.{archive_format}"
+        start = time.perf_counter()
+        archive_hash = hashlib.sha256()
+        bytes_in = 0
+        
+        def add_members(add_file):
+            nonlocal bytes_in
+            for source_path, arcname in members:
+                file_hash = hashlib.sha256()
+                try:
+                    stat = os.stat(source_path)
+                    with open(source_path, 'rb') as source:
+                        size = add_file(source_path, arcname, HashingReader(source, file_hash))
+                except FileNotFoundError:
+                    # Log rotation or upload cleanup removed it after listing
+                    logger.warning(f"Skipping vanished file in backup: {source_path}")
+                    continue
+                bytes_in += size
+                manifest['files'].append({
+                    'path': arcname,
+                    'size': size,
+                    'sha256': file_hash.hexdigest(),
+                    'modified': datetime.fromtimestamp(stat.st_mtime).isoformat()
+                })
+        
+        def add_to_tar(source_path, arcname, reader):
+            info = tar.gettarinfo(source_path, arcname=arcname)
+            tar.addfile(info, reader)
+            return info.size
+        
+        def add_to_zip(source_path, arcname, reader):
+            # Opening by name applies the archive's compression level
+            large = os.path.getsize(source_path) >= zipfile.ZIP64_LIMIT
+            with zipf.open(arcname, 'w', force_zip64=large) as dest:
+                shutil.copyfileobj(reader, dest, COPY_BLOCK_SIZE)
+            return reader.size
+        
+        def manifest_bytes():
+            manifest['metrics'].update({
+                'archive_format': archive_format,
+                'compression_level': level,
+                'bytes_in': bytes_in,
+                'archive_seconds': round(time.perf_counter() - start, 3)
+            })
+            return json.dumps(manifest, indent=2).encode('utf-8')
+        
+        if archive_format == 'tar.zst':
+            level = self.compression_level if self.compression_level is not None else 3
+            compressor = zstandard.ZstdCompressor(level=level, threads=self.compression_threads)
+            with open(archive_path, 'wb') as raw, compressor.stream_writer(HashingWriter(raw, archive_hash)) as compressed:
+                with tarfile.open(fileobj=compressed, mode='w|') as tar:
+                    add_members(add_to_tar)
+                    data = manifest_bytes()
+                    info = tarfile.TarInfo('manifest.json')
+                    info.size = len(data)
+                    info.mtime = int(time.time())
+                    tar.addfile(info, io.BytesIO(data))
+        else:
+            level = self.compression_level if self.compression_level is not None else 6
+            with open(archive_path, 'wb') as raw:
+                with zipfile.ZipFile(HashingWriter(raw, archive_hash), 'w', zipfile.ZIP_DEFLATED, compresslevel=level) as zipf:
+                    add_members(add_to_zip)
+                    zipf.writestr('manifest.json', manifest_bytes())
+        
+        manifest['metrics']['bytes_out'] = os.path.getsize(archive_path)
+        return archive_path, archive_hash.hexdigest()
+    
+    def _component_of(self, archive_path):
+        """Restore component a backup member belongs to; None for members never restored"""
+        if archive_path == 'onboarding.db':
+            return 'database'
+        if '/' not in archive_path:
+            # manifest.json, database_dump.sql
+            return None
+        return archive_path.split('/', 1)[0]
+    
+    def _selected_components(self, backup_type, components):
+        available = {'database'} if backup_type == 'database' else set(RESTORE_COMPONENTS) | {'modules'}
+        wanted = set(components) if components else set(RESTORE_COMPONENTS)
+        return wanted & available
+    
+    def _stage_member(self, archive_path, target_path, blocks):
+        """Write a member's blocks to a temp file beside its target, hashing as it goes"""
+        if archive_path != 'onboarding.db':
+            root = os.path.abspath('.')
+            if os.path.commonpath([root, os.path.abspath(target_path)]) != root:
+                raise ValueError(f"Refusing to restore outside the application directory: {archive_path}")
+        directory = os.path.dirname(os.path.abspath(target_path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = os.path.join(directory, f".{os.path.basename(target_path)}.restore_tmp")
+        
+        file_hash = hashlib.sha256()
+        size = 0
         try:
-            logs_dir = os.path.join(extract_path, 'logs')
-            if os.path.exists(logs_dir):
-                if os.path.exists('logs'):
-                    shutil.rmtree('logs')
-                shutil.copytree(logs_dir, 'logs')
+            with open(temp_path, 'wb') as f:
+                for block in blocks:
+                    file_hash.update(block)
+                    f.write(block)
+                    size += len(block)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        return {
+            'path': archive_path,
+            'temp_path': temp_path,
+            'target_path': target_path,
+            'size': size,
+            'sha256': file_hash.hexdigest()
+        }
+    
+    def _stage_parallel(self, tasks):
+        """Run (archive path, blocks factory) staging tasks on the restore pool; all or nothing"""
+        staged, errors = [], []
+        with ThreadPoolExecutor(max_workers=self.restore_workers) as executor:
+            # Targets are resolved here; the database path needs the app context
+            futures = [executor.submit(lambda path, target_path, open_blocks: self._stage_member(path, target_path, open_blocks()),
+                                       path, self._restore_target(path), open_blocks)
+                       for path, open_blocks in tasks]
+            for future in futures:
+                try:
+                    staged.append(future.result())
+                except Exception as e:
+                    errors.append(e)
+        
+        if errors:
+            self._discard_staged(staged)
+            raise errors[0]
+        return staged
+    
+    def _discard_staged(self, staged):
+        for item in staged:
+            if os.path.exists(item['temp_path']):
+                os.remove(item['temp_path'])
+    
+    def _finish_restore(self, staged, manifest, components, start):
+        """Verify every staged file against the manifest, then move them all into place"""
+        expected = {entry['path']: entry.get('sha256') for entry in manifest.get('files', [])}
+        unverified = 0
+        try:
+            for item in staged:
+                checksum = expected.get(item['path'])
+                if checksum is None:
+                    # Backups made before checksums were recorded
+                    unverified += 1
+                elif checksum != item['sha256']:
+                    raise ValueError(f"Checksum mismatch for {item['path']}")
+        except Exception:
+            self._discard_staged(staged)
+            raise
+        
+        # A replaced database starts a new WAL archive generation
+        pre_restore_snapshot = None
+        with self.wal_archiver.suspended() if 'database' in components else nullcontext():
+            for item in staged:
+                if item['path'] == 'onboarding.db':
+                    try:
+                        if os.path.exists(item['target_path']):
+                            pre_restore_snapshot = self._pre_restore_snapshot(item['target_path'])
+                        self._copy_into_database(item['temp_path'], item['target_path'])
+                    except Exception:
+                        self._discard_staged(staged)
+                        raise
             
-        except Exception as e:
-            logger.error(f"Error restoring logs: {str(e)}")
+            for item in staged:
+                if item['path'] != 'onboarding.db':
+                    os.replace(item['temp_path'], item['target_path'])
+
+        if 'database' in components:
+            # Cached metrics describe the database that was just replaced, and
+            # the restored one may predate its rollup table being built
+            from modules.analytics import analytics_engine
+            from modules.onboarding_rollup import rollup_manager
+            rollup_manager.verified = False
+            analytics_engine.invalidate()
+
+        restored_paths = {os.path.abspath(item['target_path']) for item in staged}
+        
+        # Restored logs and uploads replace the directory contents
+        for directory in ('logs', 'uploads'):
+            if directory in components and os.path.isdir(directory):
+                for root, dirs, filenames in os.walk(directory):
+                    for filename in filenames:
+                        file_path = os.path.abspath(os.path.join(root, filename))
+                        if file_path not in restored_paths:
+                            os.remove(file_path)
+        
+        seconds = time.perf_counter() - start
+        total_bytes = sum(item['size'] for item in staged)
+        return {
+            'components': sorted(components),
+            'files': len(staged),
+            'bytes': total_bytes,
+            'verified': len(staged) - unverified,
+            'unverified': unverified,
+            'seconds': round(seconds, 3),
+            'mb_per_second': round(total_bytes / (1024 * 1024) / seconds, 2) if seconds else None,
+            'pre_restore_snapshot': pre_restore_snapshot
+        }
+    
+    def _pre_restore_snapshot(self, db_path):
+        """Online copy of the live database in the backup directory, so a wrong restore can be undone"""
+        snapshot_path = os.path.join(self.backup_dir, f"{PRE_RESTORE_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.db")
+        self._online_backup(db_path, snapshot_path)
+        logger.info(f"Saved the database as it was before the restore: {snapshot_path}")
+        return snapshot_path
+    
+    def _copy_into_database(self, staged_path, db_path):
+        """
+        Copy the staged database into the live one with the backup API.
+        The copy is one write transaction, so connections that stay open
+        (ours, the worker's) simply see the restored pages afterwards
+        instead of replaying their WAL onto a swapped-in file.
+        """
+        source = sqlite3.connect(staged_path)
+        try:
+            target = sqlite3.connect(db_path, timeout=30)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+        finally:
+            source.close()
+        os.remove(staged_path)
     
-    def _restore_uploads(self, extract_path):
-        """Restore uploaded files"""
+    def restore_point_in_time(self, target_time):
+        """Restore the database as it was at target_time from the WAL archive; returns stats or None"""
         try:
-            uploads_dir = os.path.join(extract_path, 'uploads')
-            if os.path.exists(uploads_dir):
-                if os.path.exists('uploads'):
-                    shutil.rmtree('uploads')
-                shutil.copytree(uploads_dir, 'uploads')
+            start = time.perf_counter()
+            db_path = self._database_path()
+            if not db_path:
+                raise Exception("Point-in-time recovery needs a SQLite database file")
+            
+            temp_path = f"{db_path}.pitr.tmp"
+            with self.wal_archiver.suspended():
+                recovery = self.wal_archiver.restore_to(target_time, temp_path)
+                staged = [{
+                    'path': 'onboarding.db',
+                    'temp_path': temp_path,
+                    'target_path': db_path,
+                    'size': os.path.getsize(temp_path),
+                    'sha256': None
+                }]
+                stats = self._finish_restore(staged, {'files': []}, {'database'}, start)
+            
+            stats.update(recovery)
+            logger.info(f"Database restored to {target_time.isoformat()}: {stats}")
+            return stats
             
         except Exception as e:
-            logger.error(f"Error restoring uploads: {str(e)}")
+            logger.error(f"Error restoring to {target_time}: {str(e)}")
+            return None
     
-    def cleanup_old_backups(self):
-        """Clean up old backups based on retention policy"""
+    def restore_backup(self, backup_file_path, components=None):
+        """
+        Restore from backup file, optionally only some components
+        (database, config, logs, uploads). Members are streamed straight
+        next to their targets and checked against the manifest's SHA-256
+        before anything is replaced. Returns restore stats, or None on failure.
+        """
         try:
-            cutoff_date = datetime.now() - timedelta(days=self.retention_days)
+            start = time.perf_counter()
             
-            backup_files = []
-            for file in os.listdir(self.backup_dir):
-                if file.endswith('.zip'):
-                    file_path = os.path.join(self.backup_dir, file)
-                    file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                    backup_files.append((file_path, file_time))
+            if backup_file_path.endswith('.tar.zst'):
+                if zstandard is None:
+                    raise Exception("zstandard is required to restore .tar.zst backups")
+                
+                # A zstd stream can only be read in order, so stage in one pass;
+                # the manifest is the last member
+                staged, manifest, wanted = [], None, None
+                try:
+                    with open(backup_file_path, 'rb') as raw, zstandard.ZstdDecompressor().stream_reader(raw) as stream:
+                        with tarfile.open(fileobj=stream, mode='r|') as tar:
+                            for member in tar:
+                                if member.name == 'manifest.json':
+                                    manifest = json.load(tar.extractfile(member))
+                                    continue
+                                if not member.isfile() or self._component_of(member.name) not in (components or RESTORE_COMPONENTS):
+                                    continue
+                                source = tar.extractfile(member)
+                                staged.append(self._stage_member(member.name, self._restore_target(member.name), iter(lambda: source.read(COPY_BLOCK_SIZE), b'')))
+                    if manifest is None:
+                        raise Exception("Backup manifest not found")
+                    wanted = self._selected_components(manifest['backup_type'], components)
+                    skipped = [item for item in staged if self._component_of(item['path']) not in wanted]
+                    self._discard_staged(skipped)
+                    staged = [item for item in staged if item not in skipped]
+                except Exception:
+                    self._discard_staged(staged)
+                    raise
+            else:
+                with zipfile.ZipFile(backup_file_path, 'r') as zipf:
+                    if 'manifest.json' not in zipf.namelist():
+                        raise Exception("Backup manifest not found")
+                    manifest = json.loads(zipf.read('manifest.json'))
+                    wanted = self._selected_components(manifest['backup_type'], components)
+                    names = [info.filename for info in zipf.infolist()
+                             if not info.is_dir() and self._component_of(info.filename) in wanted]
+                
+                def open_member(name):
+                    # Each worker reads through its own handle
+                    def blocks():
+                        with zipfile.ZipFile(backup_file_path, 'r') as zipf, zipf.open(name) as source:
+                            yield from iter(lambda: source.read(COPY_BLOCK_SIZE), b'')
+                    return blocks
+                
+                staged = self._stage_parallel([(name, open_member(name)) for name in names])
             
-            # Sort by creation time (newest first)
-            backup_files.sort(key=lambda x: x[1], reverse=True)
+            stats = self._finish_restore(staged, manifest, wanted, start)
+            logger.info(f"Backup restored successfully: {backup_file_path} {stats}")
+            return stats
             
-            # Keep only the most recent backups
-            backups_to_delete = backup_files[self.max_backups:]
+        except Exception as e:
+            logger.error(f"Error restoring backup: {str(e)}")
+            return None
+    
+    def _retained_backups(self, entries):
+        """Names kept by grandfather-father-son retention; entries are newest first"""
+        keep = set()
+        by_type = {}
+        for entry in entries:
+            by_type.setdefault(entry['type'], []).append(entry)
+        
+        for typed_entries in by_type.values():
+            keep.update(entry['name'] for entry in typed_entries[:self.keep_last])
+            for count, period in ((self.keep_daily, '%Y-%m-%d'), (self.keep_weekly, '%G-W%V'), (self.keep_monthly, '%Y-%m')):
+                # The newest backup of each of the most recent periods
+                periods = set()
+                for entry in typed_entries:
+                    key = datetime.fromisoformat(entry['created_at']).strftime(period)
+                    if key in periods:
+                        continue
+                    if len(periods) >= count:
+                        break
+                    periods.add(key)
+                    keep.add(entry['name'])
+        return keep
+    
+    def delete_backup(self, filename):
+        """Delete an archive backup and its catalog entry"""
+        backup_path = os.path.join(self.backup_dir, filename)
+        if os.path.exists(backup_path):
+            os.remove(backup_path)
+        self.catalog.remove([filename])
+    
+    def cleanup_old_backups(self):
+        """Apply retention: GFS for archive backups, age for incremental ones"""
+        try:
+            entries = self._catalog_entries('archive')
+            keep = self._retained_backups(entries)
             
-            for backup_path, backup_time in backups_to_delete:
-                if backup_time < cutoff_date:
+            deleted = []
+            for entry in entries:
+                if entry['name'] in keep:
+                    continue
+                backup_path = os.path.join(self.backup_dir, entry['name'])
+                if os.path.exists(backup_path):
                     os.remove(backup_path)
-                    logger.info(f"Deleted old backup: {backup_path}")
+                deleted.append(entry['name'])
+                logger.info(f"Deleted old backup: {backup_path}")
+            self.catalog.remove(deleted)
+            
+            self.cleanup_incremental_backups()
+            self.cleanup_pre_restore_snapshots()
+            self.wal_archiver.cleanup()
             
         except Exception as e:
             logger.error(f"Error cleaning up old backups: {str(e)}")
     
+    def cleanup_pre_restore_snapshots(self):
+        """Delete pre-restore database copies past their retention"""
+        cutoff = time.time() - self.pre_restore_retention_days * 86400
+        deleted = 0
+        for file in os.listdir(self.backup_dir):
+            file_path = os.path.join(self.backup_dir, file)
+            if file.startswith(PRE_RESTORE_PREFIX) and os.path.getmtime(file_path) < cutoff:
+                os.remove(file_path)
+                deleted += 1
+                logger.info(f"Deleted pre-restore snapshot: {file_path}")
+        return deleted
+    
     def get_backup_list(self):
-        """Get list of available backups"""
+        """Get list of available archive backups from the catalog"""
         try:
-            backups = []
-            
-            for file in os.listdir(self.backup_dir):
-                if file.endswith('.zip'):
-                    file_path = os.path.join(self.backup_dir, file)
-                    file_size = os.path.getsize(file_path)
-                    file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                    
-                    backups.append({
-                        'filename': file,
-                        'size': file_size,
-                        'created_at': file_time.isoformat(),
-                        'size_mb': round(file_size / (1024 * 1024), 2)
-                    })
-            
-            # Sort by creation time (newest first)
-            backups.sort(key=lambda x: x['created_at'], reverse=True)
-            
-            return backups
+            return [{
+                'filename': entry['name'],
+                'type': entry['type'],
+                'size': entry['size'],
+                'size_mb': round(entry['size'] / (1024 * 1024), 2),
+                'created_at': entry['created_at'],
+                'sha256': entry['sha256'],
+                'records': entry['records'],
+                'tables': entry['tables'],
+                'metrics': entry['metrics']
+            } for entry in self._catalog_entries('archive')]
             
         except Exception as e:
             logger.error(f"Error getting backup list: {str(e)}")
             return []
     
     def start_automated_backups(self):
-        """Start automated backup schedule"""
+        """Register automated backup jobs with the shared scheduler"""
         try:
             # Daily full backup at 2 AM
-            schedule.every().day.at("02:00").do(self.create_full_backup)
+            scheduler_service.register('backup.full', scheduler_service.every().day.at("02:00"), self.create_full_backup)
             
-            # Hourly database backup
-            schedule.every().hour.do(self.create_database_backup)
+            # Hourly backup: deduplicated incremental, or a database zip if disabled
+            if self.incremental:
+                scheduler_service.register('backup.incremental', scheduler_service.every().hour, self.create_incremental_backup)
+            else:
+                scheduler_service.register('backup.database', scheduler_service.every().hour, self.create_database_backup)
             
             # Weekly cleanup
-            schedule.every().week.do(self.cleanup_old_backups)
-            
-            def run_scheduler():
-                while True:
-                    schedule.run_pending()
-                    time.sleep(60)
+            scheduler_service.register('backup.cleanup', scheduler_service.every().week, self.cleanup_old_backups)
             
-            scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-            scheduler_thread.start()
+            # Archive the WAL between backups. Every serving process starts the
+            # archiver (see app.start_background_services), but it only runs
+            # in the one holding scheduler leadership
+            db_path = self._database_path()
+            if db_path:
+                self.wal_archiver.start(os.path.abspath(db_path), lambda: scheduler_service.is_leader)
             
-            logger.info("Automated backup scheduler started")
+            logger.info("Automated backup jobs registered")
             
         except Exception as e:
             logger.error(f"Error starting automated backups: {str(e)}")
@@ -412,6 +957,8 @@ def create_backup():
             backup_path = backup_manager.create_full_backup()
         elif backup_type == 'database':
             backup_path = backup_manager.create_database_backup()
+        elif backup_type == 'incremental':
+            backup_path = backup_manager.create_incremental_backup()
         else:
             return jsonify({'error': 'Invalid backup type'}), 400
         
@@ -443,6 +990,94 @@ def list_backups():
         logger.error(f"Error listing backups: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@backup_bp.route('/api/incremental')
+def list_incremental_backups():
+    """List incremental backups in the chunk store"""
+    try:
+        return jsonify({
+            'success': True,
+            'backups': backup_manager.get_incremental_backups()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error listing incremental backups: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@backup_bp.route('/api/incremental/<backup_name>/restore', methods=['POST'])
+def restore_incremental_backup(backup_name):
+    """Restore an incremental backup, optionally limited to components"""
+    try:
+        components = (request.get_json(silent=True) or {}).get('components')
+        
+        if backup_name not in backup_manager.chunk_store.list_manifests():
+            return jsonify({'error': 'Backup not found'}), 404
+        
+        stats = backup_manager.restore_incremental_backup(backup_name, components)
+        if stats:
+            return jsonify({
+                'success': True,
+                'message': 'Backup restored successfully',
+                'stats': stats
+            })
+        else:
+            return jsonify({'error': 'Failed to restore backup'}), 500
+        
+    except Exception as e:
+        logger.error(f"Error restoring incremental backup: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@backup_bp.route('/api/pitr')
+def point_in_time_status():
+    """WAL archive generations and the time window they can restore"""
+    try:
+        return jsonify(backup_manager.wal_archiver.get_status())
+    except Exception as e:
+        logger.error(f"Error getting WAL archive status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@backup_bp.route('/api/pitr/restore', methods=['POST'])
+def restore_point_in_time():
+    """Restore the database to a timestamp, e.g. {"timestamp": "2024-05-01T14:30:00"}"""
+    try:
+        timestamp = (request.get_json(silent=True) or {}).get('timestamp')
+        if not timestamp:
+            return jsonify({'error': 'timestamp is required'}), 400
+        
+        try:
+            target_time = datetime.fromisoformat(timestamp)
+        except ValueError:
+            return jsonify({'error': 'timestamp must be ISO 8601'}), 400
+        
+        stats = backup_manager.restore_point_in_time(target_time)
+        if stats:
+            return jsonify({
+                'success': True,
+                'message': f"Database restored to {stats['recovered_to']}",
+                'stats': stats
+            })
+        else:
+            return jsonify({'error': 'Failed to restore database'}), 500
+        
+    except Exception as e:
+        logger.error(f"Error restoring to point in time: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@backup_bp.cli.command('restore-pitr')
+@click.argument('timestamp')
+def restore_pitr_command(timestamp):
+    """Restore the database to TIMESTAMP (ISO 8601) from the WAL archive"""
+    stats = backup_manager.restore_point_in_time(datetime.fromisoformat(timestamp))
+    if stats is None:
+        raise click.ClickException('Point-in-time restore failed, see the log')
+    print(f"Database restored to {stats['recovered_to']} from generation {stats['generation']} "
+          f"({stats['segments']} WAL segments, {stats['frames']} frames)")
+
+@backup_bp.cli.command('rebuild-catalog')
+def rebuild_catalog_command():
+    """Recreate backups/catalog.json from the backup files"""
+    count = backup_manager.rebuild_catalog()
+    print(f"Backup catalog rebuilt: {count} backups")
+
 @backup_bp.route('/api/download/<filename>')
 def download_backup(filename):
     """Download backup file"""
@@ -474,16 +1109,20 @@ def restore_backup():
         temp_path = os.path.join(backup_manager.temp_dir, backup_file.filename)
         backup_file.save(temp_path)
         
+        # Optional comma-separated subset, e.g. "database" or "uploads"
+        components = [c.strip() for c in request.form.get('components', '').split(',') if c.strip()] or None
+        
         # Restore backup
-        success = backup_manager.restore_backup(temp_path)
+        stats = backup_manager.restore_backup(temp_path, components)
         
         # Clean up temporary file
         os.remove(temp_path)
         
-        if success:
+        if stats:
             return jsonify({
                 'success': True,
-                'message': 'Backup restored successfully'
+                'message': 'Backup restored successfully',
+                'stats': stats
             })
         else:
             return jsonify({'error': 'Failed to restore backup'}), 500
@@ -501,7 +1140,7 @@ def delete_backup(filename):
         if not os.path.exists(backup_path):
             return jsonify({'error': 'Backup file not found'}), 404
         
-        os.remove(backup_path)
+        backup_manager.delete_backup(filename)
         
         return jsonify({
             'success': True,
@@ -4,19 +4,56 @@ import json
 import logging
 import pandas as pd
 from datetime import datetime
-from flask import Blueprint, request, jsonify, render_template, send_file
+from flask import Blueprint, request, jsonify, render_template, send_file, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from app import db, Employee, Equipment, OnboardingLog
 import io
+import time
 import zipfile
 
 bulk_operations_bp = Blueprint('bulk_operations', __name__, url_prefix='/bulk')
 logger = logging.getLogger(__name__)
 
+EXPORT_BATCH_SIZE = 1000
+CSV_FLUSH_BYTES = 64 * 1024
+
+def stream_csv(rows):
+    """Encode rows as CSV and yield the text in chunks as rows arrive"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    try:
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= CSV_FLUSH_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+    except Exception as e:
+        logger.error(f"Error streaming CSV export: {str(e)}")
+        raise
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def check_export(*sections):
+    """
+    Fetch and map the first record of each (query, to_row) export section
+    while the request can still fail cleanly; once the streamed response has
+    started, a database or mapping error can only truncate a 200
+    """
+    for query, to_row in sections:
+        first = query.first()
+        if first is not None:
+            to_row(first)
+
 class BulkOperationsManager:
     def __init__(self):
         self.allowed_extensions = {'csv', 'xlsx', 'json'}
         self.upload_folder = os.path.join(os.path.dirname(__file__), '..', 'uploads')
+        self.ad_batch_size = int(os.getenv('AD_BATCH_SIZE', 200))
+        self.import_chunk_size = int(os.getenv('IMPORT_CHUNK_SIZE', 1000))
+        self.max_reported_errors = 100
         os.makedirs(self.upload_folder, exist_ok=True)
     
     def allowed_file(self, filename):
@@ -24,39 +61,55 @@ class BulkOperationsManager:
         return '.' in filename and \
                filename.rsplit('.', 1)[1].lower() in self.allowed_extensions
     
+    def _parse_employee_row(self, row):
+        """Normalize and validate one employee CSV row"""
+        employee_data = {
+            'employee_id': (row.get('employee_id') or '').strip(),
+            'first_name': (row.get('first_name') or '').strip(),
+            'last_name': (row.get('last_name') or '').strip(),
+            'email': (row.get('email') or '').strip(),
+            'department': (row.get('department') or '').strip(),
+            'manager_email': (row.get('manager_email') or '').strip(),
+            'start_date': (row.get('start_date') or '').strip(),
+            'position': (row.get('position') or '').strip(),
+            'location': (row.get('location') or '').strip(),
+            'phone': (row.get('phone') or '').strip()
+        }
+        
+        if not all([employee_data['employee_id'], employee_data['first_name'], 
+                  employee_data['last_name'], employee_data['email']]):
+            return None, "Missing required fields"
+        
+        try:
+            employee_data['start_date'] = datetime.strptime(employee_data['start_date'], '%Y-%m-%d').date()
+        except ValueError:
+            return None, f"Invalid start_date '{employee_data['start_date']}' (expected YYYY-MM-DD)"
+        
+        return employee_data, None
+    
+    def iter_employee_rows(self, file_path):
+        """Yield (row_num, employee_data, error) for each CSV row without loading the file"""
+        with open(file_path, 'r', encoding='utf-8', newline='') as csvfile:
+            reader = csv.DictReader(csvfile)
+            
+            for row_num, row in enumerate(reader, start=2):
+                try:
+                    employee_data, error = self._parse_employee_row(row)
+                except Exception as e:
+                    employee_data, error = None, str(e)
+                yield row_num, employee_data, error
+    
     def import_employees_csv(self, file_path):
         """Import employees from CSV file"""
         try:
             employees_data = []
             errors = []
             
-            with open(file_path, 'r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                
-                for row_num, row in enumerate(reader, start=2):
-                    try:
-                        employee_data = {
-                            'employee_id': row.get('employee_id', '').strip(),
-                            'first_name': row.get('first_name', '').strip(),
-                            'last_name': row.get('last_name', '').strip(),
-                            'email': row.get('email', '').strip(),
-                            'department': row.get('department', '').strip(),
-                            'manager_email': row.get('manager_email', '').strip(),
-                            'start_date': row.get('start_date', '').strip(),
-                            'position': row.get('position', '').strip(),
-                            'location': row.get('location', '').strip(),
-                            'phone': row.get('phone', '').strip()
-                        }
-                        
-                        if not all([employee_data['employee_id'], employee_data['first_name'], 
-                                  employee_data['last_name'], employee_data['email']]):
-                            errors.append(f"Row {row_num}: Missing required fields")
-                            continue
-                        
-                        employees_data.append(employee_data)
-                        
-                    except Exception as e:
-                        errors.append(f"Row {row_num}: {str(e)}")
+            for row_num, employee_data, error in self.iter_employee_rows(file_path):
+                if error:
+                    errors.append(f"Row {row_num}: {error}")
+                else:
+                    employees_data.append(employee_data)
             
             return employees_data, errors
             
@@ -64,6 +117,78 @@ class BulkOperationsManager:
             logger.error(f"Error importing CSV: {str(e)}")
             return [], [str(e)]
     
+    def stream_import_employees_csv(self, file_path, chunk_size=None, collect_ids=False):
+        """
+        Import employees from CSV in two streaming passes: validate every row,
+        then bulk insert in chunks inside one transaction
+        """
+        chunk_size = chunk_size or self.import_chunk_size
+        started = time.perf_counter()
+        
+        errors = []
+        error_count = 0
+        for row_num, _, error in self.iter_employee_rows(file_path):
+            if error:
+                error_count += 1
+                if len(errors) < self.max_reported_errors:
+                    errors.append(f"Row {row_num}: {error}")
+        
+        if error_count:
+            return {'imported_count': 0, 'error_count': error_count, 'errors': errors}
+        
+        imported_count = 0
+        employee_ids = []
+        departments = set()
+        chunk = []
+        now = datetime.utcnow()
+        
+        try:
+            for _, employee_data, _ in self.iter_employee_rows(file_path):
+                employee_data['created_at'] = now
+                employee_data['updated_at'] = now
+                chunk.append(employee_data)
+                
+                if len(chunk) >= chunk_size:
+                    db.session.bulk_insert_mappings(Employee, chunk)
+                    imported_count += len(chunk)
+                    if collect_ids:
+                        employee_ids.extend(emp['employee_id'] for emp in chunk)
+                    departments.update(emp['department'] for emp in chunk)
+                    chunk = []
+            
+            if chunk:
+                db.session.bulk_insert_mappings(Employee, chunk)
+                imported_count += len(chunk)
+                if collect_ids:
+                    employee_ids.extend(emp['employee_id'] for emp in chunk)
+                departments.update(emp['department'] for emp in chunk)
+            
+            # Bulk inserts bypass the flush hooks that keep the analytics rollup current
+            from modules.onboarding_rollup import rollup_manager
+            rollup_manager.refresh_buckets(db.session.connection(), {(department, now.date()) for department in departments})
+            db.session.commit()
+            
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        # Bulk inserts bypass the ORM flush events that normally invalidate analytics
+        from modules.analytics import analytics_engine
+        analytics_engine.invalidate_for_models(Employee)
+        
+        elapsed = time.perf_counter() - started
+        rows_per_second = round(imported_count / elapsed, 1) if elapsed > 0 else imported_count
+        logger.info(f"Imported {imported_count} employees in {elapsed:.2f}s ({rows_per_second} rows/sec)")
+        
+        return {
+            'imported_count': imported_count,
+            'error_count': 0,
+            'errors': [],
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': rows_per_second,
+            'employee_ids': employee_ids
+        }
+    
     def import_employees_excel(self, file_path):
         """Import employees from Excel file"""
         try:
@@ -114,23 +239,18 @@ class BulkOperationsManager:
                 for row_num, row in enumerate(reader, start=2):
                     try:
                         equipment_item = {
-                            'asset_tag': row.get('asset_tag', '').strip(),
-                            'equipment_type': row.get('equipment_type', '').strip(),
-                            'brand': row.get('brand', '').strip(),
-                            'model': row.get('model', '').strip(),
-                            'serial_number': row.get('serial_number', '').strip(),
-                            'mac_address': row.get('mac_address', '').strip(),
-                            'purchase_date': row.get('purchase_date', '').strip(),
-                            'warranty_expiry': row.get('warranty_expiry', '').strip(),
-                            'cost': row.get('cost', '0').strip(),
-                            'supplier': row.get('supplier', '').strip(),
-                            'status': row.get('status', 'Available').strip(),
-                            'location': row.get('location', '').strip(),
-                            'notes': row.get('notes', '').strip()
+                            'employee_id': (row.get('employee_id') or '').strip(),
+                            'asset_tag': (row.get('asset_tag') or '').strip() or None,
+                            'equipment_type': (row.get('equipment_type') or '').strip(),
+                            'brand': (row.get('brand') or '').strip(),
+                            'model': (row.get('model') or '').strip(),
+                            'serial_number': (row.get('serial_number') or '').strip(),
+                            'status': (row.get('status') or '').strip() or 'Active'
                         }
                         
-                        if not all([equipment_item['asset_tag'], equipment_item['equipment_type'], 
-                                  equipment_item['brand'], equipment_item['serial_number']]):
+                        if not all([equipment_item['employee_id'], equipment_item['equipment_type'], 
+                                  equipment_item['brand'], equipment_item['model'],
+                                  equipment_item['serial_number']]):
                             errors.append(f"Row {row_num}: Missing required fields")
                             continue
                         
@@ -146,141 +266,145 @@ class BulkOperationsManager:
             return [], [str(e)]
     
     def export_employees_csv(self, filters=None):
-        """Export employees to CSV"""
-        try:
-            query = Employee.query
-            
-            if filters:
-                if filters.get('department'):
-                    query = query.filter(Employee.department == filters['department'])
-                if filters.get('status') == 'completed':
-                    query = query.filter(
-                        Employee.ad_account_created == True,
-                        Employee.o365_mailbox_created == True,
-                        Employee.security_groups_assigned == True
-                    )
-                elif filters.get('status') == 'pending':
-                    query = query.filter(Employee.ad_account_created == False)
-            
-            employees = query.all()
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            writer.writerow([
-                'Employee ID', 'First Name', 'Last Name', 'Email', 'Department',
-                'Manager Email', 'Start Date', 'Position', 'Location', 'Phone',
-                'AD Account Created', 'O365 Mailbox Created', 'Security Groups Assigned',
-                'Equipment Assigned', 'Software Deployed', 'Welcome Email Sent',
-                'Created At', 'Updated At'
-            ])
-            
-            for emp in employees:
-                writer.writerow([
-                    emp.employee_id, emp.first_name, emp.last_name, emp.email,
-                    emp.department, emp.manager_email, emp.start_date, emp.position,
-                    emp.location, emp.phone, emp.ad_account_created, emp.o365_mailbox_created,
-                    emp.security_groups_assigned, emp.equipment_assigned, emp.software_deployed,
-                    emp.welcome_email_sent, emp.created_at, emp.updated_at
-                ])
-            
-            return output.getvalue()
-            
-        except Exception as e:
-            logger.error(f"Error exporting employees: {str(e)}")
-            return None
+        """Export employees to CSV as a stream of text chunks; query errors raise here"""
+        query = Employee.query
+        
+        if filters:
+            if filters.get('department'):
+                query = query.filter(Employee.department == filters['department'])
+            if filters.get('status') == 'completed':
+                query = query.filter(
+                    Employee.ad_account_created == True,
+                    Employee.o365_mailbox_created == True,
+                    Employee.security_groups_assigned == True
+                )
+            elif filters.get('status') == 'pending':
+                query = query.filter(Employee.ad_account_created == False)
+        
+        query = query.order_by(Employee.id)
+        check_export((query, self._employee_export_row))
+        return stream_csv(self._employee_export_rows(query))
+    
+    def _employee_export_rows(self, query):
+        yield [
+            'Employee ID', 'First Name', 'Last Name', 'Email', 'Department',
+            'Manager Email', 'Start Date', 'Position', 'Location', 'Phone',
+            'AD Account Created', 'O365 Mailbox Created', 'Security Groups Assigned',
+            'Equipment Assigned', 'Software Deployed', 'Welcome Email Sent',
+            'Created At', 'Updated At'
+        ]
+        
+        for emp in query.yield_per(EXPORT_BATCH_SIZE):
+            yield self._employee_export_row(emp)
+    
+    def _employee_export_row(self, emp):
+        return [
+            emp.employee_id, emp.first_name, emp.last_name, emp.email,
+            emp.department, emp.manager_email, emp.start_date, emp.position,
+            emp.location, emp.phone, emp.ad_account_created, emp.o365_mailbox_created,
+            emp.security_groups_assigned, emp.equipment_assigned, emp.software_deployed,
+            emp.welcome_email_sent, emp.created_at, emp.updated_at
+        ]
     
     def export_equipment_csv(self, filters=None):
-        """Export equipment to CSV"""
-        try:
-            query = Equipment.query
-            
-            if filters:
-                if filters.get('status'):
-                    query = query.filter(Equipment.status == filters['status'])
-                if filters.get('equipment_type'):
-                    query = query.filter(Equipment.equipment_type == filters['equipment_type'])
-            
-            equipment = query.all()
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            writer.writerow([
-                'Asset Tag', 'Equipment Type', 'Brand', 'Model', 'Serial Number',
-                'MAC Address', 'Purchase Date', 'Warranty Expiry', 'Cost', 'Supplier',
-                'Status', 'Assigned Employee ID', 'Assigned Date', 'Location', 'Notes'
-            ])
-            
-            for eq in equipment:
-                writer.writerow([
-                    eq.asset_tag, eq.equipment_type, eq.brand, eq.model,
-                    eq.serial_number, eq.mac_address, eq.purchase_date,
-                    eq.warranty_expiry, eq.cost, eq.supplier, eq.status,
-                    eq.assigned_employee_id, eq.assigned_date, eq.location, eq.notes
-                ])
-            
-            return output.getvalue()
-            
-        except Exception as e:
-            logger.error(f"Error exporting equipment: {str(e)}")
-            return None
+        """Export equipment to CSV as a stream of text chunks; query errors raise here"""
+        query = Equipment.query
+        
+        if filters:
+            if filters.get('status'):
+                query = query.filter(Equipment.status == filters['status'])
+            if filters.get('equipment_type'):
+                query = query.filter(Equipment.equipment_type == filters['equipment_type'])
+        
+        query = query.order_by(Equipment.id)
+        check_export((query, self._equipment_export_row))
+        return stream_csv(self._equipment_export_rows(query))
+    
+    def _equipment_export_rows(self, query):
+        yield [
+            'Asset Tag', 'Equipment Type', 'Brand', 'Model', 'Serial Number',
+            'Status', 'Assigned Employee ID', 'Assigned Date'
+        ]
+        
+        for eq in query.yield_per(EXPORT_BATCH_SIZE):
+            yield self._equipment_export_row(eq)
+    
+    def _equipment_export_row(self, eq):
+        return [
+            eq.asset_tag, eq.equipment_type, eq.brand, eq.model,
+            eq.serial_number, eq.status, eq.employee_id, eq.assigned_date
+        ]
     
     def export_comprehensive_report(self):
-        """Export comprehensive report with all data"""
-        try:
-            employees = Employee.query.all()
-            equipment = Equipment.query.all()
-            logs = OnboardingLog.query.order_by(OnboardingLog.timestamp.desc()).limit(1000).all()
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            writer.writerow(['COMPREHENSIVE ONBOARDING REPORT'])
-            writer.writerow(['Generated:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
-            writer.writerow([])
-            
-            writer.writerow(['EMPLOYEES'])
-            writer.writerow([
-                'Employee ID', 'Name', 'Email', 'Department', 'Start Date',
-                'AD Account', 'O365 Mailbox', 'Security Groups', 'Equipment', 'Software', 'Welcome Email'
-            ])
-            
-            for emp in employees:
-                writer.writerow([
-                    emp.employee_id, f"{emp.first_name} {emp.last_name}", emp.email,
-                    emp.department, emp.start_date, emp.ad_account_created,
-                    emp.o365_mailbox_created, emp.security_groups_assigned,
-                    emp.equipment_assigned, emp.software_deployed, emp.welcome_email_sent
-                ])
-            
-            writer.writerow([])
-            writer.writerow(['EQUIPMENT'])
-            writer.writerow([
-                'Asset Tag', 'Type', 'Brand', 'Model', 'Serial Number',
-                'Status', 'Assigned Employee', 'Assigned Date'
-            ])
-            
-            for eq in equipment:
-                writer.writerow([
-                    eq.asset_tag, eq.equipment_type, eq.brand, eq.model,
-                    eq.serial_number, eq.status, eq.assigned_employee_id, eq.assigned_date
-                ])
-            
-            writer.writerow([])
-            writer.writerow(['RECENT ACTIVITY LOGS'])
-            writer.writerow(['Timestamp', 'Employee ID', 'Action', 'Status', 'Details'])
-            
-            for log in logs:
-                writer.writerow([
-                    log.timestamp, log.employee_id, log.action, log.status, log.details
-                ])
-            
-            return output.getvalue()
-            
-        except Exception as e:
-            logger.error(f"Error exporting comprehensive report: {str(e)}")
-            return None
+        """Export comprehensive report with all data as a stream of text chunks; query errors raise here"""
+        check_export(
+            (Employee.query, self._report_employee_row),
+            (Equipment.query, self._equipment_export_row),
+            (OnboardingLog.query, self._report_log_row)
+        )
+        return stream_csv(self._comprehensive_report_rows())
+    
+    def _comprehensive_report_rows(self):
+        yield ['COMPREHENSIVE ONBOARDING REPORT']
+        yield ['Generated:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
+        yield []
+        
+        yield ['EMPLOYEES']
+        yield [
+            'Employee ID', 'Name', 'Email', 'Department', 'Start Date',
+            'AD Account', 'O365 Mailbox', 'Security Groups', 'Equipment', 'Software', 'Welcome Email'
+        ]
+        
+        for emp in Employee.query.order_by(Employee.id).yield_per(EXPORT_BATCH_SIZE):
+            yield self._report_employee_row(emp)
+        
+        yield []
+        yield ['EQUIPMENT']
+        yield [
+            'Asset Tag', 'Type', 'Brand', 'Model', 'Serial Number',
+            'Status', 'Assigned Employee', 'Assigned Date'
+        ]
+        
+        for eq in Equipment.query.order_by(Equipment.id).yield_per(EXPORT_BATCH_SIZE):
+            yield self._equipment_export_row(eq)
+        
+        yield []
+        yield ['RECENT ACTIVITY LOGS']
+        yield ['Timestamp', 'Employee ID', 'Action', 'Status', 'Details']
+        
+        for log in OnboardingLog.query.order_by(OnboardingLog.timestamp.desc()).limit(1000):
+            yield self._report_log_row(log)
+    
+    def _report_employee_row(self, emp):
+        return [
+            emp.employee_id, f"{emp.first_name} {emp.last_name}", emp.email,
+            emp.department, emp.start_date, emp.ad_account_created,
+            emp.o365_mailbox_created, emp.security_groups_assigned,
+            emp.equipment_assigned, emp.software_deployed, emp.welcome_email_sent
+        ]
+    
+    def _report_log_row(self, log):
+        return [log.timestamp, log.employee_id, log.action, log.status, log.details]
+    
+    def queue_onboarding(self, employee_ids):
+        """
+        Queue an onboarding job per employee. The job worker runs AD account
+        creation for the queued jobs in batched script runs and sends each
+        welcome email once the mailbox exists, following the pipeline's
+        stage dependencies.
+        """
+        from modules.job_queue import enqueue_onboarding
+        
+        found_ids = set()
+        for start in range(0, len(employee_ids), self.ad_batch_size):
+            found_ids.update(row.employee_id for row in Employee.query.filter(
+                Employee.employee_id.in_(employee_ids[start:start + self.ad_batch_size])
+            ).with_entities(Employee.employee_id))
+        
+        return {
+            'jobs': [enqueue_onboarding(emp_id) for emp_id in employee_ids if emp_id in found_ids],
+            'not_found': [emp_id for emp_id in employee_ids if emp_id not in found_ids]
+        }
     
     def create_import_template(self, data_type):
         """Create import template file"""
@@ -293,9 +417,9 @@ class BulkOperationsManager:
                 ]
             elif data_type == 'equipment':
                 template_data = [
-                    ['asset_tag', 'equipment_type', 'brand', 'model', 'serial_number', 'mac_address', 'purchase_date', 'warranty_expiry', 'cost', 'supplier', 'status', 'location', 'notes'],
-                    ['LT001', 'Laptop', 'Dell', 'Latitude 5520', 'ABC123456', '00:11:22:33:44:55', '2024-01-01', '2027-01-01', '1200.00', 'Dell Inc', 'Available', 'IT Storage', 'New laptop'],
-                    ['MN001', 'Monitor', 'Dell', '24" Monitor', 'DEF789012', '', '2024-01-01', '2027-01-01', '300.00', 'Dell Inc', 'Available', 'IT Storage', '24 inch monitor']
+                    ['employee_id', 'asset_tag', 'equipment_type', 'brand', 'model', 'serial_number', 'status'],
+                    ['EMP001', 'LT001', 'Laptop', 'Dell', 'Latitude 5520', 'ABC123456', 'Active'],
+                    ['EMP001', 'MN001', 'Monitor', 'Dell', '24" Monitor', 'DEF789012', 'Active']
                 ]
             else:
                 return None
@@ -339,32 +463,50 @@ def import_data():
         file_path = os.path.join(bulk_manager.upload_folder, filename)
         file.save(file_path)
         
+        import_stats = {}
+        imported_ids = []
+        
         if data_type == 'employees':
             if filename.endswith('.csv'):
-                data, errors = bulk_manager.import_employees_csv(file_path)
+                create_ad = request.form.get('create_ad_accounts') == 'true'
+                chunk_size = request.form.get('chunk_size', type=int)
+                import_stats = bulk_manager.stream_import_employees_csv(file_path, chunk_size, collect_ids=create_ad)
+                
+                if import_stats['errors']:
+                    os.remove(file_path)
+                    return jsonify({
+                        'success': False,
+                        'error': 'Import errors found',
+                        'error_count': import_stats['error_count'],
+                        'errors': import_stats['errors']
+                    }), 400
+                
+                imported_count = import_stats['imported_count']
+                imported_ids = import_stats.pop('employee_ids')
             elif filename.endswith('.xlsx'):
                 data, errors = bulk_manager.import_employees_excel(file_path)
+                
+                if errors:
+                    return jsonify({
+                        'success': False,
+                        'error': 'Import errors found',
+                        'errors': errors
+                    }), 400
+                
+                imported_count = 0
+                for emp_data in data:
+                    try:
+                        employee = Employee(**emp_data)
+                        db.session.add(employee)
+                        imported_count += 1
+                        imported_ids.append(emp_data['employee_id'])
+                    except Exception as e:
+                        logger.error(f"Error importing employee {emp_data.get('employee_id')}: {str(e)}")
+                
+                db.session.commit()
             else:
                 return jsonify({'success': False, 'error': 'Unsupported file format'}), 400
             
-            if errors:
-                return jsonify({
-                    'success': False,
-                    'error': 'Import errors found',
-                    'errors': errors
-                }), 400
-            
-            imported_count = 0
-            for emp_data in data:
-                try:
-                    employee = Employee(**emp_data)
-                    db.session.add(employee)
-                    imported_count += 1
-                except Exception as e:
-                    logger.error(f"Error importing employee {emp_data.get('employee_id')}: {str(e)}")
-            
-            db.session.commit()
-            
         elif data_type == 'equipment':
             data, errors = bulk_manager.import_equipment_csv(file_path)
             
@@ -388,16 +530,48 @@ def import_data():
         
         os.remove(file_path)
         
-        return jsonify({
+        response = {
             'success': True,
             'message': f'Successfully imported {imported_count} {data_type}',
             'imported_count': imported_count
-        })
+        }
+        
+        if import_stats:
+            response['elapsed_seconds'] = import_stats['elapsed_seconds']
+            response['rows_per_second'] = import_stats['rows_per_second']
+        
+        if data_type == 'employees' and request.form.get('create_ad_accounts') == 'true':
+            response['onboarding'] = bulk_manager.queue_onboarding(imported_ids)
+        
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"Error importing data: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@bulk_operations_bp.route('/api/provision/ad', methods=['POST'])
+def provision_ad_accounts():
+    """Queue onboarding, including AD account creation, for imported employees"""
+    try:
+        data = request.get_json() or {}
+        employee_ids = data.get('employee_ids', [])
+        
+        if not employee_ids:
+            return jsonify({'success': False, 'error': 'No employee IDs provided'}), 400
+        
+        summary = bulk_manager.queue_onboarding(employee_ids)
+        
+        return jsonify({
+            'success': True,
+            'message': f"Onboarding queued for {len(summary['jobs'])} employees",
+            **summary
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error queuing AD provisioning: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @bulk_operations_bp.route('/api/export/<data_type>')
 def export_data(data_type):
     """Export data to CSV"""
@@ -413,17 +587,14 @@ def export_data(data_type):
         else:
             return jsonify({'success': False, 'error': 'Invalid data type'}), 400
         
-        if csv_data is None:
-            return jsonify({'success': False, 'error': 'Export failed'}), 500
-        
         filename = f"{data_type}_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         
-        return csv_data, 200, {
-            'Content-Type': 'text/csv',
+        return Response(stream_with_context(csv_data), mimetype='text/csv', headers={
             'Content-Disposition': f'attachment; filename={filename}'
-        }
+        })
         
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Error exporting data: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class ChunkStore:
+    """
+    Content-addressed storage for incremental backups. Files are split into
+    fixed-size chunks (a multiple of the SQLite page size, so a changed page
+    only dirties the chunk containing it), each chunk is stored once under
+    its SHA-256 and compressed with zlib, and a backup is just a manifest of
+    chunk references per file.
+    """
+    def __init__(self, root, chunk_size=None, compression_level=None):
+        self.root = root
+        self.chunk_size = int(chunk_size or os.getenv('BACKUP_CHUNK_SIZE', 1024 * 1024))
+        self.compression_level = int(compression_level if compression_level is not None else os.getenv('BACKUP_CHUNK_COMPRESSION', 1))
+        self.objects_dir = os.path.join(root, 'objects')
+        self.manifests_dir = os.path.join(root, 'manifests')
+        self.lock = threading.Lock()
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.manifests_dir, exist_ok=True)
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def has_chunk(self, digest):
+        return os.path.exists(self._object_path(digest))
+
+    def put_chunk(self, data):
+        """Store a chunk unless an identical one exists; returns (digest, stored_bytes)"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            # Refresh mtime so a concurrent garbage collection keeps it
+            os.utime(path)
+            return digest, 0
+
+        compressed = zlib.compress(data, self.compression_level)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(temp_path, path)
+        return digest, len(compressed)
+
+    def get_chunk(self, digest):
+        """Read and verify one chunk"""
+        with open(self._object_path(digest), 'rb') as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Chunk {digest} is corrupt")
+        return data
+
+    def store_file(self, path, stats):
+        """Chunk one file; returns its manifest entry and adds to stats"""
+        file_hash = hashlib.sha256()
+        chunks = []
+        size = 0
+
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(self.chunk_size)
+                if not data:
+                    break
+                file_hash.update(data)
+                digest, stored = self.put_chunk(data)
+                chunks.append(digest)
+                size += len(data)
+                stats['bytes_read'] += len(data)
+                if stored:
+                    stats['new_chunks'] += 1
+                    stats['bytes_stored'] += stored
+                else:
+                    stats['reused_chunks'] += 1
+
+        return {'size': size, 'sha256': file_hash.hexdigest(), 'chunks': chunks}
+
+    def iter_file(self, entry):
+        """Yield a file entry's verified chunks in order"""
+        for digest in entry['chunks']:
+            yield self.get_chunk(digest)
+
+    def save_manifest(self, name, manifest):
+        path = os.path.join(self.manifests_dir, f"{name}.json")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, path)
+        return path
+
+    def load_manifest(self, name):
+        with open(os.path.join(self.manifests_dir, f"{name}.json"), 'r') as f:
+            return json.load(f)
+
+    def list_manifests(self):
+        """Manifest names, newest first"""
+        names = [file[:-5] for file in os.listdir(self.manifests_dir) if file.endswith('.json')]
+        return sorted(names, reverse=True)
+
+    def delete_manifest(self, name):
+        os.remove(os.path.join(self.manifests_dir, f"{name}.json"))
+
+    def garbage_collect(self, grace_seconds=3600):
+        """Delete chunks no manifest references; recent chunks may belong to a backup in progress"""
+        with self.lock:
+            referenced = set()
+            for name in self.list_manifests():
+                for entry in self.load_manifest(name).get('files', []):
+                    referenced.update(entry.get('chunks', []))
+
+            cutoff = time.time() - grace_seconds
+            deleted = 0
+            freed = 0
+            for prefix in os.listdir(self.objects_dir):
+                prefix_dir = os.path.join(self.objects_dir, prefix)
+                for digest in os.listdir(prefix_dir):
+                    if digest in referenced:
+                        continue
+                    path = os.path.join(prefix_dir, digest)
+                    stat = os.stat(path)
+                    if stat.st_mtime > cutoff:
+                        continue
+                    os.remove(path)
+                    deleted += 1
+                    freed += stat.st_size
+
+            logger.info(f"Chunk store GC removed {deleted} chunks ({freed} bytes)")
+            return {'deleted_chunks': deleted, 'freed_bytes': freed}
@@ -1,5 +1,4 @@
 import os
-import smtplib
 import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -7,6 +6,7 @@ from email.mime.base import MIMEBase
 from email import encoders
 from datetime import datetime
 import json
+from modules.smtp_pool import smtp_pool
 
 logger = logging.getLogger(__name__)
 
@@ -15,10 +15,7 @@ def send_welcome_email(employee, temp_password):
     Send welcome email to new employee with credentials and instructions
     """
     try:
-        smtp_server = os.getenv('SMTP_SERVER')
-        smtp_port = int(os.getenv('SMTP_PORT', 587))
         smtp_username = os.getenv('SMTP_USERNAME')
-        smtp_password = os.getenv('SMTP_PASSWORD')
         
         msg = MIMEMultipart()
         msg['From'] = smtp_username
@@ -29,15 +26,10 @@ def send_welcome_email(employee, temp_password):
         body = create_welcome_email_body(employee, temp_password)
         msg.attach(MIMEText(body, 'html'))
         
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        
         recipients = [employee.email, employee.manager_email]
         text = msg.as_string()
         
-        server.sendmail(smtp_username, recipients, text)
-        server.quit()
+        smtp_pool.sendmail(smtp_username, recipients, text)
         
         logger.info(f"Successfully sent welcome email to {employee.email}")
         return {
@@ -133,10 +125,7 @@ def send_manager_notification(employee, temp_password):
     Send notification email to manager about new employee
     """
     try:
-        smtp_server = os.getenv('SMTP_SERVER')
-        smtp_port = int(os.getenv('SMTP_PORT', 587))
         smtp_username = os.getenv('SMTP_USERNAME')
-        smtp_password = os.getenv('SMTP_PASSWORD')
         
         msg = MIMEMultipart()
         msg['From'] = smtp_username
@@ -146,13 +135,8 @@ def send_manager_notification(employee, temp_password):
         body = create_manager_notification_body(employee, temp_password)
         msg.attach(MIMEText(body, 'html'))
         
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        
         text = msg.as_string()
-        server.sendmail(smtp_username, employee.manager_email, text)
-        server.quit()
+        smtp_pool.sendmail(smtp_username, employee.manager_email, text)
         
         logger.info(f"Successfully sent manager notification to {employee.manager_email}")
         return {
@@ -248,10 +232,7 @@ def send_onboarding_completion_email(employee):
     Send completion email when all onboarding tasks are finished
     """
     try:
-        smtp_server = os.getenv('SMTP_SERVER')
-        smtp_port = int(os.getenv('SMTP_PORT', 587))
         smtp_username = os.getenv('SMTP_USERNAME')
-        smtp_password = os.getenv('SMTP_PASSWORD')
         
         msg = MIMEMultipart()
         msg['From'] = smtp_username
@@ -262,15 +243,10 @@ def send_onboarding_completion_email(employee):
         body = create_completion_email_body(employee)
         msg.attach(MIMEText(body, 'html'))
         
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        
         recipients = [employee.email, employee.manager_email]
         text = msg.as_string()
         
-        server.sendmail(smtp_username, recipients, text)
-        server.quit()
+        smtp_pool.sendmail(smtp_username, recipients, text)
         
         logger.info(f"Successfully sent completion email to {employee.email}")
         return {
@@ -0,0 +1,338 @@
+import os
+import json
+import socket
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import Blueprint, jsonify, url_for
+from app import db, Employee, OnboardingLog, generate_temp_password
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+logger = logging.getLogger(__name__)
+
+class OnboardingJob(db.Model):
+    __tablename__ = 'onboarding_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False, default='onboard')
+    employee_id = db.Column(db.String(20), db.ForeignKey('employee.employee_id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    progress = db.Column(db.Text, nullable=True)  # JSON string of stage statuses
+    result = db.Column(db.Text, nullable=True)  # JSON string of stage results
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    worker_id = db.Column(db.String(100), nullable=True)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)  # retry backoff
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_onboarding_jobs_status_id', 'status', 'id'),
+    )
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'employee_id': self.employee_id,
+            'status': self.status,
+            'progress': json.loads(self.progress) if self.progress else {},
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class JobStagesFailed(Exception):
+    """Some stages of a job failed; the job is retried and completed stages are not repeated"""
+    def __init__(self, message, result):
+        super().__init__(message)
+        self.result = result
+
+class JobQueue:
+    def __init__(self):
+        self.poll_interval = float(os.getenv('JOB_POLL_INTERVAL', 2))
+        self.lease_seconds = int(os.getenv('JOB_LEASE_SECONDS', 600))
+        self.retry_base_seconds = float(os.getenv('JOB_RETRY_BASE_SECONDS', 60))
+        self.retry_max_seconds = float(os.getenv('JOB_RETRY_MAX_SECONDS', 3600))
+        self.batch_size = max(1, int(os.getenv('JOB_BATCH_SIZE', 50)))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        # Handlers take a list of claimed jobs of one type and return a
+        # result dict or an exception per job id
+        self.handlers = {
+            'onboard': self._run_onboarding_jobs
+        }
+        self.workers_running = False
+
+    def enqueue(self, job_type, employee_id):
+        """Queue a job, reusing an active job for the same employee"""
+        existing = OnboardingJob.query.filter(
+            OnboardingJob.job_type == job_type,
+            OnboardingJob.employee_id == employee_id,
+            OnboardingJob.status.in_(['queued', 'running'])
+        ).first()
+        if existing:
+            return existing
+
+        job = OnboardingJob(job_type=job_type, employee_id=employee_id, status='queued')
+        db.session.add(job)
+        db.session.commit()
+
+        logger.info(f"Queued {job_type} job {job.id} for {employee_id}")
+        return job
+
+    def claim_next(self, job_type=None):
+        """Atomically claim the oldest queued job that is not waiting to be retried"""
+        while True:
+            now = datetime.utcnow()
+            query = OnboardingJob.query.filter(
+                OnboardingJob.status == 'queued',
+                db.or_(OnboardingJob.next_attempt_at == None, OnboardingJob.next_attempt_at <= now)
+            )
+            if job_type:
+                query = query.filter(OnboardingJob.job_type == job_type)
+            candidate = query.order_by(OnboardingJob.id).first()
+            if not candidate:
+                return None
+
+            claimed = OnboardingJob.query.filter_by(id=candidate.id, status='queued').update({
+                'status': 'running',
+                'worker_id': self.worker_id,
+                'attempts': OnboardingJob.attempts + 1,
+                'started_at': now,
+                'heartbeat_at': now
+            }, synchronize_session=False)
+            db.session.commit()
+
+            if claimed:
+                return db.session.get(OnboardingJob, candidate.id)
+
+    def claim_batch(self):
+        """
+        Claim the next job plus up to JOB_BATCH_SIZE - 1 more queued jobs of
+        the same type, so a burst of onboarding shares batched stage runs
+        (one AD script run instead of one per employee)
+        """
+        job = self.claim_next()
+        if job is None:
+            return []
+
+        jobs = [job]
+        while len(jobs) < self.batch_size:
+            job = self.claim_next(jobs[0].job_type)
+            if job is None:
+                break
+            jobs.append(job)
+        return jobs
+
+    def requeue_stale_jobs(self):
+        """Return jobs from crashed workers to the queue"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        stale_jobs = OnboardingJob.query.filter(
+            OnboardingJob.status == 'running',
+            OnboardingJob.heartbeat_at < cutoff
+        ).all()
+
+        for job in stale_jobs:
+            logger.warning(f"Recovering stale job {job.id} from {job.worker_id}")
+            if job.attempts >= job.max_attempts:
+                job.status = 'failed'
+                job.error = 'Worker lease expired too many times'
+                job.finished_at = datetime.utcnow()
+            else:
+                job.status = 'queued'
+                job.worker_id = None
+
+        if stale_jobs:
+            db.session.commit()
+
+        return len(stale_jobs)
+
+    def _retry_delay(self, attempts):
+        return min(self.retry_max_seconds, self.retry_base_seconds * 2 ** max(attempts - 1, 0))
+
+    def process_jobs(self, jobs):
+        """Run claimed jobs of one type together and record each outcome"""
+        job_ids = [job.id for job in jobs]
+        handler = self.handlers.get(jobs[0].job_type)
+
+        try:
+            if not handler:
+                raise ValueError(f"Unknown job type: {jobs[0].job_type}")
+
+            outcomes = handler(jobs)
+        except Exception as e:
+            db.session.rollback()
+            outcomes = {job_id: e for job_id in job_ids}
+
+        for job_id in job_ids:
+            self._record_outcome(job_id, outcomes[job_id])
+
+    def _record_outcome(self, job_id, outcome):
+        """Complete a job, or requeue it with backoff until its attempts run out"""
+        job = db.session.get(OnboardingJob, job_id)
+
+        if not isinstance(outcome, Exception):
+            job.status = 'completed'
+            job.result = json.dumps(outcome)
+            job.error = None
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+            logger.info(f"Job {job.id} completed")
+            return
+
+        logger.error(f"Job {job.id} failed: {str(outcome)}")
+
+        job.error = str(outcome)
+        if isinstance(outcome, JobStagesFailed):
+            job.result = json.dumps(outcome.result)
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = 'queued'
+            job.worker_id = None
+            job.next_attempt_at = datetime.utcnow() + timedelta(seconds=self._retry_delay(job.attempts))
+        db.session.commit()
+
+    def _run_onboarding_jobs(self, jobs):
+        """
+        Provision the jobs' employees through one onboarding pipeline run, so
+        stages with a batch step (AD account creation) run once for all of
+        them. Each stage's flag is committed as soon as it succeeds, so a
+        retry after failed stages or a crash skips what is already done
+        instead of, say, creating the AD account twice.
+        """
+        from modules.onboarding_pipeline import onboarding_pipeline
+
+        outcomes = {}
+        batch = []
+        for job in jobs:
+            employee = Employee.query.filter_by(employee_id=job.employee_id).first()
+            if not employee:
+                outcomes[job.id] = ValueError(f"Employee {job.employee_id} not found")
+                continue
+            job.progress = json.dumps({name: 'pending' for name in onboarding_pipeline.stages})
+            batch.append((job, employee))
+        db.session.commit()
+
+        progress = {job.employee_id: json.loads(job.progress) for job, _ in batch}
+        jobs_by_employee = {job.employee_id: job for job, _ in batch}
+
+        def record_stage(emp, stage_name, stage_result):
+            job = jobs_by_employee[emp.employee_id]
+            stages = progress[emp.employee_id]
+            if stage_result.get('skipped'):
+                stages[stage_name] = 'skipped'
+            else:
+                stages[stage_name] = 'completed' if stage_result.get('success') else 'failed'
+            if stage_result.get('success') and not stage_result.get('already_completed'):
+                onboarding_pipeline.apply_results(emp, {stage_name: stage_result})
+                emp.updated_at = datetime.utcnow()
+            job.progress = json.dumps(stages)
+            job.heartbeat_at = datetime.utcnow()
+            try:
+                db.session.commit()
+            except Exception:
+                # The flags are applied again once the pipeline finishes
+                db.session.rollback()
+                raise
+
+        all_results = onboarding_pipeline.run_many(
+            [(employee, generate_temp_password()) for _, employee in batch],
+            on_stage_complete=record_stage
+        )
+
+        for (job, employee), results in zip(batch, all_results):
+            onboarding_pipeline.apply_results(employee, results)
+
+            failed_stages = [name for name, result in results.items() if not result.get('success')]
+            db.session.add(OnboardingLog(
+                employee_id=employee.employee_id,
+                action='Onboarding Job Failed' if failed_stages else 'Onboarding Job Completed',
+                status='Error' if failed_stages else 'Success',
+                details=f"Job {job.id} attempt {job.attempts}: failed stages: {', '.join(failed_stages)}" if failed_stages else f'Job {job.id}: all stages completed'
+            ))
+
+            if failed_stages:
+                # Keep the completed stages and the log; _record_outcome retries the job
+                outcomes[job.id] = JobStagesFailed(f"Stages failed: {', '.join(failed_stages)}", results)
+            else:
+                outcomes[job.id] = results
+
+        db.session.commit()
+        return outcomes
+
+    def run_worker(self, max_jobs=None, stop_event=None):
+        """Drain the queue until stopped; must run inside an app context"""
+        processed = 0
+        logger.info(f"Job worker {self.worker_id} started")
+
+        while not (stop_event and stop_event.is_set()):
+            try:
+                self.requeue_stale_jobs()
+                jobs = self.claim_batch()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error claiming job: {str(e)}")
+                jobs = []
+
+            if not jobs:
+                time.sleep(self.poll_interval)
+                continue
+
+            self.process_jobs(jobs)
+            db.session.remove()
+
+            processed += len(jobs)
+            if max_jobs and processed >= max_jobs:
+                break
+
+        return processed
+
+    def start_background_workers(self, app, count=1):
+        """Start in-process worker threads (for single-process deployments)"""
+        if self.workers_running or count <= 0:
+            return
+
+        self.workers_running = True
+
+        def run():
+            with app.app_context():
+                self.run_worker()
+
+        for index in range(count):
+            worker_thread = threading.Thread(target=run, name=f'job-worker-{index}', daemon=True)
+            worker_thread.start()
+
+        logger.info(f"Started {count} in-process job workers")
+
+job_queue = JobQueue()
+
+@jobs_bp.route('/<int:job_id>')
+def get_job(job_id):
+    """Get job status and progress"""
+    job = db.session.get(OnboardingJob, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+def enqueue_onboarding(employee_id):
+    """Queue onboarding for an employee and build the 202 response body"""
+    job = job_queue.enqueue('onboard', employee_id)
+    return {
+        'message': 'Onboarding job queued',
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': url_for('jobs.get_job', job_id=job.id)
+    }
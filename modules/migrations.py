@@ -0,0 +1,62 @@
+import logging
+from datetime import datetime
+from sqlalchemy import inspect
+from app import db, Employee, Equipment, OnboardingLog
+
+logger = logging.getLogger(__name__)
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+
+    version = db.Column(db.String(100), primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+def _create_model_indexes(connection, *models):
+    """Create indexes declared on the models that an older database is missing"""
+    for model in models:
+        for index in model.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+def _add_missing_columns(connection, table_name, columns):
+    """ALTER TABLE ADD COLUMN for each (name, DDL type) the table lacks"""
+    inspector = inspect(connection)
+    if not inspector.has_table(table_name):
+        return
+    existing = {column['name'] for column in inspector.get_columns(table_name)}
+    for name, ddl in columns:
+        if name not in existing:
+            connection.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {name} {ddl}")
+
+# Ordered schema changes for databases created before the change landed.
+# db.create_all() only creates missing tables, never indexes or columns on existing ones.
+MIGRATIONS = [
+    ('0001_hot_path_indexes', lambda connection: _create_model_indexes(connection, Employee, Equipment, OnboardingLog)),
+    ('0002_notification_retry_columns', lambda connection: _add_missing_columns(connection, 'notification_queue', [
+        ('max_attempts', 'INTEGER DEFAULT 5'),
+        ('next_attempt_at', 'DATETIME')
+    ])),
+    ('0003_onboarding_job_retry_column', lambda connection: _add_missing_columns(connection, 'onboarding_jobs', [
+        ('next_attempt_at', 'DATETIME')
+    ])),
+]
+
+def apply_migrations():
+    """Apply pending migrations in order; call after db.create_all()"""
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    applied = {row.version for row in SchemaMigration.query.all()}
+
+    pending = [(version, migrate) for version, migrate in MIGRATIONS if version not in applied]
+    for version, migrate in pending:
+        logger.info(f"Applying schema migration {version}")
+        migrate(db.session.connection())
+        db.session.add(SchemaMigration(version=version))
+        db.session.commit()
+
+    return [version for version, _ in pending]
+
+def explain_query_plan(query):
+    """Return SQLite's EXPLAIN QUERY PLAN detail lines for an ORM query"""
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup or ())
+    rows = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return [row[-1] for row in rows]
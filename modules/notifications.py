@@ -1,24 +1,174 @@
 import os
+import html
+import json
+import random
+import socket
 import smtplib
 import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, render_template, jsonify, request, current_app
+from sqlalchemy import func, case, and_
 from app import db, Employee, OnboardingLog
-import schedule
+from modules.smtp_pool import smtp_pool
+from modules.template_registry import email_templates, CompiledTemplate
+from modules.scheduler import scheduler_service
 import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 notifications_bp = Blueprint('notifications', __name__, url_prefix='/notifications')
 logger = logging.getLogger(__name__)
 
+# Table row for each employee in an onboarding_delayed_digest email; values are escaped first
+DELAY_DIGEST_ROW = CompiledTemplate(
+    '<tr><td>{employee_name}</td><td>{employee_id}</td><td>{start_date}</td><td>{days_delayed}</td></tr>'
+)
+
+# Lower rank is dequeued first
+PRIORITY_RANKS = {
+    'urgent': 0,
+    'high': 1,
+    'normal': 2,
+    'low': 3
+}
+
+# Connection-level failures worth retrying; SMTP replies are judged by their code
+TRANSIENT_SMTP_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+def is_transient_smtp_error(error):
+    """4xx replies and dropped connections are retried, 5xx replies are not"""
+    if isinstance(error, TRANSIENT_SMTP_ERRORS):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return False
+
+def recipient_domains(recipients):
+    return sorted({address.rsplit('@', 1)[-1].strip().lower() for address in recipients})
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+class DomainRateLimiter:
+    """Token bucket per recipient domain"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def reserve(self, domains):
+        """
+        Take one token from each domain's bucket. Returns 0 when sent now is
+        allowed, otherwise the seconds to wait (and takes nothing).
+        """
+        if self.rate <= 0:
+            return 0
+
+        with self.lock:
+            now = time.monotonic()
+            wait = 0
+            for domain in domains:
+                tokens, updated = self.buckets.get(domain, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+                self.buckets[domain] = (tokens, now)
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / self.rate)
+
+            if wait:
+                return wait
+
+            for domain in domains:
+                tokens, updated = self.buckets[domain]
+                self.buckets[domain] = (tokens - 1, updated)
+            return 0
+
+class NotificationRecord(db.Model):
+    __tablename__ = 'notification_queue'
+
+    id = db.Column(db.Integer, primary_key=True)
+    notification_type = db.Column(db.String(50), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # JSON list of addresses
+    data = db.Column(db.Text, nullable=True)  # JSON template data
+    priority = db.Column(db.String(20), nullable=False, default='normal')
+    priority_rank = db.Column(db.Integer, nullable=False, default=PRIORITY_RANKS['normal'])
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=5)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)  # retry backoff / rate limit deferral
+    error = db.Column(db.Text, nullable=True)
+    worker_id = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    failed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Dequeue order: walk pending rows by priority, oldest first
+        db.Index('ix_notification_queue_status_priority', 'status', 'priority_rank', 'id'),
+        db.Index('ix_notification_queue_status_claimed_at', 'status', 'claimed_at'),
+    )
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'type': self.notification_type,
+            'subject': self.subject,
+            'recipients': json.loads(self.recipients),
+            'data': json.loads(self.data) if self.data else {},
+            'priority': self.priority,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+            'failed_at': self.failed_at.isoformat() if self.failed_at else None
+        }
+
 class NotificationManager:
     def __init__(self):
-        self.notification_queue = []
         self.email_templates = self._load_email_templates()
         self.smtp_config = self._get_smtp_config()
         self.scheduler_running = False
+        self.batch_size = int(os.getenv('NOTIFICATION_BATCH_SIZE', 50))
+        self.lease_seconds = int(os.getenv('NOTIFICATION_LEASE_SECONDS', 300))
+        self.sent_retention_days = int(os.getenv('NOTIFICATION_RETENTION_DAYS', 7))
+        self.failed_retention_days = int(os.getenv('NOTIFICATION_FAILED_RETENTION_DAYS', 30))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = int(os.getenv('NOTIFICATION_CONCURRENCY', 8))
+        self.retry_base_seconds = float(os.getenv('NOTIFICATION_RETRY_BASE_SECONDS', 30))
+        self.retry_max_seconds = float(os.getenv('NOTIFICATION_RETRY_MAX_SECONDS', 3600))
+        self.rate_limit_max_wait = float(os.getenv('NOTIFICATION_RATE_LIMIT_MAX_WAIT', 2))
+        self.rate_limiter = DomainRateLimiter(
+            float(os.getenv('NOTIFICATION_DOMAIN_RATE', 5)),
+            float(os.getenv('NOTIFICATION_DOMAIN_BURST', 10))
+        )
+        self.send_latencies = deque(maxlen=1000)
+        self.dispatch_stats = {'sent': 0, 'retried': 0, 'failed': 0, 'deferred': 0}
+        self._stats_lock = threading.Lock()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.sweep_seconds = float(os.getenv('NOTIFICATION_SWEEP_SECONDS', 300))
+        # The wakeup event only reaches this process; rows queued elsewhere are found by polling
+        self.poll_seconds = float(os.getenv('NOTIFICATION_POLL_SECONDS', 2))
+        self.delivery_latencies = deque(maxlen=1000)
+        self._wakeup = threading.Event()
+        # Digest mode sends one delay summary per manager instead of one email per employee
+        self.delay_digest = os.getenv('NOTIFICATION_DELAY_DIGEST', 'true').lower() == 'true'
+        self.support_email = os.getenv('NOTIFICATION_SUPPORT_EMAIL', 'it-support@company.com')
     
     def _load_email_templates(self):
         """Load email notification templates"""
@@ -35,6 +185,10 @@ class NotificationManager:
                 'subject': 'Onboarding Process Delayed - {employee_name}',
                 'template': 'notifications/onboarding_delayed.html'
             },
+            'onboarding_delayed_digest': {
+                'subject': 'Delayed Onboardings - {delayed_count} employees',
+                'template': 'notifications/onboarding_delayed_digest.html'
+            },
             'equipment_assigned': {
                 'subject': 'Equipment Assigned - {employee_name}',
                 'template': 'notifications/equipment_assigned.html'
@@ -67,84 +221,301 @@ class NotificationManager:
                 return False
             
             subject = template_config['subject'].format(**data)
+            recipients = recipients if isinstance(recipients, list) else [recipients]
             
-            notification = {
-                'type': notification_type,
-                'subject': subject,
-                'recipients': recipients if isinstance(recipients, list) else [recipients],
-                'data': data,
-                'priority': priority,
-                'created_at': datetime.now(),
-                'status': 'pending'
-            }
+            if priority not in PRIORITY_RANKS:
+                priority = 'normal'
+            
+            notification = NotificationRecord(
+                notification_type=notification_type,
+                subject=subject,
+                recipients=json.dumps(recipients),
+                data=json.dumps(data, default=str),
+                priority=priority,
+                priority_rank=PRIORITY_RANKS[priority],
+                status='pending'
+            )
+            db.session.add(notification)
+            db.session.commit()
             
-            self.notification_queue.append(notification)
             logger.info(f"Notification queued: {notification_type} for {len(recipients)} recipients")
             
+            # Wake the dispatcher instead of waiting for the next sweep
+            self._wakeup.set()
             return True
             
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Error queuing notification: {str(e)}")
             return False
     
+    def claim_batch(self, limit):
+        """Atomically claim up to limit pending notifications, highest priority first"""
+        now = datetime.utcnow()
+        candidates = db.session.query(NotificationRecord.id).filter(
+            NotificationRecord.status == 'pending',
+            db.or_(NotificationRecord.next_attempt_at == None, NotificationRecord.next_attempt_at <= now)
+        ).order_by(
+            NotificationRecord.priority_rank, NotificationRecord.id
+        ).limit(limit).all()
+        
+        claimed = []
+        for (notification_id,) in candidates:
+            updated = NotificationRecord.query.filter_by(id=notification_id, status='pending').update({
+                'status': 'sending',
+                'worker_id': self.worker_id,
+                'claimed_at': now,
+                'attempts': NotificationRecord.attempts + 1
+            }, synchronize_session=False)
+            if updated:
+                claimed.append(notification_id)
+        db.session.commit()
+        
+        if not claimed:
+            return []
+        return NotificationRecord.query.filter(NotificationRecord.id.in_(claimed)).order_by(
+            NotificationRecord.priority_rank, NotificationRecord.id
+        ).all()
+    
+    def requeue_stale_notifications(self):
+        """
+        Return notifications claimed by a worker that died mid-send. Delivery is
+        at-least-once: a crash between SMTP accept and the status update resends.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        requeued = NotificationRecord.query.filter(
+            NotificationRecord.status == 'sending',
+            NotificationRecord.claimed_at < cutoff
+        ).update({'status': 'pending', 'worker_id': None}, synchronize_session=False)
+        db.session.commit()
+        
+        if requeued:
+            logger.warning(f"Requeued {requeued} notifications with expired leases")
+        return requeued
+    
+    def purge_old_notifications(self):
+        """Drop sent and failed notifications past their retention window"""
+        now = datetime.utcnow()
+        purged = NotificationRecord.query.filter(
+            NotificationRecord.status == 'sent',
+            NotificationRecord.sent_at < now - timedelta(days=self.sent_retention_days)
+        ).delete(synchronize_session=False)
+        purged += NotificationRecord.query.filter(
+            NotificationRecord.status == 'failed',
+            NotificationRecord.failed_at < now - timedelta(days=self.failed_retention_days)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        
+        if purged:
+            logger.info(f"Purged {purged} notifications past retention")
+        return purged
+    
+    def _get_executor(self):
+        """Get the shared sender pool, creating it on first use"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.concurrency,
+                    thread_name_prefix='notification'
+                )
+            return self._executor
+    
+    def _retry_delay(self, attempts):
+        """Exponential backoff with equal jitter"""
+        delay = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** max(attempts - 1, 0))
+        return delay / 2 + random.uniform(0, delay / 2)
+    
+    def _dispatch(self, notification):
+        """
+        Send one notification on a worker thread without touching the database.
+        Returns (outcome, detail) for the calling thread to record.
+        """
+        wait = self.rate_limiter.reserve(recipient_domains(notification['recipients']))
+        if wait > self.rate_limit_max_wait:
+            return 'deferred', wait
+        if wait:
+            time.sleep(wait)
+            if self.rate_limiter.reserve(recipient_domains(notification['recipients'])):
+                return 'deferred', wait
+        
+        started = time.perf_counter()
+        try:
+            self._deliver_email(notification)
+        except Exception as e:
+            if is_transient_smtp_error(e) and notification['attempts'] < notification['max_attempts']:
+                return 'retry', e
+            return 'failed', e
+        return 'sent', time.perf_counter() - started
+    
+    def _record_outcome(self, record, outcome, detail):
+        now = datetime.utcnow()
+        if outcome == 'sent':
+            record.status = 'sent'
+            record.sent_at = now
+            record.error = None
+            with self._stats_lock:
+                self.send_latencies.append(detail)
+                if record.created_at:
+                    self.delivery_latencies.append((now - record.created_at).total_seconds())
+        elif outcome == 'deferred':
+            # Rate limited before any send attempt, so it does not count as one
+            record.status = 'pending'
+            record.attempts = max((record.attempts or 1) - 1, 0)
+            record.next_attempt_at = now + timedelta(seconds=detail)
+        elif outcome == 'retry':
+            delay = self._retry_delay(record.attempts)
+            record.status = 'pending'
+            record.error = str(detail)
+            record.next_attempt_at = now + timedelta(seconds=delay)
+            logger.warning(f"Notification {record.id} failed transiently, retrying in {delay:.0f}s: {str(detail)}")
+        else:
+            record.status = 'failed'
+            record.error = str(detail)
+            record.failed_at = now
+            logger.error(f"Notification {record.id} failed: {str(detail)}")
+        record.worker_id = None
+        
+        key = {'sent': 'sent', 'deferred': 'deferred', 'retry': 'retried'}.get(outcome, 'failed')
+        with self._stats_lock:
+            self.dispatch_stats[key] += 1
+    
     def process_notification_queue(self):
-        """Process pending notifications"""
+        """Drain due notifications, sending each claimed batch concurrently"""
         try:
-            pending_notifications = [n for n in self.notification_queue if n['status'] == 'pending']
+            self.requeue_stale_notifications()
+            executor = self._get_executor()
+            processed = 0
+            started = time.perf_counter()
             
-            for notification in pending_notifications:
-                if self._send_email_notification(notification):
-                    notification['status'] = 'sent'
-                    notification['sent_at'] = datetime.now()
-                else:
-                    notification['status'] = 'failed'
-                    notification['failed_at'] = datetime.now()
+            while True:
+                batch = self.claim_batch(self.batch_size)
+                if not batch:
+                    break
+                
+                futures = {executor.submit(self._dispatch, record.to_dict()): record for record in batch}
+                for future in as_completed(futures):
+                    record = futures[future]
+                    try:
+                        outcome, detail = future.result()
+                    except Exception as e:
+                        outcome, detail = 'failed', e
+                    self._record_outcome(record, outcome, detail)
+                
+                db.session.commit()
+                processed += len(batch)
             
-            logger.info(f"Processed {len(pending_notifications)} notifications")
+            logger.info(f"Processed {processed} notifications in {time.perf_counter() - started:.2f}s")
             
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Error processing notification queue: {str(e)}")
     
-    def _send_email_notification(self, notification):
-        """Send email notification"""
-        try:
-            template_config = self.email_templates[notification['type']]
-            
-            msg = MIMEMultipart()
-            msg['From'] = self.smtp_config['username']
-            msg['To'] = ', '.join(notification['recipients'])
-            msg['Subject'] = notification['subject']
-            
-            body = self._render_email_template(template_config['template'], notification['data'])
-            msg.attach(MIMEText(body, 'html'))
-            
-            server = smtplib.SMTP(self.smtp_config['server'], self.smtp_config['port'])
-            server.starttls()
-            server.login(self.smtp_config['username'], self.smtp_config['password'])
-            
-            text = msg.as_string()
-            server.sendmail(self.smtp_config['username'], notification['recipients'], text)
-            server.quit()
-            
-            logger.info(f"Email sent successfully: {notification['subject']}")
-            return True
+    def _seconds_until_next_retry(self):
+        """Time until the earliest deferred notification becomes due"""
+        next_attempt_at = db.session.query(func.min(NotificationRecord.next_attempt_at)).filter(
+            NotificationRecord.status == 'pending',
+            NotificationRecord.next_attempt_at != None
+        ).scalar()
+        if next_attempt_at is None:
+            return None
+        return max((next_attempt_at - datetime.utcnow()).total_seconds(), 0)
+    
+    def _has_due_notifications(self):
+        """Whether any pending notification is ready to send (one indexed lookup)"""
+        return db.session.query(NotificationRecord.id).filter(
+            NotificationRecord.status == 'pending',
+            db.or_(NotificationRecord.next_attempt_at == None, NotificationRecord.next_attempt_at <= datetime.utcnow())
+        ).first() is not None
+    
+    def _wait_for_work(self, timeout):
+        """
+        Sleep up to timeout seconds. send_notification() in this process ends
+        the wait at once; every poll_seconds a cheap query checks for rows
+        queued by other processes (web workers, worker.py, CLI commands).
+        """
+        deadline = time.monotonic() + timeout
+        while self.scheduler_running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._wakeup.wait(min(self.poll_seconds, remaining)):
+                break
+            try:
+                if self._has_due_notifications():
+                    break
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error polling notification queue: {str(e)}")
+            finally:
+                db.session.remove()
+        self._wakeup.clear()
+    
+    def run_dispatcher(self):
+        """
+        Drain the queue whenever send_notification() in this process signals,
+        when a poll finds notifications queued by another process, when a
+        deferred retry falls due, or every sweep_seconds as a safety net.
+        Must run inside an app context.
+        """
+        while self.scheduler_running:
+            try:
+                self.process_notification_queue()
+                timeout = self._seconds_until_next_retry()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Notification dispatcher error: {str(e)}")
+                timeout = None
+            finally:
+                db.session.remove()
             
-        except Exception as e:
-            logger.error(f"Error sending email notification: {str(e)}")
-            return False
+            timeout = self.sweep_seconds if timeout is None else min(timeout, self.sweep_seconds)
+            self._wait_for_work(timeout)
+    
+    def get_dispatch_stats(self):
+        """Get dispatcher counters and SMTP send latency percentiles in milliseconds"""
+        with self._stats_lock:
+            stats = dict(self.dispatch_stats)
+            latencies = sorted(self.send_latencies)
+            delivery_latencies = sorted(self.delivery_latencies)
+        
+        def summarize(values):
+            return {
+                name: round(percentile(values, pct) * 1000, 1) if values else None
+                for name, pct in (('p50', 50), ('p90', 90), ('p99', 99))
+            }
+        
+        stats['latency_ms'] = summarize(latencies)
+        # Time from send_notification() to SMTP acceptance
+        stats['enqueue_to_send_ms'] = summarize(delivery_latencies)
+        stats['samples'] = len(latencies)
+        stats['concurrency'] = self.concurrency
+        return stats
+    
+    def _deliver_email(self, notification):
+        """Render and send one notification; raises on failure"""
+        template_config = self.email_templates[notification['type']]
+        
+        msg = MIMEMultipart()
+        msg['From'] = self.smtp_config['username']
+        msg['To'] = ', '.join(notification['recipients'])
+        msg['Subject'] = notification['subject']
+        
+        body = self._render_email_template(template_config['template'], notification['data'])
+        msg.attach(MIMEText(body, 'html'))
+        
+        text = msg.as_string()
+        smtp_pool.sendmail(self.smtp_config['username'], notification['recipients'], text)
+        
+        logger.info(f"Email sent successfully: {notification['subject']}")
     
     def _render_email_template(self, template_name, data):
         """Render email template with data"""
         try:
-            template_path = os.path.join('templates', template_name)
+            # Compiled once and cached; reloaded when the file changes
+            template = email_templates.get(template_name)
             
-            if not os.path.exists(template_path):
+            if template is None:
                 return self._get_default_template(data)
             
-            with open(template_path, 'r', encoding='utf-8') as f:
-                template_content = f.read()
-            
-            return template_content.format(**data)
+            return template.render(data)
             
         except Exception as e:
             logger.error(f"Error rendering email template: {str(e)}")
@@ -163,30 +534,77 @@ class NotificationManager:
         </html>
         """
     
+    def _find_delayed_employees(self):
+        """One column query for every delayed onboarding, ordered by manager"""
+        delayed_threshold = datetime.now() - timedelta(days=3)
+        today = datetime.now().date()
+        
+        rows = db.session.query(
+            Employee.manager_email,
+            Employee.employee_id,
+            Employee.first_name,
+            Employee.last_name,
+            Employee.start_date
+        ).filter(
+            Employee.created_at < delayed_threshold,
+            Employee.ad_account_created == False
+        ).order_by(Employee.manager_email, Employee.start_date).all()
+        
+        return [{
+            'manager_email': row.manager_email,
+            'employee_name': f"{row.first_name} {row.last_name}",
+            'employee_id': row.employee_id,
+            'start_date': row.start_date.isoformat(),
+            'days_delayed': (today - row.start_date).days
+        } for row in rows]
+    
+    def _delay_digest_data(self, employees):
+        rows = [{key: html.escape(str(value)) for key, value in employee.items()} for employee in employees]
+        return {
+            'delayed_count': len(employees),
+            'employee_rows': ''.join(DELAY_DIGEST_ROW.render_many(rows)),
+            'employees': [{key: value for key, value in employee.items() if key != 'manager_email'} for employee in employees]
+        }
+    
     def check_onboarding_delays(self):
         """Check for delayed onboarding processes"""
         try:
-            delayed_threshold = datetime.now() - timedelta(days=3)
+            delayed_employees = self._find_delayed_employees()
             
-            delayed_employees = Employee.query.filter(
-                Employee.created_at < delayed_threshold,
-                Employee.ad_account_created == False
-            ).all()
+            if not self.delay_digest:
+                for employee in delayed_employees:
+                    self.send_notification(
+                        'onboarding_delayed',
+                        [employee['manager_email'], self.support_email],
+                        {key: value for key, value in employee.items() if key != 'manager_email'},
+                        'high'
+                    )
+                logger.info(f"Checked for delays: {len(delayed_employees)} delayed employees found")
+                return len(delayed_employees)
             
+            if not delayed_employees:
+                logger.info("Checked for delays: 0 delayed employees found")
+                return 0
+            
+            # One digest per manager plus one for the support mailbox
+            by_manager = {}
             for employee in delayed_employees:
-                self.send_notification(
-                    'onboarding_delayed',
-                    [employee.manager_email, 'it-support@company.com'],
-                    {
-                        'employee_name': f"{employee.first_name} {employee.last_name}",
-                        'employee_id': employee.employee_id,
-                        'start_date': employee.start_date.isoformat(),
-                        'days_delayed': (datetime.now().date() - employee.start_date).days
-                    },
-                    'high'
-                )
+                by_manager.setdefault(employee['manager_email'], []).append(employee)
             
-            logger.info(f"Checked for delays: {len(delayed_employees)} delayed employees found")
+            sent = 0
+            for manager_email, employees in by_manager.items():
+                if not manager_email:
+                    continue
+                data = self._delay_digest_data(employees)
+                data['recipient'] = manager_email
+                sent += bool(self.send_notification('onboarding_delayed_digest', [manager_email], data, 'high'))
+            
+            data = self._delay_digest_data(delayed_employees)
+            data['recipient'] = self.support_email
+            sent += bool(self.send_notification('onboarding_delayed_digest', [self.support_email], data, 'high'))
+            
+            logger.info(f"Checked for delays: {len(delayed_employees)} delayed employees found, {sent} digests queued")
+            return sent
             
         except Exception as e:
             logger.error(f"Error checking onboarding delays: {str(e)}")
@@ -195,19 +613,21 @@ class NotificationManager:
         """Send weekly onboarding report"""
         try:
             week_start = datetime.now() - timedelta(days=7)
+            added_this_week = Employee.created_at >= week_start
+            
+            def count_where(condition):
+                return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
             
-            weekly_stats = {
-                'employees_added': Employee.query.filter(Employee.created_at >= week_start).count(),
-                'onboardings_completed': Employee.query.filter(
-                    Employee.created_at >= week_start,
+            weekly_stats = db.session.query(
+                count_where(added_this_week).label('employees_added'),
+                count_where(and_(
+                    added_this_week,
                     Employee.ad_account_created == True,
                     Employee.o365_mailbox_created == True,
                     Employee.security_groups_assigned == True
-                ).count(),
-                'pending_onboardings': Employee.query.filter(
-                    Employee.ad_account_created == False
-                ).count()
-            }
+                )).label('onboardings_completed'),
+                count_where(Employee.ad_account_created == False).label('pending_onboardings')
+            ).one()._asdict()
             
             self.send_notification(
                 'weekly_report',
@@ -227,29 +647,30 @@ class NotificationManager:
             logger.error(f"Error sending weekly report: {str(e)}")
     
     def start_scheduler(self):
-        """Start notification scheduler"""
+        """Register periodic jobs and start the dispatcher; call inside an app context"""
         if self.scheduler_running:
             return
         
         self.scheduler_running = True
+        app = current_app._get_current_object()
         
-        schedule.every(5).minutes.do(self.process_notification_queue)
-        schedule.every().day.at("09:00").do(self.check_onboarding_delays)
-        schedule.every().monday.at("08:00").do(self.send_weekly_report)
+        scheduler_service.register('notifications.check_delays', scheduler_service.every().day.at("09:00"), self.check_onboarding_delays)
+        scheduler_service.register('notifications.weekly_report', scheduler_service.every().monday.at("08:00"), self.send_weekly_report)
+        scheduler_service.register('notifications.purge', scheduler_service.every().day.at("03:00"), self.purge_old_notifications)
         
-        def run_scheduler():
-            while self.scheduler_running:
-                schedule.run_pending()
-                time.sleep(60)
+        def run_dispatcher():
+            with app.app_context():
+                self.run_dispatcher()
         
-        scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-        scheduler_thread.start()
+        dispatcher_thread = threading.Thread(target=run_dispatcher, name='notification-dispatcher', daemon=True)
+        dispatcher_thread.start()
         
         logger.info("Notification scheduler started")
     
     def stop_scheduler(self):
         """Stop notification scheduler"""
         self.scheduler_running = False
+        self._wakeup.set()
         logger.info("Notification scheduler stopped")
 
 notification_manager = NotificationManager()
@@ -263,12 +684,19 @@ def notifications_dashboard():
 def get_notification_queue():
     """Get notification queue status"""
     try:
+        counts = dict(db.session.query(
+            NotificationRecord.status, func.count(NotificationRecord.id)
+        ).group_by(NotificationRecord.status).all())
+        recent = NotificationRecord.query.order_by(NotificationRecord.id.desc()).limit(10).all()
+        
         queue_stats = {
-            'total': len(notification_manager.notification_queue),
-            'pending': len([n for n in notification_manager.notification_queue if n['status'] == 'pending']),
-            'sent': len([n for n in notification_manager.notification_queue if n['status'] == 'sent']),
-            'failed': len([n for n in notification_manager.notification_queue if n['status'] == 'failed']),
-            'recent_notifications': notification_manager.notification_queue[-10:]
+            'total': sum(counts.values()),
+            'pending': counts.get('pending', 0),
+            'sending': counts.get('sending', 0),
+            'sent': counts.get('sent', 0),
+            'failed': counts.get('failed', 0),
+            'recent_notifications': [n.to_dict() for n in reversed(recent)],
+            'dispatch': notification_manager.get_dispatch_stats()
         }
         
         return jsonify({
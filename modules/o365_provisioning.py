@@ -4,6 +4,7 @@ import logging
 import requests
 import json
 from datetime import datetime
+from modules.powershell_pool import powershell_pool
 
 logger = logging.getLogger(__name__)
 
@@ -14,17 +15,12 @@ def create_mailbox(employee):
     try:
         script_path = os.path.join(os.path.dirname(__file__), 'scripts', 'create_o365_mailbox.ps1')
         
-        cmd = [
-            'powershell.exe',
-            '-ExecutionPolicy', 'Bypass',
-            '-File', script_path,
-            '-Email', employee.email,
-            '-FirstName', employee.first_name,
-            '-LastName', employee.last_name,
-            '-Department', employee.department
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+        result = powershell_pool.run_script(script_path, {
+            'Email': employee.email,
+            'FirstName': employee.first_name,
+            'LastName': employee.last_name,
+            'Department': employee.department
+        }, timeout=120)
         
         if result.returncode == 0:
             logger.info(f"Successfully created O365 mailbox for {employee.email}")
@@ -73,15 +69,10 @@ def assign_distribution_lists(employee):
         
         lists = department_lists.get(employee.department, ['Company-All'])
         
-        cmd = [
-            'powershell.exe',
-            '-ExecutionPolicy', 'Bypass',
-            '-File', script_path,
-            '-Email', employee.email,
-            '-DistributionLists', ','.join(lists)
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        result = powershell_pool.run_script(script_path, {
+            'Email': employee.email,
+            'DistributionLists': ','.join(lists)
+        }, timeout=60)
         
         if result.returncode == 0:
             logger.info(f"Successfully assigned distribution lists for {employee.email}")
@@ -124,15 +115,10 @@ def set_mailbox_quota(employee):
         
         quota_size = quota_sizes.get(employee.department, '25GB')
         
-        cmd = [
-            'powershell.exe',
-            '-ExecutionPolicy', 'Bypass',
-            '-File', script_path,
-            '-Email', employee.email,
-            '-QuotaSize', quota_size
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        result = powershell_pool.run_script(script_path, {
+            'Email': employee.email,
+            'QuotaSize': quota_size
+        }, timeout=60)
         
         if result.returncode == 0:
             logger.info(f"Successfully set mailbox quota for {employee.email}")
@@ -165,19 +151,14 @@ def create_email_signature(employee):
     try:
         script_path = os.path.join(os.path.dirname(__file__), 'scripts', 'create_email_signature.ps1')
         
-        cmd = [
-            'powershell.exe',
-            '-ExecutionPolicy', 'Bypass',
-            '-File', script_path,
-            '-Email', employee.email,
-            '-FirstName', employee.first_name,
-            '-LastName', employee.last_name,
-            '-Department', employee.department,
-            '-Position', employee.position,
-            '-Phone', employee.phone or 'N/A'
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        result = powershell_pool.run_script(script_path, {
+            'Email': employee.email,
+            'FirstName': employee.first_name,
+            'LastName': employee.last_name,
+            'Department': employee.department,
+            'Position': employee.position,
+            'Phone': employee.phone or 'N/A'
+        }, timeout=60)
         
         if result.returncode == 0:
             logger.info(f"Successfully created email signature for {employee.email}")
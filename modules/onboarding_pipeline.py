@@ -0,0 +1,208 @@
+import os
+import logging
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from modules.ad_integration import create_ad_user, create_ad_users_batch, reset_ad_password
+from modules.o365_provisioning import create_mailbox
+from modules.security_groups import assign_department_security_groups
+from modules.email_automation import send_welcome_email
+
+logger = logging.getLogger(__name__)
+
+class OnboardingPipeline:
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or int(os.getenv('ONBOARDING_MAX_WORKERS', 8))
+        self.batch_size = int(os.getenv('AD_BATCH_SIZE', 200))
+        self.stages = self._build_stages()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._validate_stages()
+
+    def _build_stages(self):
+        """
+        Define provisioning stages in dependency order. A stage whose flag is
+        already set is not run again; if it has a 'resume' step and a pending
+        stage that needs the temporary password depends on it, that runs
+        instead (a retry has a new password, so the account is reset to it).
+        A 'batch_run' step takes a list of (employee, temp_password) pairs and
+        returns results keyed by employee ID.
+        """
+        return {
+            'ad_account': {
+                'run': lambda employee, temp_password: create_ad_user(employee, temp_password),
+                'resume': lambda employee, temp_password: reset_ad_password(employee, temp_password),
+                'batch_run': lambda jobs: create_ad_users_batch(jobs)['results'],
+                'depends_on': [],
+                'flag': 'ad_account_created'
+            },
+            'o365_mailbox': {
+                'run': lambda employee, temp_password: create_mailbox(employee),
+                'depends_on': ['ad_account'],
+                'flag': 'o365_mailbox_created'
+            },
+            'security_groups': {
+                'run': lambda employee, temp_password: assign_department_security_groups(employee),
+                'depends_on': ['ad_account'],
+                'flag': 'security_groups_assigned'
+            },
+            'welcome_email': {
+                'run': lambda employee, temp_password: send_welcome_email(employee, temp_password),
+                'depends_on': ['ad_account', 'o365_mailbox'],
+                'flag': 'welcome_email_sent',
+                'needs_password': True
+            }
+        }
+
+    def _validate_stages(self):
+        """Ensure every dependency is declared before the stage that needs it"""
+        seen = set()
+        for name, stage in self.stages.items():
+            missing = [dep for dep in stage['depends_on'] if dep not in seen]
+            if missing:
+                raise ValueError(f"Stage {name} depends on undeclared stages: {', '.join(missing)}")
+            seen.add(name)
+
+    def _get_executor(self):
+        """Get the shared worker pool, creating it on first use"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='onboarding'
+                )
+            return self._executor
+
+    def _snapshot(self, employee):
+        """Copy column values so worker threads never touch the ORM session"""
+        table = getattr(employee, '__table__', None)
+        if table is None:
+            return employee
+        return SimpleNamespace(**{column.name: getattr(employee, column.name) for column in table.columns})
+
+    def _step_for(self, employee, name):
+        """The callable to run for a stage, or None if the employee already has it"""
+        stage = self.stages[name]
+        if not getattr(employee, stage['flag'], False):
+            return stage['run']
+        
+        resend = any(
+            other.get('needs_password') and name in other['depends_on'] and not getattr(employee, other['flag'], False)
+            for other in self.stages.values()
+        )
+        return stage['resume'] if resend and stage.get('resume') else None
+    
+    def run(self, employee, temp_password, on_stage_complete=None):
+        """Run all provisioning stages for a single employee"""
+        return self.run_many([(employee, temp_password)], on_stage_complete)[0]
+
+    def run_many(self, jobs, on_stage_complete=None):
+        """
+        Run the stage graph for a list of (employee, temp_password) jobs.
+        Independent stages run concurrently on the bounded worker pool, a
+        stage whose dependency failed is skipped and one the employee already
+        has succeeds without running. Stages with a 'batch_run' step that are
+        ready for several employees at the start share one run per
+        AD_BATCH_SIZE employees. Returns one dict of stage results per job, in
+        input order.
+        """
+        executor = self._get_executor()
+        snapshots = [(self._snapshot(employee), temp_password) for employee, temp_password in jobs]
+        results = [{} for _ in jobs]
+        scheduled = set()
+        futures = {}
+        batches = {} if len(jobs) > 1 else None
+
+        def notify(index, name):
+            if on_stage_complete:
+                try:
+                    on_stage_complete(jobs[index][0], name, results[index][name])
+                except Exception as e:
+                    logger.error(f"Error in stage callback for {name}: {str(e)}")
+
+        def submit_ready(index):
+            done = results[index]
+            for name, stage in self.stages.items():
+                if (index, name) in scheduled:
+                    continue
+
+                failed = [dep for dep in stage['depends_on'] if dep in done and not done[dep].get('success')]
+                if failed:
+                    scheduled.add((index, name))
+                    done[name] = {
+                        'success': False,
+                        'skipped': True,
+                        'message': f'Skipped because {", ".join(failed)} failed',
+                        'error': 'Dependency failed'
+                    }
+                    notify(index, name)
+                elif all(dep in done for dep in stage['depends_on']):
+                    scheduled.add((index, name))
+                    employee, temp_password = snapshots[index]
+                    step = self._step_for(employee, name)
+                    if step is None:
+                        # Stages are in dependency order, so dependents see this later in the loop
+                        done[name] = {
+                            'success': True,
+                            'already_completed': True,
+                            'message': 'Already completed'
+                        }
+                        notify(index, name)
+                    elif batches is not None and step is stage['run'] and stage.get('batch_run'):
+                        batches.setdefault(name, []).append(index)
+                    else:
+                        future = executor.submit(step, employee, temp_password)
+                        futures[future] = ([index], name, False)
+
+        def run_batch(name, indices):
+            batch_result = self.stages[name]['batch_run']([snapshots[index] for index in indices])
+            return [batch_result[snapshots[index][0].employee_id] for index in indices]
+
+        for index in range(len(jobs)):
+            submit_ready(index)
+
+        for name, indices in (batches or {}).items():
+            if len(indices) == 1:
+                employee, temp_password = snapshots[indices[0]]
+                futures[executor.submit(self.stages[name]['run'], employee, temp_password)] = (indices, name, False)
+                continue
+            for start in range(0, len(indices), self.batch_size):
+                chunk = indices[start:start + self.batch_size]
+                futures[executor.submit(run_batch, name, chunk)] = (chunk, name, True)
+        batches = None
+
+        while futures:
+            finished, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+            for future in finished:
+                indices, name, batched = futures.pop(future)
+                try:
+                    stage_results = future.result() if batched else [future.result()]
+                except Exception as e:
+                    logger.error(f"Onboarding stage {name} raised: {str(e)}")
+                    stage_results = [{
+                        'success': False,
+                        'message': f'Stage {name} raised an exception',
+                        'error': str(e)
+                    } for _ in indices]
+                for index, result in zip(indices, stage_results):
+                    results[index][name] = result
+                    notify(index, name)
+                    submit_ready(index)
+
+        return results
+
+    def apply_results(self, employee, results):
+        """Set provisioning flags on the employee for successful stages"""
+        for name, result in results.items():
+            flag = self.stages[name].get('flag')
+            if flag and result.get('success'):
+                setattr(employee, flag, True)
+
+    def shutdown(self):
+        """Stop the worker pool"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+onboarding_pipeline = OnboardingPipeline()
@@ -0,0 +1,202 @@
+import logging
+from datetime import datetime, time, timedelta
+from sqlalchemy import func, and_, case, select, inspect, event
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db, Employee
+
+logger = logging.getLogger(__name__)
+
+PROVISIONING_FLAGS = (
+    'ad_account_created',
+    'o365_mailbox_created',
+    'security_groups_assigned',
+    'equipment_assigned',
+    'software_deployed',
+    'welcome_email_sent'
+)
+
+class OnboardingRollup(db.Model):
+    __tablename__ = 'onboarding_rollup'
+
+    department = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    employees = db.Column(db.Integer, nullable=False, default=0)
+    ad_account_created = db.Column(db.Integer, nullable=False, default=0)
+    o365_mailbox_created = db.Column(db.Integer, nullable=False, default=0)
+    security_groups_assigned = db.Column(db.Integer, nullable=False, default=0)
+    equipment_assigned = db.Column(db.Integer, nullable=False, default=0)
+    software_deployed = db.Column(db.Integer, nullable=False, default=0)
+    welcome_email_sent = db.Column(db.Integer, nullable=False, default=0)
+    fully_onboarded = db.Column(db.Integer, nullable=False, default=0)
+    core_provisioned = db.Column(db.Integer, nullable=False, default=0)
+    core_provisioning_days = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_onboarding_rollup_day', 'day'),
+    )
+
+# Dialects the rollup can upsert into
+ROLLUP_DIALECTS = {'sqlite': sqlite, 'postgresql': postgresql}
+
+def _days_between(dialect_name, start, end):
+    """Fractional days from start to end, in the dialect's date arithmetic"""
+    if dialect_name == 'postgresql':
+        return func.extract('epoch', end - start) / 86400.0
+    return func.julianday(end) - func.julianday(start)
+
+def _bucket_aggregates(dialect_name):
+    """Column expressions aggregating Employee rows into rollup counters"""
+    core_provisioned = and_(
+        Employee.ad_account_created == True,
+        Employee.o365_mailbox_created == True,
+        Employee.security_groups_assigned == True
+    )
+    fully_onboarded = and_(
+        core_provisioned,
+        Employee.equipment_assigned == True,
+        Employee.software_deployed == True,
+        Employee.welcome_email_sent == True
+    )
+    # NULL unless core-provisioned, so count/sum skip the rest
+    core_provisioning_days = case(
+        (core_provisioned, _days_between(dialect_name, Employee.created_at, Employee.updated_at))
+    )
+
+    columns = [func.count(Employee.id)]
+    columns.extend(func.sum(case((getattr(Employee, flag) == True, 1), else_=0)) for flag in PROVISIONING_FLAGS)
+    columns.append(func.sum(case((fully_onboarded, 1), else_=0)))
+    columns.append(func.count(core_provisioning_days))
+    columns.append(func.coalesce(func.sum(core_provisioning_days), 0))
+    return columns
+
+ROLLUP_COLUMNS = ['department', 'day', 'employees'] + list(PROVISIONING_FLAGS) + [
+    'fully_onboarded', 'core_provisioned', 'core_provisioning_days'
+]
+
+def _bucket_of(department, created_at):
+    if department is None or created_at is None:
+        return None
+    day = created_at.date() if isinstance(created_at, datetime) else created_at
+    return (department, day)
+
+class RollupManager:
+    def __init__(self):
+        self.table = OnboardingRollup.__table__
+        self.verified = False
+        self.unsupported_logged = False
+
+    def _supported(self, dialect_name):
+        """Whether the rollup can be maintained on this database; logs once when it cannot"""
+        if dialect_name in ROLLUP_DIALECTS:
+            return True
+        if not self.unsupported_logged:
+            logger.warning(f"Onboarding rollup is not supported on {dialect_name}; analytics will not reflect employee changes")
+            self.unsupported_logged = True
+        return False
+
+    def _upsert(self, connection, values):
+        """Insert a bucket or overwrite its counters, atomically against concurrent writers"""
+        statement = ROLLUP_DIALECTS[connection.dialect.name].insert(self.table).values(values)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[self.table.c.department, self.table.c.day],
+            set_={name: statement.excluded[name] for name in ROLLUP_COLUMNS[2:]}
+        ))
+
+    def refresh_buckets(self, connection, buckets):
+        """Recompute the given (department, day) buckets from their employee rows"""
+        # Runs inside employee flushes, which must not fail because of the rollup
+        if not self._supported(connection.dialect.name):
+            return
+
+        for department, day in buckets:
+            day_start = datetime.combine(day, time.min)
+            day_end = day_start + timedelta(days=1)
+
+            counters = connection.execute(select(*_bucket_aggregates(connection.dialect.name)).where(
+                Employee.department == department,
+                Employee.created_at >= day_start,
+                Employee.created_at < day_end
+            )).one()
+
+            if counters[0]:
+                self._upsert(connection, dict(zip(ROLLUP_COLUMNS, (department, day) + tuple(counters))))
+            else:
+                # Last employee left the bucket
+                connection.execute(self.table.delete().where(
+                    self.table.c.department == department,
+                    self.table.c.day == day
+                ))
+
+    def rebuild(self):
+        """Reconcile the whole rollup from the employee table"""
+        connection = db.session.connection()
+        if not self._supported(connection.dialect.name):
+            self.verified = True
+            return 0
+
+        day = func.date(Employee.created_at)
+        aggregate = select(Employee.department, day, *_bucket_aggregates(connection.dialect.name)).where(
+            Employee.created_at.isnot(None)
+        ).group_by(Employee.department, day)
+
+        connection.execute(self.table.delete())
+        connection.execute(self.table.insert().from_select(ROLLUP_COLUMNS, aggregate))
+        db.session.commit()
+
+        self.verified = True
+        buckets = db.session.query(func.count()).select_from(OnboardingRollup).scalar()
+        logger.info(f"Rebuilt onboarding rollup with {buckets} buckets")
+        return buckets
+
+    def ensure_built(self):
+        """Build the rollup once for databases that predate it"""
+        if self.verified:
+            return
+        if db.session.query(OnboardingRollup.day).first() is None and db.session.query(Employee.id).first() is not None:
+            self.rebuild()
+        self.verified = True
+
+rollup_manager = RollupManager()
+
+def _previous_value(employee, key):
+    # Employee.department and created_at are mapped with active_history, so
+    # the value being replaced is always in history.deleted
+    history = inspect(employee).attrs[key].history
+    if history.added:
+        return history.deleted[0] if history.deleted else None
+    return getattr(employee, key)
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_previous_buckets(session, flush_context, instances):
+    """Record buckets that updated or deleted employees are leaving"""
+    buckets = session.info.setdefault('rollup_buckets', set())
+    changed = session.info.setdefault('rollup_employees', [])
+    for obj in list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, Employee):
+            continue
+        if obj in session.dirty:
+            if not session.is_modified(obj):
+                continue
+            changed.append(obj)
+
+        bucket = _bucket_of(_previous_value(obj, 'department'), _previous_value(obj, 'created_at'))
+        if bucket:
+            buckets.add(bucket)
+
+@event.listens_for(db.session, 'after_flush')
+def _refresh_rollup(session, flush_context):
+    """Refresh every touched bucket inside the flushing transaction"""
+    buckets = session.info.pop('rollup_buckets', set())
+    changed = session.info.pop('rollup_employees', [])
+    for obj in [obj for obj in session.new if isinstance(obj, Employee)] + changed:
+        bucket = _bucket_of(obj.department, obj.created_at)
+        if bucket:
+            buckets.add(bucket)
+
+    if buckets:
+        rollup_manager.refresh_buckets(session.connection(), buckets)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_rollup_buckets(session):
+    session.info.pop('rollup_buckets', None)
+    session.info.pop('rollup_employees', None)
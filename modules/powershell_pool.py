@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import queue
+import base64
+import atexit
+import logging
+import threading
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+RESULT_MARKER = '__PSPOOL_RESULT__'
+READY_MARKER = '__PSPOOL_READY__'
+
+# Request loop run inside each long-lived PowerShell process. Every request is
+# one JSON line on stdin; every response is one marker-prefixed JSON line on stdout.
+BOOTSTRAP_SCRIPT = r'''
+$ProgressPreference = 'SilentlyContinue'
+foreach ($module in ($env:POWERSHELL_PRELOAD_MODULES -split ',')) {
+    if ($module.Trim()) { Import-Module $module.Trim() -ErrorAction SilentlyContinue }
+}
+[Console]::Out.WriteLine('__PSPOOL_READY__')
+[Console]::Out.Flush()
+while ($true) {
+    $line = [Console]::In.ReadLine()
+    if ($null -eq $line) { break }
+    $request = $line | ConvertFrom-Json
+    $parameters = @{}
+    if ($request.parameters) {
+        foreach ($property in $request.parameters.PSObject.Properties) { $parameters[$property.Name] = $property.Value }
+    }
+    $stdout = New-Object System.Text.StringBuilder
+    $stderr = New-Object System.Text.StringBuilder
+    $exitCode = 0
+    try {
+        if ($request.script) {
+            $global:LASTEXITCODE = 0
+            & $request.script @parameters *>&1 | ForEach-Object {
+                if ($_ -is [System.Management.Automation.ErrorRecord]) { [void]$stderr.AppendLine($_.ToString()) }
+                else { [void]$stdout.AppendLine(($_ | Out-String).TrimEnd()) }
+            }
+            $exitCode = $global:LASTEXITCODE
+        }
+    } catch {
+        [void]$stderr.AppendLine($_.Exception.Message)
+        $exitCode = 1
+    }
+    $response = @{ id = $request.id; returncode = $exitCode; stdout = $stdout.ToString(); stderr = $stderr.ToString() }
+    [Console]::Out.WriteLine('__PSPOOL_RESULT__' + ($response | ConvertTo-Json -Compress))
+    [Console]::Out.Flush()
+}
+'''
+
+def _default_executable():
+    return 'powershell.exe' if os.name == 'nt' else 'pwsh'
+
+class PowerShellWorker:
+    def __init__(self, executable, preload_modules, startup_timeout):
+        encoded = base64.b64encode(BOOTSTRAP_SCRIPT.encode('utf-16-le')).decode('ascii')
+        self.command = [
+            executable,
+            '-NoLogo', '-NoProfile', '-NonInteractive',
+            '-ExecutionPolicy', 'Bypass',
+            '-EncodedCommand', encoded
+        ]
+
+        env = os.environ.copy()
+        env['POWERSHELL_PRELOAD_MODULES'] = preload_modules
+
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding='utf-8',
+            bufsize=1,
+            env=env
+        )
+        self.lines = queue.Queue()
+        self.started_at = time.monotonic()
+        self.last_used = self.started_at
+        self.requests_served = 0
+        self.broken = False
+        self._next_id = 0
+
+        reader = threading.Thread(target=self._read_stdout, daemon=True)
+        reader.start()
+
+        self._wait_for(lambda line: line.startswith(READY_MARKER), startup_timeout)
+
+    def _read_stdout(self):
+        for line in self.process.stdout:
+            self.lines.put(line.rstrip('\r\n'))
+        self.lines.put(None)
+
+    def _wait_for(self, matches, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.broken = True
+                raise subprocess.TimeoutExpired(self.command[0], timeout)
+            try:
+                line = self.lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                self.broken = True
+                raise RuntimeError('PowerShell worker exited unexpectedly')
+            if matches(line):
+                return line
+
+    def execute(self, script_path, parameters, timeout):
+        """Run a script in this worker and return a CompletedProcess"""
+        self._next_id += 1
+        request_id = self._next_id
+        request = {'id': request_id, 'script': script_path, 'parameters': parameters or {}}
+
+        try:
+            self.process.stdin.write(json.dumps(request) + '\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self.broken = True
+            raise RuntimeError(f'PowerShell worker is not accepting commands: {str(e)}')
+
+        line = self._wait_for(lambda line: line.startswith(RESULT_MARKER), timeout)
+        response = json.loads(line[len(RESULT_MARKER):])
+        if response.get('id') != request_id:
+            self.broken = True
+            raise RuntimeError('PowerShell worker returned a response for another request')
+
+        self.requests_served += 1
+        self.last_used = time.monotonic()
+
+        return subprocess.CompletedProcess(
+            args=[script_path],
+            returncode=response.get('returncode') or 0,
+            stdout=response.get('stdout', ''),
+            stderr=response.get('stderr', '')
+        )
+
+    def is_alive(self):
+        return not self.broken and self.process.poll() is None
+
+    def close(self):
+        if self.broken:
+            self.process.kill()
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except Exception:
+            self.process.kill()
+
+class PowerShellPool:
+    def __init__(self):
+        self.enabled = os.getenv('POWERSHELL_POOL_ENABLED', 'true').lower() == 'true'
+        self.size = int(os.getenv('POWERSHELL_POOL_SIZE', 4))
+        self.executable = os.getenv('POWERSHELL_EXECUTABLE') or _default_executable()
+        self.preload_modules = os.getenv('POWERSHELL_PRELOAD_MODULES', 'ActiveDirectory,ExchangeOnlineManagement')
+        self.startup_timeout = int(os.getenv('POWERSHELL_STARTUP_TIMEOUT', 120))
+        self.max_requests_per_worker = int(os.getenv('POWERSHELL_MAX_REQUESTS', 200))
+        self.max_worker_age = int(os.getenv('POWERSHELL_MAX_WORKER_AGE', 3600))
+        self.health_check_after = int(os.getenv('POWERSHELL_HEALTH_CHECK_AFTER', 60))
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'workers_started': 0,
+            'workers_recycled': 0,
+            'requests': 0,
+            'failures': 0
+        }
+
+        atexit.register(self.shutdown)
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _start_worker(self):
+        worker = PowerShellWorker(self.executable, self.preload_modules, self.startup_timeout)
+        self._count('workers_started')
+        return worker
+
+    def _retire(self, worker):
+        self._count('workers_recycled')
+        worker.close()
+
+    def _is_healthy(self, worker):
+        """Recycle old or exhausted workers and ping ones that sat idle"""
+        if not worker.is_alive():
+            return False
+        if worker.requests_served >= self.max_requests_per_worker:
+            return False
+        if time.monotonic() - worker.started_at > self.max_worker_age:
+            return False
+        if time.monotonic() - worker.last_used > self.health_check_after:
+            try:
+                return worker.execute(None, None, timeout=10).returncode == 0
+            except Exception as e:
+                logger.warning(f"PowerShell worker failed health check: {str(e)}")
+                return False
+        return True
+
+    def _acquire(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return self._start_worker()
+
+            if self._is_healthy(worker):
+                return worker
+            self._retire(worker)
+
+    def _release(self, worker):
+        if worker.is_alive():
+            self._idle.put(worker)
+        else:
+            self._retire(worker)
+
+    def run_script(self, script_path, parameters, timeout=60):
+        """
+        Run a PowerShell script with named parameters. Returns a
+        subprocess.CompletedProcess and raises subprocess.TimeoutExpired on
+        timeout, matching subprocess.run so callers can use either path.
+        """
+        if not self.enabled:
+            return self._run_standalone(script_path, parameters, timeout)
+
+        self._count('requests')
+        self._slots.acquire()
+        worker = None
+        try:
+            worker = self._acquire()
+            return worker.execute(script_path, parameters, timeout)
+        except Exception:
+            self._count('failures')
+            if worker is not None:
+                worker.broken = True
+            raise
+        finally:
+            if worker is not None:
+                self._release(worker)
+            self._slots.release()
+
+    def _run_standalone(self, script_path, parameters, timeout):
+        """Run a script in a fresh PowerShell process"""
+        cmd = [self.executable, '-ExecutionPolicy', 'Bypass', '-File', script_path]
+        for name, value in (parameters or {}).items():
+            cmd.extend([f'-{name}', str(value)])
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+
+    def get_status(self):
+        """Get pool statistics for monitoring"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats.update({
+            'enabled': self.enabled,
+            'size': self.size,
+            'idle_workers': self._idle.qsize(),
+            'executable': self.executable
+        })
+        return stats
+
+    def shutdown(self):
+        """Stop all idle workers"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.close()
+
+powershell_pool = PowerShellPool()
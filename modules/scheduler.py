@@ -0,0 +1,287 @@
+import os
+import time
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from flask import Blueprint, jsonify, request
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+import schedule
+from app import db
+
+scheduler_bp = Blueprint('scheduler', __name__, url_prefix='/api/scheduler')
+logger = logging.getLogger(__name__)
+
+LEADER_LOCK = 'scheduler:leader'
+
+class SchedulerLock(db.Model):
+    __tablename__ = 'scheduler_locks'
+
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)
+    acquired_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+class ScheduledJobRun(db.Model):
+    __tablename__ = 'scheduled_job_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, succeeded, failed, skipped
+    owner = db.Column(db.String(100), nullable=True)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_ms = db.Column(db.Float, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_scheduled_job_runs_job_name_started_at', 'job_name', 'started_at'),
+    )
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'job_name': self.job_name,
+            'status': self.status,
+            'owner': self.owner,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_ms': self.duration_ms,
+            'error': self.error
+        }
+
+class SchedulerService:
+    """
+    One schedule.Scheduler for every periodic job in the process. Each
+    process runs the tick loop, but only the holder of the leader lease in
+    the database runs due jobs, so a job fires once per cluster rather than
+    once per Gunicorn worker. Jobs run on their own threads so a long
+    backup cannot delay lease renewal or other jobs, and a per-job lock
+    skips a run while the previous one is still going.
+    """
+    def __init__(self):
+        self.scheduler = schedule.Scheduler()
+        self.jobs = {}
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = int(os.getenv('SCHEDULER_LEASE_SECONDS', 120))
+        self.tick_seconds = float(os.getenv('SCHEDULER_TICK_SECONDS', 30))
+        self.history_days = int(os.getenv('SCHEDULER_HISTORY_DAYS', 30))
+        self.is_leader = False
+        self.running = False
+        self.app = None
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def every(self, interval=1):
+        """Start a job definition on the shared scheduler, e.g. every().day.at('09:00')"""
+        return self.scheduler.every(interval)
+
+    def register(self, name, job, func):
+        """Attach func to a job from every() under a unique name; re-registering replaces it"""
+        with self._lock:
+            previous = self.jobs.pop(name, None)
+            if previous:
+                self.scheduler.cancel_job(previous['job'])
+            job.do(self._launch, name, func)
+            self.jobs[name] = {'job': job, 'func': func}
+        logger.info(f"Registered scheduled job {name}: {job}")
+
+    def _acquire_lock(self, name, lease_seconds):
+        """Take or renew a named lease; True if this process holds it"""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=lease_seconds)
+        try:
+            updated = SchedulerLock.query.filter(
+                SchedulerLock.name == name,
+                or_(SchedulerLock.owner == self.owner, SchedulerLock.expires_at < now)
+            ).update({'owner': self.owner, 'expires_at': expires_at}, synchronize_session=False)
+
+            if not updated:
+                if db.session.get(SchedulerLock, name) is not None:
+                    db.session.rollback()
+                    return False
+                db.session.add(SchedulerLock(name=name, owner=self.owner, acquired_at=now, expires_at=expires_at))
+
+            db.session.commit()
+            return True
+        except IntegrityError:
+            # Another process inserted the lock first
+            db.session.rollback()
+            return False
+
+    def _release_lock(self, name):
+        SchedulerLock.query.filter_by(name=name, owner=self.owner).delete(synchronize_session=False)
+        db.session.commit()
+
+    def _launch(self, name, func):
+        """Called by schedule when a job is due; runs it on a separate thread on the leader"""
+        if not self.is_leader:
+            # Followers let schedule advance the job to its next run without
+            # running it, so a later failover does not replay runs the
+            # previous leader already made
+            return
+        
+        with self._lock:
+            overlapping = name in self._in_flight
+            if not overlapping:
+                self._in_flight.add(name)
+
+        if overlapping or not self._acquire_lock(f"job:{name}", self.lease_seconds):
+            logger.warning(f"Skipping scheduled job {name}: previous run still in progress")
+            db.session.add(ScheduledJobRun(job_name=name, status='skipped', owner=self.owner,
+                                           finished_at=datetime.utcnow(), duration_ms=0,
+                                           error='Previous run still in progress'))
+            db.session.commit()
+            if not overlapping:
+                with self._lock:
+                    self._in_flight.discard(name)
+            return
+
+        threading.Thread(target=self._execute, args=(name, func), name=f'scheduled-{name}', daemon=True).start()
+
+    def _execute(self, name, func):
+        with self.app.app_context():
+            run = ScheduledJobRun(job_name=name, status='running', owner=self.owner, started_at=datetime.utcnow())
+            db.session.add(run)
+            db.session.commit()
+            run_id = run.id
+
+            start = time.perf_counter()
+            status, error = 'succeeded', None
+            try:
+                func()
+            except Exception as e:
+                db.session.rollback()
+                status, error = 'failed', str(e)
+                logger.error(f"Scheduled job {name} failed: {error}")
+            finally:
+                duration_ms = round((time.perf_counter() - start) * 1000, 2)
+                try:
+                    ScheduledJobRun.query.filter_by(id=run_id).update({
+                        'status': status,
+                        'error': error,
+                        'finished_at': datetime.utcnow(),
+                        'duration_ms': duration_ms
+                    }, synchronize_session=False)
+                    db.session.commit()
+                    self._release_lock(f"job:{name}")
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error recording scheduled job {name}: {str(e)}")
+                db.session.remove()
+                with self._lock:
+                    self._in_flight.discard(name)
+
+            logger.info(f"Scheduled job {name} {status} in {duration_ms}ms")
+
+    def tick(self):
+        """Renew leadership and run or skip due jobs; called every tick_seconds"""
+        was_leader = self.is_leader
+        self.is_leader = self._acquire_lock(LEADER_LOCK, self.lease_seconds)
+        if self.is_leader != was_leader:
+            logger.info(f"Scheduler {self.owner} {'acquired' if self.is_leader else 'lost'} leadership")
+
+        if self.is_leader:
+            # Keep leases of long-running jobs alive
+            with self._lock:
+                in_flight = list(self._in_flight)
+            for name in in_flight:
+                self._acquire_lock(f"job:{name}", self.lease_seconds)
+        self.scheduler.run_pending()
+
+    def purge_history(self):
+        """Delete job run records older than the retention window"""
+        cutoff = datetime.utcnow() - timedelta(days=self.history_days)
+        deleted = ScheduledJobRun.query.filter(
+            ScheduledJobRun.started_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+    def start(self, app):
+        """Start the tick loop for this process"""
+        if self.running:
+            return
+
+        self.running = True
+        self.app = app
+        self._stop.clear()
+        self.register('scheduler.purge_history', self.every().day.at("03:30"), self.purge_history)
+
+        def run():
+            with app.app_context():
+                while self.running:
+                    try:
+                        self.tick()
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.error(f"Scheduler tick failed: {str(e)}")
+                    finally:
+                        db.session.remove()
+                    self._stop.wait(self.tick_seconds)
+
+        threading.Thread(target=run, name='scheduler', daemon=True).start()
+        logger.info(f"Scheduler started as {self.owner} with {len(self.jobs)} jobs")
+
+    def stop(self):
+        """Stop the tick loop and hand leadership to another process"""
+        self.running = False
+        self._stop.set()
+        if self.is_leader and self.app is not None:
+            with self.app.app_context():
+                try:
+                    self._release_lock(LEADER_LOCK)
+                except Exception as e:
+                    logger.error(f"Error releasing scheduler leadership: {str(e)}")
+        self.is_leader = False
+
+    def get_jobs(self):
+        """Registered jobs with next run time and their latest recorded run"""
+        jobs = []
+        for name, entry in sorted(self.jobs.items()):
+            last_run = ScheduledJobRun.query.filter_by(job_name=name).order_by(
+                ScheduledJobRun.started_at.desc()
+            ).first()
+            jobs.append({
+                'name': name,
+                'schedule': str(entry['job']),
+                'next_run': entry['job'].next_run.isoformat() if entry['job'].next_run else None,
+                'running': name in self._in_flight,
+                'last_run': last_run.to_dict() if last_run else None
+            })
+        return jobs
+
+scheduler_service = SchedulerService()
+
+@scheduler_bp.route('/jobs')
+def list_jobs():
+    """List scheduled jobs and leadership state"""
+    try:
+        leader = db.session.get(SchedulerLock, LEADER_LOCK)
+        return jsonify({
+            'owner': scheduler_service.owner,
+            'is_leader': scheduler_service.is_leader,
+            'leader': leader.owner if leader and leader.expires_at > datetime.utcnow() else None,
+            'jobs': scheduler_service.get_jobs()
+        })
+    except Exception as e:
+        logger.error(f"Error listing scheduled jobs: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@scheduler_bp.route('/runs')
+def list_runs():
+    """Recent job executions, optionally for one job"""
+    try:
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        query = ScheduledJobRun.query
+        job_name = request.args.get('job')
+        if job_name:
+            query = query.filter_by(job_name=job_name)
+        runs = query.order_by(ScheduledJobRun.started_at.desc()).limit(limit).all()
+        return jsonify([run.to_dict() for run in runs])
+    except Exception as e:
+        logger.error(f"Error listing scheduled job runs: {str(e)}")
+        return jsonify({'error': str(e)}), 500
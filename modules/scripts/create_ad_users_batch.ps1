@@ -0,0 +1,65 @@
+param(
+    [Parameter(Mandatory=$true)]
+    [string]$EmployeesJson,
+    
+    [Parameter(Mandatory=$false)]
+    [string]$Server
+)
+
+function Write-Result($EmployeeID, $Success, $Message) {
+    $Result = @{ employee_id = $EmployeeID; success = $Success; message = $Message } | ConvertTo-Json -Compress
+    Write-Output "RESULT:$Result"
+}
+
+try {
+    Import-Module ActiveDirectory -ErrorAction Stop
+    
+    # Resolve one domain controller and reuse it for every account in the batch
+    if (-not $Server) {
+        $Server = (Get-ADDomainController -Discover -ErrorAction Stop).HostName | Select-Object -First 1
+    }
+    
+    $Employees = $EmployeesJson | ConvertFrom-Json
+    
+} catch {
+    Write-Error "Error preparing AD batch: $($_.Exception.Message)"
+    exit 1
+}
+
+foreach ($Employee in $Employees) {
+    try {
+        $SamAccountName = $Employee.EmployeeID.ToLower()
+        $DisplayName = "$($Employee.FirstName) $($Employee.LastName)"
+        
+        $UserParams = @{
+            Server = $Server
+            SamAccountName = $SamAccountName
+            Name = $DisplayName
+            DisplayName = $DisplayName
+            GivenName = $Employee.FirstName
+            Surname = $Employee.LastName
+            EmailAddress = $Employee.Email
+            UserPrincipalName = $Employee.Email
+            Path = $Employee.OU
+            AccountPassword = (ConvertTo-SecureString $Employee.Password -AsPlainText -Force)
+            Enabled = $true
+            ChangePasswordAtLogon = $true
+            Description = "Auto-created user for $($Employee.Department) department"
+            OtherAttributes = @{
+                'department' = $Employee.Department
+                'title' = "Employee"
+                'company' = "Your Company Name"
+            }
+            PassThru = $true
+        }
+        
+        $NewUser = New-ADUser @UserParams -ErrorAction Stop
+        
+        Write-Result $Employee.EmployeeID $true "Created $($NewUser.DistinguishedName)"
+        
+    } catch {
+        Write-Result $Employee.EmployeeID $false $_.Exception.Message
+    }
+}
+
+exit 0
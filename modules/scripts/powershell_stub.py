@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Stand-in for pwsh that speaks the PowerShell pool protocol, for running the
+suite on machines without PowerShell or Active Directory. Every script
+succeeds and echoes its parameters.
+
+    POWERSHELL_EXECUTABLE=modules/scripts/powershell_stub.py
+"""
+import os
+import sys
+import json
+
+sys.stdout.write('__PSPOOL_READY__\n')
+sys.stdout.flush()
+
+for line in sys.stdin:
+    request = json.loads(line)
+    script = request.get('script')
+    parameters = request.get('parameters') or {}
+    stdout = ''
+    if script and 'EmployeesJson' in parameters:
+        results = [
+            'RESULT:' + json.dumps({'employee_id': employee['EmployeeID'], 'success': True, 'message': '[stub] created'})
+            for employee in json.loads(parameters['EmployeesJson'])
+        ]
+        stdout = '\n'.join(results)
+    elif script:
+        details = ', '.join(f'{name}={value}' for name, value in parameters.items() if name != 'Password')
+        stdout = f"[stub] {os.path.basename(script)} {details}"
+    response = {'id': request.get('id'), 'returncode': 0, 'stdout': stdout, 'stderr': ''}
+    sys.stdout.write('__PSPOOL_RESULT__' + json.dumps(response) + '\n')
+    sys.stdout.flush()
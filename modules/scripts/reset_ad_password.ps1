@@ -0,0 +1,23 @@
+param(
+    [Parameter(Mandatory=$true)]
+    [string]$EmployeeID,
+    
+    [Parameter(Mandatory=$true)]
+    [string]$Password
+)
+
+try {
+    Import-Module ActiveDirectory -ErrorAction Stop
+    
+    $SamAccountName = $EmployeeID.ToLower()
+    
+    Set-ADAccountPassword -Identity $SamAccountName -Reset -NewPassword (ConvertTo-SecureString $Password -AsPlainText -Force)
+    Set-ADUser -Identity $SamAccountName -ChangePasswordAtLogon $true
+    
+    Write-Host "Successfully reset password for AD user: $SamAccountName"
+    exit 0
+    
+} catch {
+    Write-Error "Error resetting AD password: $($_.Exception.Message)"
+    exit 1
+}
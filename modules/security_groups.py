@@ -2,6 +2,7 @@ import os
 import subprocess
 import logging
 from datetime import datetime
+from modules.powershell_pool import powershell_pool
 
 logger = logging.getLogger(__name__)
 
@@ -46,17 +47,12 @@ def assign_department_security_groups(employee):
             'shared_drives': ['\\\\server\\General$']
         })
         
-        cmd = [
-            'powershell.exe',
-            '-ExecutionPolicy', 'Bypass',
-            '-File', script_path,
-            '-EmployeeID', employee.employee_id,
-            '-Groups', ','.join(dept_config['groups']),
-            '-Permissions', ','.join(dept_config['permissions']),
-            '-SharedDrives', ','.join(dept_config['shared_drives'])
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+        result = powershell_pool.run_script(script_path, {
+            'EmployeeID': employee.employee_id,
+            'Groups': ','.join(dept_config['groups']),
+            'Permissions': ','.join(dept_config['permissions']),
+            'SharedDrives': ','.join(dept_config['shared_drives'])
+        }, timeout=120)
         
         if result.returncode == 0:
             logger.info(f"Successfully assigned security groups for {employee.employee_id}")
@@ -93,15 +89,10 @@ def create_home_directory(employee):
         
         home_path = f"\\\\server\\Home$\\{employee.employee_id}"
         
-        cmd = [
-            'powershell.exe',
-            '-ExecutionPolicy', 'Bypass',
-            '-File', script_path,
-            '-EmployeeID', employee.employee_id,
-            '-HomePath', home_path
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        result = powershell_pool.run_script(script_path, {
+            'EmployeeID': employee.employee_id,
+            'HomePath': home_path
+        }, timeout=60)
         
         if result.returncode == 0:
             logger.info(f"Successfully created home directory for {employee.employee_id}")
@@ -136,15 +127,10 @@ def setup_folder_redirection(employee):
         
         home_path = f"\\\\server\\Home$\\{employee.employee_id}"
         
-        cmd = [
-            'powershell.exe',
-            '-ExecutionPolicy', 'Bypass',
-            '-File', script_path,
-            '-EmployeeID', employee.employee_id,
-            '-HomePath', home_path
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        result = powershell_pool.run_script(script_path, {
+            'EmployeeID': employee.employee_id,
+            'HomePath': home_path
+        }, timeout=60)
         
         if result.returncode == 0:
             logger.info(f"Successfully setup folder redirection for {employee.employee_id}")
@@ -186,15 +172,10 @@ def configure_printers(employee):
         
         printers = department_printers.get(employee.department, ['General-Printer'])
         
-        cmd = [
-            'powershell.exe',
-            '-ExecutionPolicy', 'Bypass',
-            '-File', script_path,
-            '-EmployeeID', employee.employee_id,
-            '-Printers', ','.join(printers)
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        result = powershell_pool.run_script(script_path, {
+            'EmployeeID': employee.employee_id,
+            'Printers': ','.join(printers)
+        }, timeout=60)
         
         if result.returncode == 0:
             logger.info(f"Successfully configured printers for {employee.employee_id}")
@@ -261,15 +242,10 @@ def setup_drive_mappings(employee):
         
         drive_mappings = ','.join([f"{drive}:{path}" for drive, path in drives.items()])
         
-        cmd = [
-            'powershell.exe',
-            '-ExecutionPolicy', 'Bypass',
-            '-File', script_path,
-            '-EmployeeID', employee.employee_id,
-            '-DriveMappings', drive_mappings
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        result = powershell_pool.run_script(script_path, {
+            'EmployeeID': employee.employee_id,
+            'DriveMappings': drive_mappings
+        }, timeout=60)
         
         if result.returncode == 0:
             logger.info(f"Successfully setup drive mappings for {employee.employee_id}")
@@ -0,0 +1,76 @@
+import os
+import json
+import logging
+from datetime import date, datetime
+from functools import lru_cache
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+def _orjson_dumps(obj):
+    # orjson encodes naive datetimes and dates exactly like isoformat()
+    return orjson.dumps(obj)
+
+JSON_BACKENDS = {'json': _stdlib_dumps}
+if orjson is not None:
+    JSON_BACKENDS['orjson'] = _orjson_dumps
+
+def _select_backend():
+    requested = os.getenv('JSON_BACKEND', 'auto').lower()
+    if requested == 'auto':
+        return 'orjson' if 'orjson' in JSON_BACKENDS else 'json'
+    if requested not in JSON_BACKENDS:
+        logger.warning(f"JSON backend '{requested}' is not available, using stdlib json")
+        return 'json'
+    return requested
+
+json_backend = _select_backend()
+
+def dumps(obj, backend=None):
+    """Encode obj to JSON bytes; datetimes and dates become ISO 8601 strings"""
+    return JSON_BACKENDS[backend or json_backend](obj)
+
+def json_response(obj, status=200, backend=None):
+    """Build a JSON response without going through Flask's jsonify"""
+    return Response(dumps(obj, backend), status=status, mimetype='application/json')
+
+class RowSerializer:
+    """
+    Encode model rows from a fixed column tuple. Rows are fetched as plain
+    tuples instead of ORM objects and zipped against the field names, so no
+    per-attribute to_dict() calls or per-row isoformat() calls are needed.
+    """
+    def __init__(self, model, fields=None):
+        self.model = model
+        self.fields = tuple(fields or model.__table__.columns.keys())
+        self.columns = [getattr(model, name) for name in self.fields]
+
+    def query(self, *extra_columns):
+        """Column query yielding tuples in field order, then any extra columns"""
+        return self.model.query.with_entities(*self.columns, *extra_columns)
+
+    def encode(self, rows):
+        """Turn tuples from query() into dicts; extra trailing columns are dropped"""
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in rows]
+
+@lru_cache(maxsize=128)
+def _cached_serializer(model, fields):
+    return RowSerializer(model, fields)
+
+def serializer_for(model, fields=None):
+    """Get a shared serializer for a model and optional field subset"""
+    return _cached_serializer(model, tuple(fields) if fields else None)
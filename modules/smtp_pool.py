@@ -0,0 +1,173 @@
+import os
+import time
+import queue
+import atexit
+import smtplib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the session is gone and the message can be retried on a new one
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+class PooledSMTPConnection:
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.messages_sent = 0
+        self.broken = False
+
+    def close(self):
+        try:
+            if self.broken:
+                self.smtp.close()
+            else:
+                self.smtp.quit()
+        except Exception:
+            self.smtp.close()
+
+class SMTPPool:
+    def __init__(self, server=None, port=None, username=None, password=None, use_tls=None, size=None):
+        self.server = server or os.getenv('SMTP_SERVER')
+        self.port = int(port or os.getenv('SMTP_PORT', 587))
+        self.username = username if username is not None else os.getenv('SMTP_USERNAME')
+        self.password = password if password is not None else os.getenv('SMTP_PASSWORD')
+        self.use_tls = use_tls if use_tls is not None else os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
+        self.size = int(size or os.getenv('SMTP_POOL_SIZE', 4))
+        self.timeout = int(os.getenv('SMTP_TIMEOUT', 30))
+        self.max_messages_per_connection = int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', 100))
+        self.max_connection_age = int(os.getenv('SMTP_MAX_CONNECTION_AGE', 300))
+        self.keepalive_after = int(os.getenv('SMTP_KEEPALIVE_AFTER', 30))
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'connections_opened': 0,
+            'connections_recycled': 0,
+            'messages_sent': 0,
+            'reconnects': 0,
+            'failures': 0
+        }
+
+        atexit.register(self.shutdown)
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _open(self):
+        smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+
+        self._count('connections_opened')
+        return PooledSMTPConnection(smtp)
+
+    def _retire(self, connection):
+        self._count('connections_recycled')
+        connection.close()
+
+    def _is_healthy(self, connection):
+        """Recycle old or exhausted sessions and NOOP ones that sat idle"""
+        if connection.broken:
+            return False
+        if connection.messages_sent >= self.max_messages_per_connection:
+            return False
+        if time.monotonic() - connection.created_at > self.max_connection_age:
+            return False
+        if time.monotonic() - connection.last_used > self.keepalive_after:
+            try:
+                return connection.smtp.noop()[0] == 250
+            except Exception:
+                connection.broken = True
+                return False
+        return True
+
+    def _acquire(self):
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+
+            if self._is_healthy(connection):
+                return connection
+            self._retire(connection)
+
+    def _release(self, connection):
+        if connection.broken or connection.messages_sent >= self.max_messages_per_connection:
+            self._retire(connection)
+        else:
+            self._idle.put(connection)
+
+    def sendmail(self, from_addr, recipients, message):
+        """
+        Send one message over a pooled session, reconnecting once if the
+        server dropped it. Returns smtplib's dict of refused recipients.
+        """
+        if not self.server:
+            raise ValueError('SMTP_SERVER is not configured')
+
+        self._slots.acquire()
+        try:
+            for attempt in range(2):
+                connection = None
+                try:
+                    connection = self._acquire() if attempt == 0 else self._open()
+                    refused = connection.smtp.sendmail(from_addr, recipients, message)
+                    connection.messages_sent += 1
+                    connection.last_used = time.monotonic()
+                    self._count('messages_sent')
+                    return refused
+                except CONNECTION_ERRORS:
+                    if connection is not None:
+                        connection.broken = True
+                    if attempt:
+                        self._count('failures')
+                        raise
+                    self._count('reconnects')
+                    logger.warning('SMTP session dropped, retrying on a new connection')
+                    # Idle sessions to the same server are most likely dead as well
+                    self._close_idle()
+                except Exception:
+                    self._count('failures')
+                    raise
+                finally:
+                    if connection is not None:
+                        self._release(connection)
+        finally:
+            self._slots.release()
+
+    def get_status(self):
+        """Get pool statistics for monitoring"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats.update({
+            'server': self.server,
+            'size': self.size,
+            'idle_connections': self._idle.qsize()
+        })
+        return stats
+
+    def _close_idle(self):
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+
+    def shutdown(self):
+        """Close all idle sessions"""
+        self._close_idle()
+
+smtp_pool = SMTPPool()
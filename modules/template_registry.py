@@ -0,0 +1,115 @@
+import os
+import time
+import string
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_formatter = string.Formatter()
+
+class CompiledTemplate:
+    """
+    A str.format template split once into literal text and field lookups.
+    Rendering joins the pieces instead of re-scanning the whole template
+    text on every call, which is what dominates str.format on large HTML.
+    """
+    def __init__(self, source, mtime=None):
+        self.source = source
+        self.mtime = mtime
+        self.segments = []
+        self.field_names = set()
+
+        for literal, field_name, spec, conversion in _formatter.parse(source):
+            if literal:
+                self.segments.append(literal)
+            if field_name is None:
+                continue
+            if field_name == '' or field_name.isdigit():
+                raise ValueError('Email templates only support named fields')
+            if spec and '{' in spec:
+                raise ValueError(f"Nested format spec in field {field_name} is not supported")
+
+            self.field_names.add(field_name.split('.', 1)[0].split('[', 1)[0])
+            self.segments.append(self._compile_field(field_name, spec, conversion))
+
+    def _compile_field(self, field_name, spec, conversion):
+        simple = field_name.isidentifier()
+        if simple and not spec and not conversion:
+            return lambda data: str(data[field_name])
+
+        def render_field(data):
+            value = data[field_name] if simple else _formatter.get_field(field_name, (), data)[0]
+            return format(_formatter.convert_field(value, conversion), spec or '')
+        return render_field
+
+    def render(self, data):
+        """Render with a mapping; raises KeyError for missing fields like str.format"""
+        return ''.join(segment if segment.__class__ is str else segment(data) for segment in self.segments)
+
+    def render_many(self, rows):
+        """Render the template for each mapping in rows"""
+        segments = self.segments
+        return [
+            ''.join(segment if segment.__class__ is str else segment(data) for segment in segments)
+            for data in rows
+        ]
+
+class TemplateRegistry:
+    """
+    Load, compile and cache template files, reloading them when they change
+    on disk. The notification templates are str.format files; porting them
+    to Jinja2 would still render them slower even with its bytecode cache
+    (see benchmarks/email_templates.py).
+    """
+    def __init__(self, base_dir, check_interval=2):
+        self.base_dir = base_dir
+        # How long a cached template is trusted before its mtime is checked again
+        self.check_interval = float(check_interval)
+        self.templates = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        """Return the compiled template, or None if it does not exist"""
+        now = time.monotonic()
+        with self.lock:
+            cached = self.templates.get(name)
+            if cached and now < cached[1]:
+                return cached[0]
+
+        path = os.path.join(self.base_dir, name)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            with self.lock:
+                self.templates.pop(name, None)
+            return None
+
+        template = cached[0] if cached else None
+        if template is None or template.mtime != mtime:
+            with open(path, 'r', encoding='utf-8') as f:
+                template = CompiledTemplate(f.read(), mtime)
+            if cached:
+                logger.info(f"Reloaded changed template {name}")
+
+        with self.lock:
+            self.templates[name] = (template, now + self.check_interval)
+        return template
+
+    def render(self, name, data):
+        template = self.get(name)
+        if template is None:
+            raise FileNotFoundError(name)
+        return template.render(data)
+
+    def render_many(self, name, rows):
+        """Render one template for a batch of recipients with a single lookup"""
+        template = self.get(name)
+        if template is None:
+            raise FileNotFoundError(name)
+        return template.render_many(rows)
+
+email_templates = TemplateRegistry(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates'),
+    os.getenv('EMAIL_TEMPLATE_CHECK_SECONDS', 2)
+)
@@ -0,0 +1,472 @@
+import os
+import json
+import zlib
+import shutil
+import time
+import struct
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+WAL_HEADER_SIZE = 32
+WAL_FRAME_HEADER_SIZE = 24
+COPY_BLOCK_SIZE = 1024 * 1024
+
+SQLITE_WAL_MODE = os.getenv('SQLITE_WAL_MODE', 'true').lower() == 'true'
+WAL_ARCHIVE_ENABLED = os.getenv('BACKUP_WAL_ARCHIVE', 'true').lower() == 'true'
+# Page count for SQLite's automatic checkpoint on databases nobody archives
+WAL_AUTOCHECKPOINT = int(os.getenv('SQLITE_WAL_AUTOCHECKPOINT', 1000))
+# While an archiver owns checkpoints, a checkpoint from any other connection
+# resets the log and forces a new generation; this only bounds the log if
+# the archiver stalls while its process keeps the leader lease
+WAL_ARCHIVE_AUTOCHECKPOINT = int(os.getenv(
+    'SQLITE_WAL_ARCHIVE_AUTOCHECKPOINT', 10 * int(os.getenv('BACKUP_WAL_CHECKPOINT_PAGES', 1000))
+))
+
+# The archiver runs in the scheduler leader (modules/scheduler.py), so a
+# live leader lease means some process is archiving this database
+ARCHIVER_LEASE = 'scheduler:leader'
+LEASE_CHECK_SECONDS = float(os.getenv('SQLITE_WAL_LEASE_CHECK_SECONDS', 5))
+
+# Databases a WalArchiver of this process is archiving right now
+_archived_databases = set()
+_archiver_lease = {'checked_at': None, 'held': False}
+
+def _archiver_lease_held(dbapi_connection):
+    """Whether any process holds the archiver's lease; read at most every LEASE_CHECK_SECONDS"""
+    now = time.monotonic()
+    checked_at = _archiver_lease['checked_at']
+    if checked_at is None or now - checked_at >= LEASE_CHECK_SECONDS:
+        try:
+            row = dbapi_connection.execute(
+                'SELECT 1 FROM scheduler_locks WHERE name = ? AND expires_at > ?',
+                (ARCHIVER_LEASE, datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f'))
+            ).fetchone()
+        except sqlite3.Error:
+            # Tables not created yet
+            row = None
+        _archiver_lease.update(checked_at=now, held=row is not None)
+    return _archiver_lease['held']
+
+def configure_sqlite_wal(engine):
+    """
+    Put every new SQLite connection of engine into WAL mode. While an
+    archiver runs against the database, in this process or another, no
+    connection checkpoints before the archiver has copied the log.
+    """
+    if not SQLITE_WAL_MODE or engine.url.get_backend_name() != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return
+    db_path = os.path.abspath(engine.url.database)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, 'checkout')
+    def set_autocheckpoint(dbapi_connection, connection_record, connection_proxy):
+        # Checked on checkout, as pooled connections outlive archiver starts and stops
+        archiving = WAL_ARCHIVE_ENABLED and (db_path in _archived_databases or _archiver_lease_held(dbapi_connection))
+        pages = WAL_ARCHIVE_AUTOCHECKPOINT if archiving else WAL_AUTOCHECKPOINT
+        if connection_record.info.get('wal_autocheckpoint') != pages:
+            dbapi_connection.execute(f'PRAGMA wal_autocheckpoint={pages}')
+            connection_record.info['wal_autocheckpoint'] = pages
+
+class WalContinuityError(Exception):
+    """The WAL was reset by someone else, so frames may be missing from the archive"""
+
+def _read_wal_header(wal_path):
+    """(header bytes, page size, checkpoint sequence, salt) or None if there is no log yet"""
+    try:
+        with open(wal_path, 'rb') as f:
+            header = f.read(WAL_HEADER_SIZE)
+    except FileNotFoundError:
+        return None
+    if len(header) < WAL_HEADER_SIZE:
+        return None
+    page_size, checkpoint_seq = struct.unpack('>II', header[8:16])
+    return header, page_size, checkpoint_seq, header[16:24]
+
+def _salt1(salt):
+    return struct.unpack('>I', salt[:4])[0]
+
+class WalArchiver:
+    """
+    Continuous archiving of the SQLite write-ahead log for point-in-time
+    recovery. A generation is a base snapshot plus every WAL frame committed
+    after it, copied into compressed segments every few seconds. Frames are
+    copied while holding the write lock so the log cannot change underneath,
+    and the log is only checkpointed (and so recycled) by the archiver after
+    its frames are safely archived.
+    """
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self.enabled = WAL_ARCHIVE_ENABLED
+        self.interval = float(os.getenv('BACKUP_WAL_ARCHIVE_SECONDS', 10))
+        # Checkpoint once the log holds this many pages, so it is recycled instead of growing
+        self.checkpoint_pages = int(os.getenv('BACKUP_WAL_CHECKPOINT_PAGES', 1000))
+        self.generation_hours = float(os.getenv('BACKUP_WAL_GENERATION_HOURS', 24))
+        self.retention_days = int(os.getenv('BACKUP_WAL_RETENTION_DAYS', 3))
+        self.compression_level = int(os.getenv('BACKUP_WAL_COMPRESSION', 1))
+
+        self.db_path = None
+        self.writer = None
+        self.checkpointer = None
+        self.generation = None
+        self.running = False
+        # Reentrant so a suspended archiver can still run a restore
+        self.lock = threading.RLock()
+        self._stop = threading.Event()
+        self._reset_position()
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+    def _reset_position(self):
+        self.salt = None
+        self.checkpoint_seq = None
+        self.offset = 0
+        self.sequence = 0
+        self.restart_expected = False
+
+    def _connect(self):
+        if self.writer is None:
+            # Autocommit connections so transactions are only the ones issued here
+            self.writer = sqlite3.connect(self.db_path, isolation_level=None, timeout=30, check_same_thread=False)
+            self.checkpointer = sqlite3.connect(self.db_path, isolation_level=None, timeout=30, check_same_thread=False)
+            _archived_databases.add(os.path.abspath(self.db_path))
+
+    def _close(self):
+        for conn in (self.writer, self.checkpointer):
+            if conn is not None:
+                conn.close()
+        if self.writer is not None:
+            _archived_databases.discard(os.path.abspath(self.db_path))
+        self.writer = self.checkpointer = None
+        self.generation = None
+        self._reset_position()
+
+    def _generation_dir(self, name):
+        return os.path.join(self.archive_dir, name)
+
+    def _start_generation(self):
+        """Take a base snapshot and start archiving the current log from its first frame"""
+        created_at = datetime.now()
+        name = created_at.strftime('%Y%m%d_%H%M%S')
+        generation_dir = self._generation_dir(name)
+        os.makedirs(generation_dir, exist_ok=True)
+        self._reset_position()
+
+        # Frames already in the log are also in the snapshot; replaying them
+        # again is harmless and keeps the checksum chain from the log header
+        header = _read_wal_header(f"{self.db_path}-wal")
+        if header is not None:
+            self.salt, self.checkpoint_seq = header[3], header[2]
+        else:
+            self.restart_expected = True
+
+        # A single-step backup only holds a read transaction, which in WAL
+        # mode does not block writers
+        snapshot_path = os.path.join(generation_dir, 'base.db.tmp')
+        target = sqlite3.connect(snapshot_path)
+        try:
+            self.checkpointer.backup(target)
+        finally:
+            target.close()
+
+        base_bytes = os.path.getsize(snapshot_path)
+        compressor = zlib.compressobj(self.compression_level)
+        with open(snapshot_path, 'rb') as source, open(os.path.join(generation_dir, 'base.db.z'), 'wb') as out:
+            for block in iter(lambda: source.read(COPY_BLOCK_SIZE), b''):
+                out.write(compressor.compress(block))
+            out.write(compressor.flush())
+        os.remove(snapshot_path)
+
+        metadata = {
+            'generation': name,
+            'created_at': created_at.isoformat(),
+            'base_completed_at': datetime.now().isoformat(),
+            'base_bytes': base_bytes
+        }
+        with open(os.path.join(generation_dir, 'generation.json'), 'w') as f:
+            json.dump(metadata, f, indent=2)
+
+        self.generation = {'name': name, 'dir': generation_dir, 'created_at': created_at}
+        logger.info(f"Started WAL archive generation {name} ({base_bytes} byte base snapshot)")
+
+    def _archive_tail(self):
+        """Copy committed frames past the archived offset into a new segment; call with the write lock held"""
+        wal_path = f"{self.db_path}-wal"
+        header = _read_wal_header(wal_path)
+        if header is None:
+            return 0
+        header_bytes, page_size, checkpoint_seq, salt = header
+
+        if salt != self.salt:
+            # The log was reset; fine if it is the one restart after our own
+            # complete checkpoint, otherwise frames were lost. Each restart
+            # adds one to salt-1 (the checkpoint sequence is per connection)
+            if self.salt is not None and not (self.restart_expected and _salt1(salt) == (_salt1(self.salt) + 1) & 0xFFFFFFFF):
+                raise WalContinuityError(f"WAL reset outside the archiver (salt {self.salt.hex()} -> {salt.hex()})")
+            self.salt, self.checkpoint_seq = salt, checkpoint_seq
+            self.offset = 0
+            self.restart_expected = False
+
+        frame_size = WAL_FRAME_HEADER_SIZE + page_size
+        segment_path = os.path.join(self.generation['dir'], f"{self.sequence + 1:08d}.wal.z")
+        temp_path = f"{segment_path}.tmp"
+        compressor = zlib.compressobj(self.compression_level)
+        frames = 0
+        end = self.offset
+
+        with open(wal_path, 'rb') as wal, open(temp_path, 'wb') as out:
+            if self.offset == 0:
+                out.write(compressor.compress(header_bytes))
+            position = max(self.offset, WAL_HEADER_SIZE)
+            wal.seek(position)
+            pending = []
+            while True:
+                frame = wal.read(frame_size)
+                # Stale frames from before the last reset carry an old salt
+                if len(frame) < frame_size or frame[8:16] != salt:
+                    break
+                pending.append(frame)
+                position += frame_size
+                if struct.unpack('>I', frame[4:8])[0]:
+                    # Commit frame: everything up to here is a complete transaction
+                    for committed in pending:
+                        out.write(compressor.compress(committed))
+                    frames += len(pending)
+                    pending = []
+                    end = position
+            out.write(compressor.flush())
+
+        if not frames:
+            os.remove(temp_path)
+            return 0
+
+        os.replace(temp_path, segment_path)
+        self.sequence += 1
+        segment = {
+            'sequence': self.sequence,
+            'file': os.path.basename(segment_path),
+            'epoch': f"{checkpoint_seq}-{salt.hex()}",
+            'offset': self.offset,
+            'end': end,
+            'frames': frames,
+            'bytes': os.path.getsize(segment_path),
+            'archived_at': datetime.now().isoformat()
+        }
+        with open(os.path.join(self.generation['dir'], 'segments.jsonl'), 'a') as f:
+            f.write(json.dumps(segment) + '\n')
+        self.offset = end
+        return frames
+
+    def archive_once(self):
+        """Archive new WAL frames, checkpointing once the log is large; returns frames archived"""
+        with self.lock:
+            self._connect()
+            if self.generation is None or datetime.now() - self.generation['created_at'] >= timedelta(hours=self.generation_hours):
+                self._start_generation()
+
+            self.writer.execute('BEGIN IMMEDIATE')
+            try:
+                try:
+                    frames = self._archive_tail()
+                except WalContinuityError as e:
+                    logger.warning(f"{e}; starting a new WAL archive generation")
+                    self.generation = None
+                    return 0
+
+                header = _read_wal_header(f"{self.db_path}-wal")
+                if header is not None and self.offset >= self.checkpoint_pages * (WAL_FRAME_HEADER_SIZE + header[1]):
+                    # Every frame is archived and no new ones can be written
+                    # until we let go of the write lock, so the log may be recycled
+                    busy, log_frames, checkpointed = self.checkpointer.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+                    if not busy and log_frames == checkpointed:
+                        self.restart_expected = True
+            finally:
+                self.writer.execute('ROLLBACK')
+            return frames
+
+    def start(self, db_path, should_run=None):
+        """Archive every interval seconds in a background thread while should_run() is true"""
+        if self.running or not self.enabled:
+            return
+        self.db_path = db_path
+        self.running = True
+        self._stop.clear()
+
+        def run():
+            while self.running:
+                try:
+                    if should_run is None or should_run():
+                        self.archive_once()
+                    elif self.writer is not None:
+                        # Another process took over; it starts its own generation
+                        with self.lock:
+                            self._close()
+                except Exception as e:
+                    logger.error(f"WAL archiving failed: {str(e)}")
+                    with self.lock:
+                        self._close()
+                self._stop.wait(self.interval)
+
+        threading.Thread(target=run, name='wal-archiver', daemon=True).start()
+        logger.info(f"WAL archiver started for {db_path} every {self.interval}s")
+
+    def stop(self):
+        self.running = False
+        self._stop.set()
+        with self.lock:
+            self._close()
+
+    @contextmanager
+    def suspended(self):
+        """Pause archiving and release the database, e.g. while it is being replaced"""
+        with self.lock:
+            self._close()
+            yield
+
+    def _load_generation(self, name):
+        generation_dir = self._generation_dir(name)
+        with open(os.path.join(generation_dir, 'generation.json'), 'r') as f:
+            metadata = json.load(f)
+        segments = []
+        index_path = os.path.join(generation_dir, 'segments.jsonl')
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as f:
+                segments = [json.loads(line) for line in f if line.strip()]
+        return metadata, segments
+
+    def list_generations(self):
+        """Completed generations, newest first"""
+        names = [name for name in os.listdir(self.archive_dir)
+                 if os.path.exists(os.path.join(self._generation_dir(name), 'generation.json'))]
+        return sorted(names, reverse=True)
+
+    def get_status(self):
+        """Generations with their restorable time window"""
+        generations = []
+        for name in self.list_generations():
+            metadata, segments = self._load_generation(name)
+            generations.append({
+                'generation': name,
+                'created_at': metadata['created_at'],
+                'restorable_from': metadata['base_completed_at'],
+                'restorable_to': segments[-1]['archived_at'] if segments else metadata['base_completed_at'],
+                'segments': len(segments),
+                'frames': sum(segment['frames'] for segment in segments),
+                'archived_bytes': sum(segment['bytes'] for segment in segments)
+            })
+        return {
+            'enabled': self.enabled,
+            'running': self.running,
+            'interval_seconds': self.interval,
+            'current_generation': self.generation['name'] if self.generation else None,
+            'generations': generations
+        }
+
+    def restore_to(self, target_time, output_path):
+        """
+        Rebuild the database as of target_time into output_path: decompress
+        the newest base snapshot taken before it, then let SQLite recover and
+        checkpoint each archived log up to the last segment archived at or
+        before target_time. Returns what was replayed.
+        """
+        for name in self.list_generations():
+            metadata, segments = self._load_generation(name)
+            if datetime.fromisoformat(metadata['base_completed_at']) <= target_time:
+                break
+        else:
+            raise ValueError(f"No WAL archive generation covers {target_time.isoformat()}")
+
+        generation_dir = self._generation_dir(name)
+        segments = [segment for segment in segments if datetime.fromisoformat(segment['archived_at']) <= target_time]
+
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(f"{output_path}{suffix}"):
+                os.remove(f"{output_path}{suffix}")
+
+        decompressor = zlib.decompressobj()
+        with open(os.path.join(generation_dir, 'base.db.z'), 'rb') as source, open(output_path, 'wb') as out:
+            for block in iter(lambda: source.read(COPY_BLOCK_SIZE), b''):
+                out.write(decompressor.decompress(block))
+            out.write(decompressor.flush())
+
+        conn = sqlite3.connect(output_path)
+        try:
+            # The log is only read if the database is in WAL mode
+            conn.execute('PRAGMA journal_mode=WAL')
+        finally:
+            conn.close()
+
+        # Segments of one epoch (between log resets) form one contiguous log
+        epochs = []
+        for segment in segments:
+            if not epochs or epochs[-1][0]['epoch'] != segment['epoch']:
+                if segment['offset'] != 0:
+                    raise ValueError(f"WAL segment {segment['file']} does not start a log")
+                epochs.append([])
+            elif segment['offset'] != epochs[-1][-1]['end']:
+                raise ValueError(f"WAL segment {segment['file']} is not contiguous")
+            epochs[-1].append(segment)
+
+        frames = 0
+        try:
+            for epoch in epochs:
+                with open(f"{output_path}-wal", 'wb') as wal:
+                    for segment in epoch:
+                        with open(os.path.join(generation_dir, segment['file']), 'rb') as f:
+                            wal.write(zlib.decompress(f.read()))
+                conn = sqlite3.connect(output_path)
+                try:
+                    busy, log_frames, checkpointed = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+                    if busy or log_frames != checkpointed:
+                        raise ValueError(f"Could not replay WAL epoch {epoch[0]['epoch']}")
+                finally:
+                    conn.close()
+                frames += sum(segment['frames'] for segment in epoch)
+
+            conn = sqlite3.connect(output_path)
+            try:
+                result = conn.execute('PRAGMA quick_check').fetchone()[0]
+            finally:
+                conn.close()
+            if result != 'ok':
+                raise ValueError(f"Recovered database failed integrity check: {result}")
+        except Exception:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(f"{output_path}{suffix}"):
+                    os.remove(f"{output_path}{suffix}")
+            raise
+
+        return {
+            'generation': name,
+            'segments': len(segments),
+            'frames': frames,
+            'recovered_to': segments[-1]['archived_at'] if segments else metadata['base_completed_at']
+        }
+
+    def cleanup(self):
+        """Delete generations past retention, always keeping the newest one"""
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        deleted = 0
+        for name in self.list_generations()[1:]:
+            if self.generation and name == self.generation['name']:
+                continue
+            metadata, segments = self._load_generation(name)
+            last_activity = segments[-1]['archived_at'] if segments else metadata['base_completed_at']
+            if datetime.fromisoformat(last_activity) < cutoff:
+                shutil.rmtree(self._generation_dir(name), ignore_errors=True)
+                deleted += 1
+                logger.info(f"Deleted WAL archive generation {name}")
+        return deleted
@@ -0,0 +1,31 @@
+import os
+import logging
+import threading
+from app import app, db, start_background_services
+from modules.job_queue import job_queue
+from modules.migrations import apply_migrations
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def run_worker_thread():
+    with app.app_context():
+        job_queue.run_worker()
+
+if __name__ == '__main__':
+    with app.app_context():
+        db.create_all()
+        apply_migrations()
+    
+    # Periodic jobs, notifications and WAL archiving also run here, so they
+    # keep going (under leader election) with the web tier down
+    start_background_services()
+    
+    concurrency = int(os.getenv('JOB_WORKER_CONCURRENCY', 4))
+    logger.info(f"Starting onboarding job worker with {concurrency} threads")
+    
+    threads = [threading.Thread(target=run_worker_thread, name=f'job-worker-{i}') for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()